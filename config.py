@@ -32,10 +32,18 @@ class Config:
         "https://generate-blog-post-yahp6ia25q-du.a.run.app"
     )
     
+    # 계정 전용 경량 함수 (register_user, user_info) - 배포 전에는 메인 엔드포인트 사용
+    ACCOUNT_URL = os.getenv("ACCOUNT_URL", BACKEND_URL)
+    
     # Timeouts
     API_TIMEOUT = int(os.getenv("API_TIMEOUT", "180"))
+    API_CONNECT_TIMEOUT = int(os.getenv("API_CONNECT_TIMEOUT", "10"))
     SELENIUM_TIMEOUT = int(os.getenv("SELENIUM_TIMEOUT", "15"))
     
+    # 비동기 글 생성 작업 (submit 후 long-poll)
+    JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "600"))       # 작업 완료까지 최대 대기
+    JOB_POLL_WAIT = int(os.getenv("JOB_POLL_WAIT", "20"))    # 상태 조회 1회당 서버 대기
+    
     # Browser Settings
     HEADLESS_BROWSER = os.getenv("HEADLESS_BROWSER", "false").lower() == "true"
     
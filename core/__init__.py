@@ -3,6 +3,7 @@ AutoBlogger Core Module
 핵심 기능 모듈
 """
 from .worker import AutomationWorker
+from .api_client import post_json, new_idempotency_key, log_server_timing, get_session
 from .image_generator import (
     GeminiImageGenerator, 
     get_image_generator,
@@ -13,11 +14,16 @@ from .image_generator import (
 from .content_converter import (
     ContentConverter,
     convert_text_to_formats,
+    convert_blocks_to_formats,
     text_to_naver_html
 )
 
 __all__ = [
     'AutomationWorker',
+    'post_json',
+    'new_idempotency_key',
+    'log_server_timing',
+    'get_session',
     'GeminiImageGenerator',
     'get_image_generator',
     'generate_thumbnail',
@@ -25,5 +31,6 @@ __all__ = [
     'is_image_generation_available',
     'ContentConverter',
     'convert_text_to_formats',
+    'convert_blocks_to_formats',
     'text_to_naver_html'
 ]
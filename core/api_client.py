@@ -0,0 +1,135 @@
+"""
+Backend API Client
+백엔드 호출 공통 처리 - 재시도 시 같은 Idempotency-Key를 보내서
+서버가 중복 생성/중복 과금 없이 이전 결과를 돌려주도록 한다
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import requests
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 HTTP 상태 (호출 한도 초과/게이트웨이/일시 과부하)
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# 서버가 알려준 Retry-After가 이보다 길면 재시도하지 않고 응답을 그대로 반환
+MAX_RETRY_AFTER = 30
+
+# 동시에 유지할 백엔드 커넥션 수 (워커 스레드 수 이상)
+SESSION_POOL_SIZE = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    백엔드 호출 공용 세션
+    커넥션(TLS)을 요청 간 재사용하고, gzip 응답을 요청한다 (압축 해제는 requests가 처리)
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=SESSION_POOL_SIZE, pool_maxsize=SESSION_POOL_SIZE
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                _session = session
+    return _session
+
+
+def new_idempotency_key() -> str:
+    """논리적 요청 1건(재시도 포함)에 사용할 멱등 키 생성"""
+    return uuid.uuid4().hex
+
+
+def post_json(
+    payload: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None,
+    timeout=None,
+    retries: int = 2,
+    backoff: float = 1.0,
+    idempotency_key: Optional[str] = None,
+    url: Optional[str] = None,
+    **kwargs
+) -> requests.Response:
+    """
+    백엔드에 JSON POST (연결 오류/시간 초과/429/502~504 시 재시도)
+    429 응답은 서버가 보낸 Retry-After만큼 기다린 뒤 재시도한다
+
+    Args:
+        payload: 요청 본문
+        headers: 추가 헤더 (Authorization 등)
+        timeout: requests timeout (기본: 연결/응답 설정값)
+        retries: 최대 재시도 횟수
+        backoff: 재시도 대기 기본값 (초, 회차마다 2배)
+        idempotency_key: 멱등 키 (없으면 새로 생성, 모든 재시도에 같은 값 사용)
+        url: 요청 URL (기본: Config.BACKEND_URL)
+
+    Returns:
+        마지막 응답 (재시도 후에도 연결 실패면 예외 발생)
+    """
+    request_headers = dict(headers or {})
+    request_headers["Idempotency-Key"] = idempotency_key or new_idempotency_key()
+    if timeout is None:
+        timeout = (Config.API_CONNECT_TIMEOUT, Config.API_TIMEOUT)
+
+    for attempt in range(retries + 1):
+        try:
+            response = get_session().post(
+                url or Config.BACKEND_URL,
+                json=payload,
+                headers=request_headers,
+                timeout=timeout,
+                **kwargs
+            )
+            log_server_timing(response, payload.get("mode"))
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                if response.headers.get("Idempotency-Status") in ("replayed", "coalesced"):
+                    logger.info(f"Server reused previous result ({response.headers['Idempotency-Status']})")
+                return response
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                if retry_after > MAX_RETRY_AFTER:
+                    return response
+                logger.warning(f"Backend rate limited, retrying in {retry_after:.0f}s ({attempt + 1}/{retries})")
+                time.sleep(retry_after)
+                continue
+            logger.warning(f"Backend returned {response.status_code}, retrying ({attempt + 1}/{retries})")
+        except (requests.Timeout, requests.ConnectionError) as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"Backend request failed: {e}, retrying ({attempt + 1}/{retries})")
+
+        time.sleep(backoff * (2 ** attempt))
+
+
+def log_server_timing(response: requests.Response, label: Optional[str] = None):
+    """
+    왕복 시간과 서버 Server-Timing 헤더(단계별 소요 시간)를 함께 로그로 남김
+    둘의 차이가 네트워크/콜드 스타트 등 서버 밖에서 쓴 시간
+    """
+    round_trip = response.elapsed.total_seconds() * 1000
+    server_timing = response.headers.get("Server-Timing")
+    logger.info(
+        f"[{label or 'backend'}] {response.status_code} round trip {round_trip:.0f}ms"
+        + (f" | server: {server_timing}" if server_timing else "")
+    )
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """응답의 Retry-After 헤더 (초, 없으면 None)"""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
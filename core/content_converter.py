@@ -3,10 +3,15 @@ Content Converter Module
 TEXT 기반 콘텐츠를 Markdown/HTML로 변환
 네이버 블로그 에디터 스타일 지원
 """
-import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from dataclasses import dataclass
 
+from core.block_lexer import classify, BLANK, HEADING, QUESTION, ANSWER, BULLET, NUMBER, DIVIDER
+
+
+# render_blocks 기본 출력 형식 (convert_all과 같은 키)
+ALL_FORMATS = ("text", "markdown", "html", "html_naver")
+
 
 @dataclass
 class TextStyle:
@@ -49,6 +54,15 @@ class ContentConverter:
         "blockquote": '<div class="se-module se-module-text se-quote"><blockquote class="se-text-blockquote"><p class="se-text-paragraph">{text}</p></blockquote></div>',
     }
     
+    # 줄 종류 → 섹션 내용 항목 종류
+    CONTENT_TYPES = {
+        QUESTION: "question",
+        ANSWER: "answer",
+        BULLET: "list_item",
+        NUMBER: "list_item",
+        DIVIDER: "divider",
+    }
+    
     # 테마 컬러 매핑
     THEME_COLORS = {
         "네이버 그린 (#03C75A)": "#03C75A",
@@ -108,7 +122,7 @@ class ContentConverter:
     # ========== TEXT 파싱 ==========
     
     def parse_text_content(self, text: str) -> Dict[str, Any]:
-        """TEXT 콘텐츠를 구조화된 형태로 파싱"""
+        """TEXT 콘텐츠를 구조화된 형태로 파싱 (줄 문법은 functions/block_lexer와 공용)"""
         result = {
             "title": "",
             "sections": [],
@@ -123,67 +137,33 @@ class ContentConverter:
             result["title"] = lines[0].replace("제목:", "").replace("# ", "").strip()
             lines = lines[1:]
         
-        # 소제목 패턴 (스타일에 따라 다름)
-        heading_patterns = [
-            r'^【(.+?)】',           # 대괄호
-            r'^▶\s*(.+)',           # 화살표
-            r'^●\s*(.+)',           # 원형
-            r'^■\s*(.+)',           # 사각형
-            r'^※\s*(.+)',           # 꽃표
-            r'^#{2,3}\s*(.+)',      # Markdown 스타일
-        ]
-        
         for line in lines:
             line = line.strip()
-            if not line:
+            token = classify(line)
+            kind = token.kind
+            if kind == BLANK:
                 continue
             
-            # 소제목 체크
-            is_heading = False
-            for pattern in heading_patterns:
-                match = re.match(pattern, line)
-                if match:
-                    # 이전 섹션 저장
-                    if current_section["heading"] or current_section["content"]:
-                        result["sections"].append(current_section)
-                    
-                    current_section = {
-                        "heading": match.group(1).strip(),
-                        "content": [],
-                        "type": "section"
-                    }
-                    is_heading = True
-                    break
-            
-            if not is_heading:
-                # Q&A 패턴 체크
-                if line.startswith("Q:") or line.startswith("Q.") or line.startswith("질문:"):
-                    current_section["content"].append({
-                        "type": "question",
-                        "text": re.sub(r'^(Q[:.:]|질문:)\s*', '', line)
-                    })
-                elif line.startswith("A:") or line.startswith("A.") or line.startswith("답변:"):
-                    current_section["content"].append({
-                        "type": "answer",
-                        "text": re.sub(r'^(A[:.:]|답변:)\s*', '', line)
-                    })
-                # 리스트 패턴 체크
-                elif re.match(r'^[-•*]\s+', line) or re.match(r'^\d+[.)]\s+', line):
-                    current_section["content"].append({
-                        "type": "list_item",
-                        "text": re.sub(r'^[-•*\d.)+]\s*', '', line)
-                    })
-                # 구분선 체크
-                elif re.match(r'^[━\-═]{3,}', line):
-                    current_section["content"].append({
-                        "type": "divider",
-                        "text": ""
-                    })
-                else:
-                    current_section["content"].append({
-                        "type": "paragraph",
-                        "text": line
-                    })
+            if kind == HEADING:
+                # 이전 섹션 저장
+                if current_section["heading"] or current_section["content"]:
+                    result["sections"].append(current_section)
+                current_section = {
+                    "heading": token.text,
+                    "content": [],
+                    "type": "section"
+                }
+            elif kind in self.CONTENT_TYPES:
+                current_section["content"].append({
+                    "type": self.CONTENT_TYPES[kind],
+                    "text": token.text
+                })
+            else:
+                # 일반 텍스트/인용구는 줄 그대로 문단
+                current_section["content"].append({
+                    "type": "paragraph",
+                    "text": line
+                })
         
         # 마지막 섹션 추가
         if current_section["heading"] or current_section["content"]:
@@ -212,19 +192,11 @@ class ContentConverter:
             result.append("")
         
         # 내용 처리 (기존 소제목을 새 스타일로 변환)
-        lines = content.split('\n')
-        for line in lines:
-            # 소제목 패턴 매칭 및 변환
-            heading_match = None
-            for pattern in [r'^【(.+?)】', r'^▶\s*(.+)', r'^●\s*(.+)', r'^■\s*(.+)', r'^※\s*(.+)']:
-                match = re.match(pattern, line)
-                if match:
-                    heading_match = match.group(1)
-                    break
-            
-            if heading_match:
+        for line in content.split('\n'):
+            token = classify(line)
+            if token.kind == HEADING:
                 result.append("")
-                result.append(heading_style.format(text=heading_match))
+                result.append(heading_style.format(text=token.text))
                 result.append("")
             else:
                 result.append(line)
@@ -351,12 +323,77 @@ class ContentConverter:
         """
         parsed = self.parse_text_content(text)
         
+        result = []
+        
+        if not for_naver:
+            result.append(self._html_base_style())
+        
+        result.append('<div class="blog-content">')
+        
+        # 제목
+        doc_title = title or parsed.get("title", "")
+        if doc_title:
+            if for_naver:
+                result.append(self._naver_heading(doc_title, level=1))
+            else:
+                result.append(f'<h1 class="blog-title">{self._escape_html(doc_title)}</h1>')
+        
+        # 섹션 처리
+        for section in parsed.get("sections", []):
+            # 섹션 헤딩
+            if section.get("heading"):
+                heading_text = section["heading"]
+                if for_naver:
+                    result.append(self._naver_heading(heading_text, level=2))
+                else:
+                    tag = "h2" if "<h2>" in self.html_style.title else "h3"
+                    result.append(f'<{tag} class="blog-heading">{self._escape_html(heading_text)}</{tag}>')
+            
+            # 섹션 내용
+            list_buffer = []
+            for item in section.get("content", []):
+                item_type = item.get("type", "paragraph")
+                item_text = item.get("text", "")
+                
+                # 리스트 버퍼 처리
+                if item_type != "list_item" and list_buffer:
+                    result.append(self._render_list(list_buffer, for_naver))
+                    list_buffer = []
+                
+                if item_type == "question":
+                    if for_naver:
+                        result.append(self._naver_qa(item_text, is_question=True))
+                    else:
+                        result.append(f'<div class="blog-qa"><div class="question">Q. {self._escape_html(item_text)}</div>')
+                elif item_type == "answer":
+                    if for_naver:
+                        result.append(self._naver_qa(item_text, is_question=False))
+                    else:
+                        result.append(f'<div class="answer">A. {self._escape_html(item_text)}</div></div>')
+                elif item_type == "list_item":
+                    list_buffer.append(item_text)
+                elif item_type == "divider":
+                    result.append('<hr class="blog-divider">')
+                else:
+                    if for_naver:
+                        result.append(self._naver_paragraph(item_text))
+                    else:
+                        result.append(f'<p class="blog-paragraph">{self._escape_html(item_text)}</p>')
+            
+            # 남은 리스트 버퍼 처리
+            if list_buffer:
+                result.append(self._render_list(list_buffer, for_naver))
+        
+        result.append('</div>')
+        
+        return '\n'.join(result)
+    
+    def _html_base_style(self) -> str:
+        """일반 HTML용 <style> (테마 컬러/폰트 설정 반영)"""
         # 스타일 설정
         theme_color = self.THEME_COLORS.get(self.html_style.color, "#03C75A")
         font_family = self.FONTS.get(self.html_style.font, "inherit")
         
-        result = []
-        
         # 기본 스타일 정의
         base_style = f"""
 <style>
@@ -399,6 +436,13 @@ class ContentConverter:
 .blog-qa .answer {{
     color: #555;
 }}
+.blog-quote {{
+    margin: 15px 0;
+    padding: 10px 20px;
+    border-left: 4px solid #ddd;
+    color: #555;
+    font-style: italic;
+}}
 .blog-list {{
     margin: 10px 0 10px 20px;
 }}
@@ -419,69 +463,7 @@ class ContentConverter:
 }}
 </style>
 """
-        
-        if not for_naver:
-            result.append(base_style)
-        
-        result.append('<div class="blog-content">')
-        
-        # 제목
-        doc_title = title or parsed.get("title", "")
-        if doc_title:
-            if for_naver:
-                result.append(self._naver_heading(doc_title, level=1))
-            else:
-                result.append(f'<h1 class="blog-title">{self._escape_html(doc_title)}</h1>')
-        
-        # 섹션 처리
-        for section in parsed.get("sections", []):
-            # 섹션 헤딩
-            if section.get("heading"):
-                heading_text = section["heading"]
-                if for_naver:
-                    result.append(self._naver_heading(heading_text, level=2))
-                else:
-                    tag = "h2" if "<h2>" in self.html_style.title else "h3"
-                    result.append(f'<{tag} class="blog-heading">{self._escape_html(heading_text)}</{tag}>')
-            
-            # 섹션 내용
-            list_buffer = []
-            for item in section.get("content", []):
-                item_type = item.get("type", "paragraph")
-                item_text = item.get("text", "")
-                
-                # 리스트 버퍼 처리
-                if item_type != "list_item" and list_buffer:
-                    result.append(self._render_list(list_buffer, for_naver))
-                    list_buffer = []
-                
-                if item_type == "question":
-                    if for_naver:
-                        result.append(self._naver_qa(item_text, is_question=True))
-                    else:
-                        result.append(f'<div class="blog-qa"><div class="question">Q. {self._escape_html(item_text)}</div>')
-                elif item_type == "answer":
-                    if for_naver:
-                        result.append(self._naver_qa(item_text, is_question=False))
-                    else:
-                        result.append(f'<div class="answer">A. {self._escape_html(item_text)}</div></div>')
-                elif item_type == "list_item":
-                    list_buffer.append(item_text)
-                elif item_type == "divider":
-                    result.append('<hr class="blog-divider">')
-                else:
-                    if for_naver:
-                        result.append(self._naver_paragraph(item_text))
-                    else:
-                        result.append(f'<p class="blog-paragraph">{self._escape_html(item_text)}</p>')
-            
-            # 남은 리스트 버퍼 처리
-            if list_buffer:
-                result.append(self._render_list(list_buffer, for_naver))
-        
-        result.append('</div>')
-        
-        return '\n'.join(result)
+        return base_style
     
     def _escape_html(self, text: str) -> str:
         """HTML 이스케이프"""
@@ -532,21 +514,135 @@ class ContentConverter:
 </p>
 </div>'''
     
-    def _render_list(self, items: list, for_naver: bool = True) -> str:
-        """리스트 렌더링"""
+    def _render_list(self, items: list, for_naver: bool = True, ordered: bool = False) -> str:
+        """리스트 렌더링 (ordered: 번호 목록)"""
+        tag = "ol" if ordered else "ul"
         if for_naver:
             list_items = '\n'.join([
                 f'<li class="se-text-paragraph"><span class="se-fs15 se-ff1">{self._escape_html(item)}</span></li>'
                 for item in items
             ])
             return f'''<div class="se-module se-module-text">
-<ul class="se-list-ul">
+<{tag} class="se-list-{tag}">
 {list_items}
-</ul>
+</{tag}>
 </div>'''
         else:
             list_items = '\n'.join([f'<li>{self._escape_html(item)}</li>' for item in items])
-            return f'<ul class="blog-list">\n{list_items}\n</ul>'
+            return f'<{tag} class="blog-list">\n{list_items}\n</{tag}>'
+    
+    # ========== BLOCKS 변환 ==========
+    
+    def render_blocks(self, blocks: List[Dict[str, Any]], title: str = "",
+                      formats: Tuple[str, ...] = ALL_FORMATS) -> Dict[str, str]:
+        """서버가 반환한 blocks를 텍스트로 되돌려 다시 파싱하지 않고 한 번 순회하며 변환
+        
+        Args:
+            blocks: 구조화된 블록 리스트 (heading/paragraph/list/divider/quotation)
+            title: 제목
+            formats: 만들 형식 ("text", "markdown", "html", "html_naver" 중)
+        
+        Returns:
+            {형식: 변환 결과}
+        """
+        text = [] if "text" in formats else None
+        markdown = [] if "markdown" in formats else None
+        html = [] if "html" in formats else None
+        naver = [] if "html_naver" in formats else None
+        
+        heading_style = self._get_text_heading_style()
+        divider = self._get_text_divider()
+        md_heading = self._get_md_heading_prefix()
+        md_marker = self._get_md_list_marker()
+        html_heading = "h2" if "<h2>" in self.html_style.title else "h3"
+        
+        if title:
+            if text is not None:
+                text.extend([f"제목: {title}", divider])
+            if markdown is not None:
+                markdown.append(f"# {title}")
+        if html is not None:
+            html.extend([self._html_base_style(), '<div class="blog-content">'])
+            if title:
+                html.append(f'<h1 class="blog-title">{self._escape_html(title)}</h1>')
+        if naver is not None:
+            naver.append('<div class="blog-content">')
+            if title:
+                naver.append(self._naver_heading(title, level=1))
+        
+        for block in blocks:
+            block_type = block.get("type", "paragraph")
+            block_text = block.get("text", "")
+            
+            if block_type == "heading":
+                small = block.get("level", 2) > 2
+                if text is not None:
+                    text.append(f"▶ {block_text}" if small else heading_style.format(text=block_text))
+                if markdown is not None:
+                    prefix = md_heading + "#" if small and md_heading.startswith("#") else md_heading
+                    markdown.append(f"{prefix} {block_text}")
+                if html is not None:
+                    tag = "h3" if small else html_heading
+                    html.append(f'<{tag} class="blog-heading">{self._escape_html(block_text)}</{tag}>')
+                if naver is not None:
+                    naver.append(self._naver_heading(block_text, level=2))
+            
+            elif block_type == "list":
+                items = block.get("items", [])
+                ordered = block.get("style") == "number"
+                if text is not None:
+                    text.append('\n'.join(f"{i}. {item}" if ordered else f"• {item}" for i, item in enumerate(items, 1)))
+                if markdown is not None:
+                    markdown.append('\n'.join(f"{i}. {item}" if ordered else f"{md_marker} {item}" for i, item in enumerate(items, 1)))
+                if html is not None:
+                    html.append(self._render_list(items, for_naver=False, ordered=ordered))
+                if naver is not None:
+                    naver.append(self._render_list(items, for_naver=True, ordered=ordered))
+            
+            elif block_type == "divider":
+                if text is not None:
+                    text.append(divider)
+                if markdown is not None:
+                    markdown.append("---")
+                if html is not None:
+                    html.append('<hr class="blog-divider">')
+                if naver is not None:
+                    naver.append('<hr class="blog-divider">')
+            
+            elif block_type == "quotation":
+                if text is not None:
+                    text.append(f"「{block_text}」")
+                if markdown is not None:
+                    markdown.append(f"> {block_text}")
+                if html is not None:
+                    html.append(f'<blockquote class="blog-quote">{self._escape_html(block_text)}</blockquote>')
+                if naver is not None:
+                    naver.append(self.NAVER_STYLES["blockquote"].format(text=self._escape_html(block_text)))
+            
+            else:
+                # paragraph (알 수 없는 블록도 문단으로)
+                if text is not None:
+                    text.append(block_text)
+                if markdown is not None:
+                    markdown.append(block_text)
+                if html is not None:
+                    html.append(f'<p class="blog-paragraph">{self._escape_html(block_text)}</p>')
+                if naver is not None:
+                    naver.append(self._naver_paragraph(block_text))
+        
+        # 텍스트는 블록 사이에 문단 간격 설정만큼 빈 줄, 블록 안의 목록 항목은 줄바꿈만
+        result = {}
+        if text is not None:
+            result["text"] = ('\n' + self._get_text_spacing()).join(text)
+        if markdown is not None:
+            result["markdown"] = '\n\n'.join(markdown)
+        if html is not None:
+            html.append('</div>')
+            result["html"] = '\n'.join(html)
+        if naver is not None:
+            naver.append('</div>')
+            result["html_naver"] = '\n'.join(naver)
+        return result
     
     # ========== 통합 변환 ==========
     
@@ -580,6 +676,16 @@ def convert_text_to_formats(
     return converter.convert_all(text, title)
 
 
+def convert_blocks_to_formats(
+    blocks: List[Dict[str, Any]],
+    title: str = "",
+    style_settings: Optional[Dict] = None
+) -> Dict[str, str]:
+    """blocks를 여러 형식으로 변환하는 편의 함수 (텍스트 재파싱 없음)"""
+    converter = ContentConverter(style_settings)
+    return converter.render_blocks(blocks, title)
+
+
 def text_to_naver_html(text: str, title: str = "") -> str:
     """TEXT를 네이버 블로그 HTML로 변환하는 편의 함수"""
     converter = ContentConverter()
@@ -6,6 +6,8 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import re
 
+from core.block_lexer import classify, HEADING, HEADING_MARKS, QUESTION, ANSWER
+
 
 @dataclass
 class EmoticonGroup:
@@ -239,30 +241,20 @@ class EmoticonManager:
         if level == "없음" or level == "사용 안 함 (텍스트만)":
             return self._remove_emoticons(text)
         
-        lines = text.split('\n')
         result = []
         
-        for line in lines:
-            # 소제목 패턴 감지 및 이모티콘 추가
-            heading_match = re.match(r'^(【(.+?)】|▶\s*(.+)|●\s*(.+)|■\s*(.+)|※\s*(.+))', line)
-            if heading_match:
-                heading_text = heading_match.group(2) or heading_match.group(3) or \
-                              heading_match.group(4) or heading_match.group(5) or \
-                              heading_match.group(6)
-                if heading_text:
-                    emoticon = self._get_emoticon_for_heading(heading_text, level)
-                    if emoticon and emoticon not in line:
-                        # 소제목 앞에 이모티콘 추가
-                        line = re.sub(
-                            r'^(【|▶|●|■|※)\s*',
-                            f'{emoticon} \\1 ',
-                            line
-                        )
+        for line in text.split('\n'):
+            token = classify(line)
+            # 기호 소제목 앞에 이모티콘 추가 (Markdown # 소제목은 그대로)
+            if token.kind == HEADING and token.marker in HEADING_MARKS:
+                emoticon = self._get_emoticon_for_heading(token.text, level)
+                if emoticon and emoticon not in line:
+                    line = f"{emoticon} {token.marker} {line[1:].lstrip()}"
             
             # Q&A 패턴
-            if re.match(r'^Q[:.:]', line) and '❓' not in line:
+            elif token.kind == QUESTION and '❓' not in line:
                 line = '❓ ' + line
-            elif re.match(r'^A[:.:]', line) and '💡' not in line:
+            elif token.kind == ANSWER and '💡' not in line:
                 line = '💡 ' + line
             
             result.append(line)
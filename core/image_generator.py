@@ -10,6 +10,7 @@ Gemini 기반 이미지 생성 모듈
 import os
 import base64
 import logging
+import threading
 from typing import Optional, Tuple, List, Dict, Any
 from pathlib import Path
 
@@ -43,6 +44,10 @@ AVAILABLE_IMAGE_MODELS = {
 # 기본 모델
 DEFAULT_IMAGE_MODEL = os.getenv("GEMINI_IMAGE_MODEL", "gemini-2.5-flash-image")
 
+# API 키별 google-genai 클라이언트 (생성기 인스턴스 간 HTTP 커넥션 재사용)
+_genai_clients: Dict[str, Any] = {}
+_genai_clients_lock = threading.Lock()
+
 
 class GeminiImageGenerator:
     """이미지 생성기 - Gemini 및 Imagen 모델 지원"""
@@ -103,7 +108,10 @@ class GeminiImageGenerator:
             
             try:
                 from google import genai
-                self._client = genai.Client(api_key=self.api_key)
+                with _genai_clients_lock:
+                    if self.api_key not in _genai_clients:
+                        _genai_clients[self.api_key] = genai.Client(api_key=self.api_key)
+                    self._client = _genai_clients[self.api_key]
             except ImportError:
                 logger.error("google-genai 패키지가 설치되지 않았습니다.")
                 raise ImportError("pip install google-genai 명령으로 설치해주세요.")
@@ -2,23 +2,30 @@
 Automation Worker Module
 백그라운드 작업 처리를 위한 Worker Thread
 """
+import json
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Optional, Tuple
 
 import requests
 from PySide6.QtCore import QThread, Signal
 
 from automation import NaverBlogBot
 from config import Config
+from core.api_client import post_json, log_server_timing, get_session
 
 logger = logging.getLogger(__name__)
 
+# 서버가 모드를 지원하지 않을 때 400 응답 본문의 code (이 신호에만 write_stream으로 대체)
+UNSUPPORTED_MODE_CODE = "unsupported_mode"
+
 
 class AutomationWorker(QThread):
     """Background worker for blog automation tasks"""
     
     log_signal = Signal(str)
     result_signal = Signal(dict)
+    partial_result_signal = Signal(dict)  # 스트리밍 중간 결과 (완성된 블록까지)
     finished_signal = Signal()
     error_signal = Signal(str)
     progress_signal = Signal(int)
@@ -76,8 +83,10 @@ class AutomationWorker(QThread):
                 self.data['title'] = res_data.get('title', '')
                 # API 응답 키가 content 또는 content_text일 수 있음
                 self.data['content'] = res_data.get('content', '') or res_data.get('content_text', '')
+                # 구조화된 blocks는 발행까지 그대로 전달 (텍스트 재파싱 없이 에디터 서식 적용)
+                self.data['blocks'] = res_data.get('blocks') or []
                 
-                if not self.data['content']:
+                if not self.data['content'] and not self.data['blocks']:
                     self.log_signal.emit("❌ 생성된 본문 내용이 없습니다.")
                     self.finished_signal.emit()
                     return
@@ -116,7 +125,7 @@ class AutomationWorker(QThread):
         
         # Build request payload
         prompt_payload = {
-            "mode": "write",
+            "mode": "submit",
             "topic": topic,
             "prompt": f"""
                 타겟: {", ".join(self.data.get('targets', []))}
@@ -130,18 +139,41 @@ class AutomationWorker(QThread):
                 맺음말: {self.settings.get('outro', '')}
             """,
             "style_options": str(self.data.get('style_options', {})),
-            "naver_style": naver_style  # 네이버 에디터 서식 설정 추가
+            "naver_style": naver_style,  # 네이버 에디터 서식 설정 추가
+            "category": self.data.get('topic_category', '')  # 같은 카테고리의 최신 검색 자료 재사용
         }
 
         try:
-            response = requests.post(
+            # 비동기 작업으로 등록 후 long-poll (연결이 끊겨도 서버의 생성은 계속 진행)
+            kind, value = self._submit_job(prompt_payload)
+            if kind == "error":
+                self.log_signal.emit(f"❌ {value}")
+                logger.error(value)
+                return None
+            if kind in ("job", "result"):
+                result = self._wait_for_job(value) if kind == "job" else value
+                if not result:
+                    return None
+                self.log_signal.emit("✅ AI 글 생성 완료!")
+                return result
+            
+            # submit 미지원 서버 (400 unsupported_mode): 스트리밍 요청
+            prompt_payload["mode"] = "write_stream"
+            response = get_session().post(
                 Config.BACKEND_URL, 
                 json=prompt_payload, 
-                timeout=Config.API_TIMEOUT
+                timeout=(Config.API_CONNECT_TIMEOUT, Config.API_TIMEOUT),
+                stream=True
             )
+            log_server_timing(response, "write_stream")
             
             if response.status_code == 200:
-                result = response.json()
+                if "application/x-ndjson" in response.headers.get("Content-Type", ""):
+                    result = self._consume_write_stream(response)
+                else:
+                    result = response.json()
+                if not result:
+                    return None
                 self.log_signal.emit("✅ AI 글 생성 완료!")
                 return result
             else:
@@ -161,13 +193,173 @@ class AutomationWorker(QThread):
             logger.error(f"API request failed: {e}")
             return None
 
+    def _submit_job(self, payload: Dict[str, Any]) -> Tuple[str, Any]:
+        """
+        글 생성 작업 등록
+        submit을 모르는 예전 서버는 기본 모드(write)로 글을 바로 써서 200으로 돌려주므로
+        응답 시간 제한은 일반 생성 요청과 같게 두고, 받은 글은 그대로 결과로 쓴다
+        
+        Returns:
+            ("job", 작업 ID) - 작업 등록됨
+            ("result", 결과 데이터) - 서버가 바로 글을 생성해 돌려줌
+            ("unsupported", None) - 서버가 submit 미지원을 명시 (400 unsupported_mode)
+            ("error", 메시지) - 한도 초과(429), 서버 오류 등 (다시 생성하지 않음)
+        """
+        # 재시도해도 같은 멱등 키라서 작업이 중복 등록되지 않음 (429/5xx 재시도는 post_json이 처리)
+        response = post_json(payload)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        
+        if response.status_code in (200, 202) and isinstance(body, dict):
+            if body.get("job_id"):
+                return "job", body["job_id"]
+            if response.status_code == 200 and (body.get("blocks") or body.get("content_text")):
+                return "result", body
+        if response.status_code == 400 and isinstance(body, dict) and body.get("code") == UNSUPPORTED_MODE_CODE:
+            return "unsupported", None
+        if response.status_code == 429:
+            return "error", "요청 한도 초과 - 잠시 후 다시 시도하세요"
+        return "error", f"작업 등록 실패 ({response.status_code}): {response.text[:200]}"
+
+    def _wait_for_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        작업 상태를 long-poll로 조회하며 중간 블록을 partial_result_signal로 전달
+        네트워크 오류나 응답 지연으로 조회가 실패해도 작업은 서버에서 계속되므로 다시 조회한다
+        
+        Returns:
+            최종 결과 데이터 또는 None
+        """
+        deadline = time.monotonic() + Config.JOB_TIMEOUT
+        version = -1
+        failures = 0
+        received_blocks = 0
+        
+        while time.monotonic() < deadline:
+            if self._is_cancelled:
+                return None
+            
+            try:
+                response = get_session().post(
+                    Config.BACKEND_URL,
+                    json={
+                        "mode": "status",
+                        "job_id": job_id,
+                        "since_version": version,
+                        "wait_sec": Config.JOB_POLL_WAIT
+                    },
+                    timeout=(Config.API_CONNECT_TIMEOUT, Config.JOB_POLL_WAIT + 15)
+                )
+            except (requests.Timeout, requests.ConnectionError) as e:
+                failures += 1
+                if failures > 5:
+                    raise
+                logger.warning(f"Job status poll failed ({failures}): {e}")
+                time.sleep(min(2 ** failures, 10))
+                continue
+            failures = 0
+            
+            if response.status_code != 200:
+                self.log_signal.emit(f"❌ 작업 조회 실패 ({response.status_code}): {response.text[:200]}")
+                return None
+            
+            job = response.json()
+            version = job.get("version", version)
+            status = job.get("status")
+            
+            if status == "done":
+                result = get_session().post(
+                    Config.BACKEND_URL,
+                    json={"mode": "result", "job_id": job_id},
+                    timeout=(Config.API_CONNECT_TIMEOUT, 30)
+                )
+                if result.status_code == 200:
+                    return result.json()
+                self.log_signal.emit(f"❌ 결과 조회 실패 ({result.status_code})")
+                return None
+            
+            if status == "error":
+                self.log_signal.emit(f"❌ {job.get('error') or '글 생성 실패'}")
+                return None
+            
+            blocks = job.get("blocks") or []
+            if len(blocks) > received_blocks:
+                if received_blocks == 0:
+                    self.log_signal.emit("✍️ 본문 수신 중...")
+                received_blocks = len(blocks)
+                self.partial_result_signal.emit({
+                    "title": job.get("title") or self.data.get('topic', ''),
+                    "blocks": blocks,
+                    "content_text": job.get("content_text", "")
+                })
+        
+        self.log_signal.emit(f"❌ 작업 대기 시간 초과 (작업 ID: {job_id})")
+        return None
+
+    def _consume_write_stream(self, response) -> Optional[Dict[str, Any]]:
+        """
+        write_stream NDJSON 응답 처리
+        블록이 완성될 때마다 partial_result_signal로 중간 결과를 전달
+        
+        Returns:
+            최종 결과 데이터 (done 이벤트) 또는 None
+        """
+        title = self.data.get('topic', '')
+        blocks = []
+        texts = []
+        
+        for line in response.iter_lines():
+            if self._is_cancelled:
+                response.close()
+                return None
+            if not line:
+                continue
+            
+            event = json.loads(line.decode('utf-8'))
+            event_type = event.get("event")
+            
+            if event_type == "title":
+                title = event.get("title", title)
+            elif event_type == "block":
+                blocks.append(event.get("block", {}))
+                texts.append(event.get("text", ""))
+                if len(blocks) == 1:
+                    self.log_signal.emit("✍️ 본문 수신 중...")
+                self.partial_result_signal.emit({
+                    "title": title,
+                    "blocks": list(blocks),
+                    "content_text": "\n".join(texts).strip()
+                })
+            elif event_type == "done":
+                event.pop("event", None)
+                return event
+            elif event_type == "error":
+                self.log_signal.emit(f"❌ {event.get('error', '글 생성 실패')}")
+                return None
+        
+        # done 이벤트 없이 스트림이 끊긴 경우: 수신한 블록까지 사용
+        if blocks:
+            self.log_signal.emit("⚠️ 응답이 중간에 끊겨 수신된 부분까지만 사용합니다.")
+            content_text = "\n".join(texts).strip()
+            return {
+                "title": title,
+                "blocks": blocks,
+                "content_text": content_text,
+                "content": content_text
+            }
+        
+        self.log_signal.emit("❌ 서버 응답이 비어 있습니다.")
+        return None
+
     def _run_publish_only(self):
         """Execute blog publishing"""
         title = self.data.get('title', '')
         content = self.data.get('content', '')
+        blocks = self.data.get('blocks') or []
         category = self.data.get('category', '') or self.settings.get('default_category', '')
         
-        if not title or not content:
+        if not title or not (content or blocks):
             self.log_signal.emit("❌ 발행할 내용이 없습니다.")
             return
 
@@ -227,7 +419,10 @@ class AutomationWorker(QThread):
             self.log_signal.emit("✍️ 본문 작성 중...")
             self.progress_signal.emit(85)
             
-            success, msg = self.bot.write_content(title, content)
+            if blocks:
+                success, msg = self.bot.write_content_with_blocks(title, blocks)
+            else:
+                success, msg = self.bot.write_content(title, content)
             if not success:
                 self.log_signal.emit(f"❌ 작성 실패: {msg}")
                 return
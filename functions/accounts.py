@@ -0,0 +1,490 @@
+"""
+사용자 계정 / 권한 / 이미지 사용량
+Firestore와 Auth만 사용하는 가벼운 모듈 - 모델 SDK를 불러오지 않으므로
+계정 모드(register_user, user_info)는 생성 모듈 없이 처리된다
+"""
+import hashlib
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from firebase_functions import https_fn
+from firebase_admin import firestore, auth
+
+from json_response import json_response
+from tracing import span
+from ttl_cache import TTLCache
+from usage_ledger import KST, create_usage_ledger, usage_date
+
+# 사용량 제한 설정
+DAILY_IMAGE_LIMIT = 20  # 일반회원 일일 제한
+MONTHLY_IMAGE_LIMIT = 500  # 일반회원 월간 제한
+
+# 관리자 한도 (사실상 무제한)
+ADMIN_LIMITS = {"daily": 999999, "monthly": 9999999}
+
+# 사용자 플래그(is_active/is_admin) 인스턴스 캐시 유효시간 (초)
+USER_FLAGS_CACHE_TTL = 60
+
+# 검증된 ID 토큰 캐시 최대 항목 수 (항목은 토큰의 exp까지 유효)
+TOKEN_CACHE_SIZE = 1024
+
+# 가입 승인 안내
+APPROVAL_CONTACT = "https://open.kakao.com/o/sgbYdyai"
+
+# 토큰/Grounding 사용량 장부 저장소 ("firestore", "memory", "off") 및 미저장분 최대 보관 시간 (초, 요청 경로에서 저장 시작)
+USAGE_LEDGER_BACKEND = os.environ.get("USAGE_LEDGER_BACKEND", "firestore")
+USAGE_FLUSH_INTERVAL = float(os.environ.get("USAGE_FLUSH_INTERVAL", "30"))
+
+# usage_report 최대 조회 기간 (일)
+USAGE_REPORT_MAX_DAYS = 31
+
+# Firestore 클라이언트 (lazy initialization)
+_db = None
+
+def get_db():
+    """Firestore 클라이언트를 필요할 때만 초기화"""
+    global _db
+    if _db is None:
+        _db = firestore.client()
+    return _db
+
+
+# 모델 호출 사용량 장부 (genai_pool이 호출마다 기록)
+usage_ledger = create_usage_ledger(USAGE_LEDGER_BACKEND, get_db, USAGE_FLUSH_INTERVAL)
+
+
+# 검증된 토큰 캐시: sha256(token) -> {"uid", "email"}
+_token_cache = TTLCache(max_size=TOKEN_CACHE_SIZE)
+
+
+def verify_user_token(req: https_fn.Request, check_revoked: bool = False) -> dict:
+    """
+    Firebase Auth 토큰 검증
+    
+    한 번 검증된 토큰은 만료(exp)까지 캐시하여 재검증을 생략한다.
+    
+    Args:
+        check_revoked: True면 캐시를 쓰지 않고 토큰 폐기 여부까지 확인 (민감한 모드용)
+    """
+    auth_header = req.headers.get("Authorization", "")
+    
+    if not auth_header.startswith("Bearer "):
+        return None
+    
+    token = auth_header.split("Bearer ")[1]
+    token_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    
+    if not check_revoked:
+        cached = _token_cache.get(token_key)
+        if cached is not None:
+            return dict(cached)
+    
+    try:
+        with span("auth.verify"):
+            decoded_token = auth.verify_id_token(token, check_revoked=check_revoked)
+        user = {
+            "uid": decoded_token["uid"],
+            "email": decoded_token.get("email", "")
+        }
+        _token_cache.set(token_key, user, expires_at=decoded_token["exp"])
+        return dict(user)
+    except Exception as e:
+        _token_cache.delete(token_key)
+        logging.error(f"Token verification failed: {e}")
+        return None
+
+
+def get_token_cache_stats() -> dict:
+    """토큰 캐시 hit/miss 통계 조회"""
+    return _token_cache.stats()
+
+
+def check_user_permission(uid: str) -> dict:
+    """사용자 권한 및 사용량 체크"""
+    try:
+        db = get_db()
+        user_ref = db.collection("users").document(uid)
+        with span("firestore.user_read"):
+            user_doc = user_ref.get()
+        
+        if not user_doc.exists:
+            # 새 사용자 생성
+            user_data = {
+                "created_at": datetime.now(),
+                "is_active": False,
+                "is_admin": False,
+                "daily_image_count": 0,
+                "monthly_image_count": 0,
+                "last_reset_date": datetime.now().strftime("%Y-%m-%d"),
+                "last_reset_month": datetime.now().strftime("%Y-%m")
+            }
+            with span("firestore.user_create"):
+                user_ref.set(user_data)
+            return {
+                "allowed": False,
+                "reason": f"관리자 승인이 필요합니다. 오픈카톡으로 문의해주세요: {APPROVAL_CONTACT}",
+                "usage": user_data
+            }
+        
+        user_data = user_doc.to_dict()
+        cache_user_flags(uid, user_data)
+        
+        # 활성화 체크
+        if not user_data.get("is_active", False):
+            return {
+                "allowed": False,
+                "reason": f"관리자 승인 대기 중입니다. 오픈카톡으로 문의해주세요: {APPROVAL_CONTACT}",
+                "usage": user_data
+            }
+        
+        # 일일/월간 리셋 체크 (한 번의 update로 처리)
+        resets = get_usage_resets(user_data)
+        if resets:
+            with span("firestore.usage_reset"):
+                user_ref.update(resets)
+            user_data.update(resets)
+        
+        # 관리자인지 확인
+        is_admin = user_data.get("is_admin", False)
+        
+        if is_admin:
+            # 관리자는 무제한
+            plan_limits = ADMIN_LIMITS
+        else:
+            # 일반 회원 제한: 하루 20개, 한달 500개
+            plan_limits = {"daily": DAILY_IMAGE_LIMIT, "monthly": MONTHLY_IMAGE_LIMIT}
+            
+            # 일일 제한 체크
+            if user_data.get("daily_image_count", 0) >= DAILY_IMAGE_LIMIT:
+                return {
+                    "allowed": False,
+                    "reason": f"일일 이미지 생성 한도({DAILY_IMAGE_LIMIT}장)를 초과했습니다. 내일 다시 시도해주세요.",
+                    "usage": user_data,
+                    "limits": plan_limits
+                }
+            
+            # 월간 제한 체크
+            if user_data.get("monthly_image_count", 0) >= MONTHLY_IMAGE_LIMIT:
+                return {
+                    "allowed": False,
+                    "reason": f"월간 이미지 생성 한도({MONTHLY_IMAGE_LIMIT}장)를 초과했습니다. 다음 달에 다시 시도해주세요.",
+                    "usage": user_data,
+                    "limits": plan_limits
+                }
+        
+        return {
+            "allowed": True,
+            "reason": "OK",
+            "usage": user_data,
+            "limits": plan_limits,
+            "is_admin": is_admin
+        }
+        
+    except Exception as e:
+        logging.error(f"Permission check failed: {e}")
+        return {
+            "allowed": False,
+            "reason": f"권한 확인 중 오류: {str(e)}",
+            "usage": {}
+        }
+
+
+def get_usage_resets(user_data: dict) -> dict:
+    """날짜/월이 바뀌었으면 초기화해야 할 사용량 필드 반환 (없으면 빈 dict)"""
+    resets = {}
+    
+    today = datetime.now().strftime("%Y-%m-%d")
+    if user_data.get("last_reset_date") != today:
+        resets["daily_image_count"] = 0
+        resets["last_reset_date"] = today
+    
+    this_month = datetime.now().strftime("%Y-%m")
+    if user_data.get("last_reset_month") != this_month:
+        resets["monthly_image_count"] = 0
+        resets["last_reset_month"] = this_month
+    
+    return resets
+
+
+# 사용자 플래그 캐시: uid -> {"is_active", "is_admin"}
+_user_flags_cache = TTLCache(ttl=USER_FLAGS_CACHE_TTL)
+
+
+def get_cached_user_flags(uid: str):
+    """캐시된 is_active/is_admin 플래그 반환 (없거나 만료되면 None)"""
+    return _user_flags_cache.get(uid)
+
+
+def cache_user_flags(uid: str, user_data: dict):
+    """사용자 문서에서 읽은 is_active/is_admin/plan 플래그를 짧게 캐시"""
+    _user_flags_cache.set(uid, {
+        "is_active": user_data.get("is_active", False),
+        "is_admin": user_data.get("is_admin", False),
+        "plan": user_data.get("plan", "free")
+    })
+
+
+def reserve_image_quota(uid: str, count: int = 1) -> dict:
+    """
+    이미지 사용량 예약 - 리셋, 한도 체크, N장 차감을 하나의 트랜잭션으로 처리
+    
+    동시 요청이 함께 한도 체크를 통과하는 것을 막고, 요청당 Firestore 왕복을 줄인다.
+    생성에 실패하면 refund_image_quota로 되돌린다.
+    
+    Returns:
+        check_user_permission과 같은 형식 (usage는 예약 반영 후 값)
+    """
+    # 비활성 사용자로 캐시되어 있으면 Firestore 조회 없이 거절
+    flags = get_cached_user_flags(uid)
+    if flags is not None and not flags["is_active"]:
+        return {
+            "allowed": False,
+            "reason": f"관리자 승인 대기 중입니다. 오픈카톡으로 문의해주세요: {APPROVAL_CONTACT}",
+            "usage": dict(flags)
+        }
+    
+    try:
+        db = get_db()
+        user_ref = db.collection("users").document(uid)
+        
+        @firestore.transactional
+        def _reserve(transaction):
+            snapshot = user_ref.get(transaction=transaction)
+            
+            if not snapshot.exists:
+                # 새 사용자 생성
+                user_data = {
+                    "created_at": datetime.now(),
+                    "is_active": False,
+                    "is_admin": False,
+                    "daily_image_count": 0,
+                    "monthly_image_count": 0,
+                    "last_reset_date": datetime.now().strftime("%Y-%m-%d"),
+                    "last_reset_month": datetime.now().strftime("%Y-%m")
+                }
+                transaction.set(user_ref, user_data)
+                return {
+                    "allowed": False,
+                    "reason": f"관리자 승인이 필요합니다. 오픈카톡으로 문의해주세요: {APPROVAL_CONTACT}",
+                    "usage": user_data
+                }
+            
+            user_data = snapshot.to_dict()
+            cache_user_flags(uid, user_data)
+            
+            if not user_data.get("is_active", False):
+                return {
+                    "allowed": False,
+                    "reason": f"관리자 승인 대기 중입니다. 오픈카톡으로 문의해주세요: {APPROVAL_CONTACT}",
+                    "usage": user_data
+                }
+            
+            updates = get_usage_resets(user_data)
+            user_data.update(updates)
+            
+            is_admin = user_data.get("is_admin", False)
+            if is_admin:
+                plan_limits = ADMIN_LIMITS
+            else:
+                plan_limits = {"daily": DAILY_IMAGE_LIMIT, "monthly": MONTHLY_IMAGE_LIMIT}
+                denied_reason = None
+                
+                if user_data.get("daily_image_count", 0) + count > DAILY_IMAGE_LIMIT:
+                    denied_reason = f"일일 이미지 생성 한도({DAILY_IMAGE_LIMIT}장)를 초과했습니다. 내일 다시 시도해주세요."
+                elif user_data.get("monthly_image_count", 0) + count > MONTHLY_IMAGE_LIMIT:
+                    denied_reason = f"월간 이미지 생성 한도({MONTHLY_IMAGE_LIMIT}장)를 초과했습니다. 다음 달에 다시 시도해주세요."
+                
+                if denied_reason:
+                    if updates:
+                        transaction.update(user_ref, updates)
+                    return {
+                        "allowed": False,
+                        "reason": denied_reason,
+                        "usage": user_data,
+                        "limits": plan_limits
+                    }
+            
+            # 예약: 리셋된 값 기준으로 N장 차감
+            updates["daily_image_count"] = user_data.get("daily_image_count", 0) + count
+            updates["monthly_image_count"] = user_data.get("monthly_image_count", 0) + count
+            transaction.update(user_ref, updates)
+            user_data.update(updates)
+            
+            return {
+                "allowed": True,
+                "reason": "OK",
+                "usage": user_data,
+                "limits": plan_limits,
+                "is_admin": is_admin,
+                "reserved": count,
+                "reserved_date": user_data["last_reset_date"],
+                "reserved_month": user_data["last_reset_month"]
+            }
+        
+        with span("firestore.reserve_quota"):
+            return _reserve(db.transaction())
+        
+    except Exception as e:
+        logging.error(f"Quota reservation failed: {e}")
+        return {
+            "allowed": False,
+            "reason": f"권한 확인 중 오류: {str(e)}",
+            "usage": {}
+        }
+
+
+def summarize_image_usage(permission: dict) -> dict:
+    """예약 후 사용량/한도를 응답용 요약으로 변환"""
+    return {
+        "daily_used": permission["usage"].get("daily_image_count", 0),
+        "daily_limit": permission["limits"]["daily"],
+        "monthly_used": permission["usage"].get("monthly_image_count", 0),
+        "monthly_limit": permission["limits"]["monthly"]
+    }
+
+
+def refund_image_quota(uid: str, reservation: dict):
+    """
+    생성 실패 시 reserve_image_quota로 예약한 사용량을 되돌림
+    예약 이후 일/월이 바뀌어 카운터가 리셋됐다면 해당 카운터는 건드리지 않는다
+    """
+    count = reservation.get("reserved", 0)
+    if not count:
+        return
+    
+    try:
+        db = get_db()
+        user_ref = db.collection("users").document(uid)
+        
+        @firestore.transactional
+        def _refund(transaction):
+            snapshot = user_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return
+            user_data = snapshot.to_dict()
+            
+            updates = {}
+            if user_data.get("last_reset_date") == reservation.get("reserved_date"):
+                updates["daily_image_count"] = max(0, user_data.get("daily_image_count", 0) - count)
+            if user_data.get("last_reset_month") == reservation.get("reserved_month"):
+                updates["monthly_image_count"] = max(0, user_data.get("monthly_image_count", 0) - count)
+            if updates:
+                transaction.update(user_ref, updates)
+        
+        with span("firestore.refund_quota"):
+            _refund(db.transaction())
+        
+    except Exception as e:
+        logging.error(f"Failed to refund usage: {e}")
+
+
+def handle_register_user(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 0] 회원가입 시 Firestore 문서 생성 (인증 토큰으로)"""
+    # 토큰 검증 (계정 생성은 폐기된 토큰까지 확인)
+    user = verify_user_token(req, check_revoked=True)
+    if not user:
+        return json_response({"error": "유효하지 않은 토큰입니다."}, status=401)
+    
+    uid = user["uid"]
+    email = user.get("email", "")
+    
+    try:
+        db = get_db()
+        user_ref = db.collection("users").document(uid)
+        with span("firestore.user_read"):
+            user_doc = user_ref.get()
+        
+        if user_doc.exists:
+            # 이미 문서가 있으면 그냥 반환
+            return json_response({"success": True, "message": "이미 등록된 사용자입니다.", "uid": uid})
+        
+        # 새 사용자 문서 생성
+        user_data = {
+            "email": email,
+            "created_at": datetime.now(),
+            "is_active": False,  # 관리자 승인 필요
+            "is_admin": False,
+            "daily_image_count": 0,
+            "monthly_image_count": 0,
+            "last_reset_date": datetime.now().strftime("%Y-%m-%d"),
+            "last_reset_month": datetime.now().strftime("%Y-%m")
+        }
+        with span("firestore.user_create"):
+            user_ref.set(user_data)
+        
+        return json_response({
+            "success": True, 
+            "message": "회원가입 완료! 관리자 승인 후 이용 가능합니다.",
+            "uid": uid,
+            "contact": APPROVAL_CONTACT
+        })
+        
+    except Exception as e:
+        logging.error(f"Register user failed: {e}")
+        return json_response({"error": f"사용자 등록 실패: {str(e)}"}, status=500)
+
+
+def handle_user_info(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 4] 사용자 정보 조회"""
+    user = verify_user_token(req)
+    if not user:
+        return json_response({"error": "인증이 필요합니다."}, status=401)
+    
+    permission = check_user_permission(user["uid"])
+    
+    return json_response({
+        "uid": user["uid"],
+        "email": user["email"],
+        "is_active": permission["usage"].get("is_active", False),
+        "plan": permission["usage"].get("plan", "free"),
+        "usage": {
+            "daily_image_count": permission["usage"].get("daily_image_count", 0),
+            "monthly_image_count": permission["usage"].get("monthly_image_count", 0)
+        }
+    })
+
+
+def collect_instance_stats() -> dict:
+    """
+    이 인스턴스의 캐시/최적화 효과 통계 (인스턴스 메모리 기준, usage_report에 함께 반환)
+    생성 모듈 통계는 이 인스턴스가 생성 모드를 처리해 모듈을 불러온 경우만 포함
+    """
+    stats = {}
+    generation = sys.modules.get("generation")
+    if generation is not None:
+        stats["grounding"] = generation.get_grounding_stats()
+        stats["hedging"] = generation.hedger.stats()
+    return stats
+
+
+def handle_usage_report(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 4-1] 토큰/Grounding 사용량 집계 조회 (관리자 전용)"""
+    user = verify_user_token(req)
+    if not user:
+        return json_response({"error": "인증이 필요합니다."}, status=401)
+    
+    # 관리자 여부는 캐시 없이 사용자 문서로 확인
+    permission = check_user_permission(user["uid"])
+    if not permission["usage"].get("is_admin", False):
+        return json_response({"error": "관리자만 조회할 수 있습니다."}, status=403)
+    
+    if usage_ledger is None:
+        return json_response({"error": "사용량 장부가 비활성화되어 있습니다."}, status=503)
+    
+    try:
+        days = max(1, min(int(req_json.get("days", 7)), USAGE_REPORT_MAX_DAYS))
+        end = datetime.strptime(req_json["date"], "%Y-%m-%d") if req_json.get("date") else datetime.now(KST)
+    except (TypeError, ValueError):
+        return json_response({"error": "days는 숫자, date는 YYYY-MM-DD 형식이어야 합니다."}, status=400)
+    dates = [usage_date(end - timedelta(days=offset)) for offset in range(days)]
+    
+    try:
+        with span("firestore.usage_report"):
+            report = usage_ledger.report(dates, req_json.get("user") or None)
+    except Exception as e:
+        logging.error(f"Usage report failed: {e}")
+        return json_response({"error": f"사용량 조회 실패: {str(e)}"}, status=500)
+    
+    report["instance"] = collect_instance_stats()
+    return json_response(report, default=str)
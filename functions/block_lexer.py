@@ -0,0 +1,156 @@
+"""
+텍스트 본문 블록 문법 (【소제목】 / ▶ / • / 1. / 「인용」 / ━━━)
+줄마다 미리 컴파일한 정규식 하나(alternation)로 종류를 판별하고, 표준 blocks 구조로 변환한다.
+
+원본은 functions/block_lexer.py (Cloud Function, generation)이고 core/block_lexer.py는 데스크톱 앱
+(core.content_converter, core.emoticon_manager)용 복사본이다. 함수 배포에는 functions/만, 앱 패키징에는
+core/만 들어가므로 두 파일을 똑같이 유지한다 (scripts/block_lexer_bench.py --check-only가 비교).
+양쪽에서 쓰므로 표준 라이브러리 외의 모듈은 import 하지 않는다.
+
+이 문법으로 통일하면서 예전 구현과 달라진 해석 (의도적 변경, block_lexer_bench가 기대값으로 확인):
+- 서버 convert_text_to_blocks
+  - "### x"는 작은 소제목(level 3), "●/■/※ x"도 소제목
+  - "1) x" 번호 목록, "* x" 불릿 목록
+  - "---", "━━━", "- - - - -"는 구분선 (기호 3개 이상, 사이 공백 허용)
+  - "#태그", "-5도", "2024.01.01", "1.항목"(번호 뒤 공백 없음), "1000. x"(네 자리 번호)는 문단
+- 데스크톱 parse_text_content / format_text / apply_emoticons_to_text
+  - "▸ x"는 목록 항목, "1000. x"는 문단
+  - "Q：x"(전각 콜론)는 질문, 이모티콘은 "질문:"/"답변:" 줄에도 ❓/💡
+  - "【소제목】 뒤에 글"처럼 】 뒤에 글이 이어지는 줄은 소제목이 아닌 문단
+  - format_text는 "## x"/"### x"도 소제목 스타일로 바꿈
+  - 번호 목록 항목의 "." 찌꺼기 제거 ("1. 항목" → "항목")
+"""
+import re
+from collections import namedtuple
+
+# 줄 종류
+HEADING = "heading"
+DIVIDER = "divider"
+BULLET = "bullet"
+NUMBER = "number"
+QUOTE = "quote"
+QUESTION = "question"
+ANSWER = "answer"
+TEXT = "text"
+BLANK = "blank"
+
+# 기호로 시작하는 소제목 (텍스트 스타일 설정의 소제목 기호와 같음)
+HEADING_MARKS = "【▶●■※"
+
+# 줄 1개 = Token(종류, 기호를 뺀 본문, 기호)
+# 기호: 소제목 "【"/"▶"/"#"~"###", 목록 "•"/"-"/번호, 인용 "「"/">", Q&A "Q"/"A"
+Token = namedtuple("Token", ["kind", "text", "marker"])
+
+# 앞쪽 대안이 우선 (구분선 "- - -"은 목록보다, 소제목은 다른 모든 종류보다 먼저 판별)
+LINE_PATTERN = re.compile(r"""
+    (?P<heading>
+        (?P<bracket>【)(?P<bracketed>.+?)】\s*$
+      | (?P<mark>[▶●■※])\s*(?P<marked>.+)
+      | (?P<hashes>\#{1,3})\s+(?P<hashed>.+)
+    )
+  | (?P<divider>[━─═\-](?:\s*[━─═\-]){2,}\s*$)
+  | (?P<bullet>(?P<dot>[•▸])\s*(?P<dotted>.+) | (?P<dash>[-*])\s+(?P<dashed>.+))
+  | (?P<number>(?P<ordinal>\d{1,3})[.)]\s+(?P<numbered>.+))
+  | (?P<quote>(?P<corner>「)(?P<cornered>.+?)」\s*$ | (?P<angle>>)\s*(?P<angled>.+))
+  | (?P<question>(?:Q[:.：]|질문\s*[:：])\s*(?P<asked>.*))
+  | (?P<answer>(?:A[:.：]|답변\s*[:：])\s*(?P<answered>.*))
+""", re.VERBOSE)
+
+# LINE_PATTERN 대안이 시작할 수 있는 첫 글자 (그 외 글자로 시작하는 줄은 정규식 없이 일반 텍스트)
+_START_CHARS = frozenset("【▶●■※#━─═-•▸*「>QA질답0123456789")
+
+# 종류별 (기호 그룹, 본문 그룹) 후보 - 매칭된 대안의 그룹만 값이 있음
+_GROUPS = {
+    HEADING: (("bracket", "bracketed"), ("mark", "marked"), ("hashes", "hashed")),
+    BULLET: (("dot", "dotted"), ("dash", "dashed")),
+    NUMBER: (("ordinal", "numbered"),),
+    QUOTE: (("corner", "cornered"), ("angle", "angled")),
+    QUESTION: ((None, "asked"),),
+    ANSWER: ((None, "answered"),),
+}
+_FIXED_MARKERS = {QUESTION: "Q", ANSWER: "A"}
+
+
+def _match(line: str):
+    """줄 앞글자로 거른 뒤 LINE_PATTERN 매칭 (기호로 시작하지 않으면 None)"""
+    return LINE_PATTERN.match(line) if line[0] in _START_CHARS else None
+
+
+def _token(match, line: str) -> Token:
+    kind = match.lastgroup
+    if kind == DIVIDER:
+        return Token(DIVIDER, "", line.strip()[0])
+    for marker_group, text_group in _GROUPS[kind]:
+        text = match.group(text_group)
+        if text is not None:
+            marker = match.group(marker_group) if marker_group else _FIXED_MARKERS[kind]
+            return Token(kind, text.strip(), marker)
+    return Token(TEXT, line, "")
+
+
+def classify(line: str) -> Token:
+    """
+    줄 1개의 종류 판별 (앞뒤 공백은 호출하는 쪽에서 정리)
+    앞에 공백이 있는 줄은 기호로 시작하지 않으므로 일반 텍스트
+    """
+    if not line or line.isspace():
+        return Token(BLANK, "", "")
+    match = _match(line)
+    return _token(match, line) if match is not None else Token(TEXT, line, "")
+
+
+def tokenize(text: str, strip: bool = True):
+    """
+    본문을 줄 단위 Token으로 (한 번만 순회)
+
+    Args:
+        strip: 줄 앞뒤 공백 제거 후 판별 (False면 원래 줄 그대로 - 들여쓴 줄은 일반 텍스트)
+    """
+    for line in text.split("\n"):
+        yield classify(line.strip() if strip else line)
+
+
+def heading_level(token: Token) -> int:
+    """소제목 블록 level ("###"만 작은 소제목 3, 나머지는 2)"""
+    return 3 if token.marker == "###" else 2
+
+
+def lex_blocks(text: str) -> list:
+    """
+    텍스트 본문을 표준 blocks 구조로 변환
+    (빈 줄/소제목/구분선/목록/인용 사이의 연속된 줄은 공백으로 이어 한 문단, 연속된 같은 종류 목록은 한 블록)
+    """
+    blocks = []
+    paragraph = []
+
+    for line in text.split("\n"):
+        line = line.strip()
+        match = _match(line) if line else None
+        # 일반 텍스트와 Q&A 줄은 문단으로 이어 붙임
+        if line and (match is None or match.lastgroup in (QUESTION, ANSWER)):
+            paragraph.append(line)
+            continue
+        if paragraph:
+            blocks.append({"type": "paragraph", "text": " ".join(paragraph)})
+            paragraph = []
+        if match is None:
+            continue
+        token = _token(match, line)
+        kind = token.kind
+        if kind == HEADING:
+            blocks.append({"type": "heading", "text": token.text, "level": heading_level(token)})
+        elif kind == DIVIDER:
+            blocks.append({"type": "divider"})
+        elif kind == BULLET or kind == NUMBER:
+            style = "bullet" if kind == BULLET else "number"
+            last = blocks[-1] if blocks else None
+            if last is not None and last["type"] == "list" and last["style"] == style:
+                last["items"].append(token.text)
+            else:
+                blocks.append({"type": "list", "style": style, "items": [token.text]})
+        elif kind == QUOTE:
+            blocks.append({"type": "quotation", "text": token.text})
+    if paragraph:
+        blocks.append({"type": "paragraph", "text": " ".join(paragraph)})
+
+    return blocks if blocks else [{"type": "paragraph", "text": text}]
@@ -0,0 +1,279 @@
+"""
+Gemini 클라이언트 풀
+웜 인스턴스에서 요청 간 genai.Client를 재사용하여 HTTP 커넥션(TLS 세션)을 유지하고,
+모델별 호출 지연시간/토큰 사용량/오류 수를 인스턴스 메모리에 집계한다
+(사용자/모드별 토큰/Grounding 사용량은 usage_ledger 장부에 기록)
+모든 호출은 모델별 토큰 버킷 스케줄러를 거치며 429/503은 백오프 후 재시도한다
+"""
+import os
+import threading
+import time
+import logging
+
+from google import genai
+
+from rate_limiter import (
+    DeadlineExceeded, ModelScheduler, RateLimitExceeded, RETRYABLE_STATUS,
+    backoff_delay, call_with_backoff, error_retry_after, error_status, remaining_call_time
+)
+from accounts import usage_ledger
+from tracing import current_trace, span
+from usage_ledger import grounding_call_count
+
+
+class ModelStats:
+    """모델별 호출 통계 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def record(self, model: str, latency: float, usage=None, error: bool = False):
+        """호출 1건 기록"""
+        with self._lock:
+            stats = self._models.setdefault(model, {
+                "calls": 0,
+                "errors": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+                "prompt_tokens": 0,
+                "candidate_tokens": 0,
+                "total_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            if error:
+                stats["errors"] += 1
+            if usage is not None:
+                stats["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+                stats["candidate_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+                stats["total_tokens"] += getattr(usage, "total_token_count", 0) or 0
+
+    def snapshot(self) -> dict:
+        """현재까지의 통계 사본 (평균 지연시간 포함)"""
+        with self._lock:
+            result = {}
+            for model, stats in self._models.items():
+                item = dict(stats)
+                item["avg_latency"] = stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0
+                result[model] = item
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+
+# 인스턴스 전역 통계
+MODEL_STATS = ModelStats()
+
+
+def parse_rate_limits(value: str) -> dict:
+    """
+    모델별 호출 한도 설정 파싱
+    형식: "모델=분당요청수/버스트,모델=분당요청수/버스트"
+    """
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        model, spec = item.split("=", 1)
+        rpm, _, burst = spec.partition("/")
+        try:
+            limits[model.strip()] = (float(rpm), float(burst or rpm))
+        except ValueError:
+            logging.warning(f"Invalid rate limit spec: {item}")
+    return limits
+
+
+# 인스턴스 전역 스케줄러 (한도는 인스턴스 단위, 환경변수로 조정)
+MODEL_SCHEDULER = ModelScheduler(
+    limits=parse_rate_limits(os.environ.get(
+        "GEMINI_RATE_LIMITS",
+        "gemini-2.0-flash=60/10,gemini-2.0-flash-exp-image-generation=10/3"
+    )),
+    default_rpm=float(os.environ.get("GEMINI_DEFAULT_RPM", "60"))
+)
+
+# 429/503 최대 재시도 횟수
+MAX_RETRIES = 3
+
+# 대기열 최대 대기 (초, call_deadline이 있으면 남은 시간까지)
+QUEUE_TIMEOUT = 60.0
+
+
+def bounded_call_kwargs(model: str, kwargs: dict) -> dict:
+    """
+    call_deadline이 설정된 작업이면 남은 시간을 HTTP 요청 제한시간으로 넣은 호출 인자
+    (마감 후에는 호출을 보내지 않고 DeadlineExceeded, 진행 중인 요청은 SDK가 제한시간에 끊는다)
+    """
+    remaining = remaining_call_time()
+    if remaining is None:
+        return kwargs
+    if remaining <= 0:
+        raise DeadlineExceeded(f"{model} 호출 마감 시간 초과")
+    http_options = genai.types.HttpOptions(timeout=max(1, int(remaining * 1000)))
+    config = kwargs.get("config")
+    if config is None:
+        config = genai.types.GenerateContentConfig(http_options=http_options)
+    else:
+        config = config.model_copy(update={"http_options": http_options})
+    return dict(kwargs, config=config)
+
+
+def queue_timeout() -> float:
+    """이번 호출의 대기열 최대 대기 (초)"""
+    remaining = remaining_call_time()
+    return QUEUE_TIMEOUT if remaining is None else max(0.0, min(QUEUE_TIMEOUT, remaining))
+
+
+class _InstrumentedModels:
+    """client.models 호출을 스케줄러에 통과시키고 통계를 기록하는 프록시"""
+
+    def __init__(self, models, stats: ModelStats, scheduler: ModelScheduler, ledger=None):
+        self._models = models
+        self._stats = stats
+        self._scheduler = scheduler
+        self._ledger = ledger
+
+    def _record(self, model: str, latency: float, usage=None, error: bool = False, grounding_calls: int = 0):
+        self._stats.record(model, latency, usage, error=error)
+        if self._ledger is not None:
+            self._ledger.record(model, usage, grounding_calls, latency, error=error)
+
+    def generate_content(self, *, model: str, **kwargs):
+        started = time.monotonic()
+
+        def _call():
+            call_kwargs = bounded_call_kwargs(model, kwargs)
+            with span("model.call", model=model):
+                return self._models.generate_content(model=model, **call_kwargs)
+
+        try:
+            response = call_with_backoff(
+                self._scheduler, model, _call, max_retries=MAX_RETRIES, queue_timeout=queue_timeout()
+            )
+        except Exception:
+            self._record(model, time.monotonic() - started, error=True)
+            raise
+        self._record(
+            model, time.monotonic() - started, getattr(response, "usage_metadata", None),
+            grounding_calls=grounding_call_count(kwargs.get("config"), response)
+        )
+        return response
+
+    def generate_content_stream(self, *, model: str, **kwargs):
+        started = time.monotonic()
+        trace = current_trace.get()
+        usage = None
+        grounding_calls = 0
+        error = False
+        attempt = 0
+        try:
+            while True:
+                with span("model.queue", model=model):
+                    self._scheduler.acquire(model, timeout=queue_timeout())
+                received = False
+                call_started = time.perf_counter()
+                try:
+                    for chunk in self._models.generate_content_stream(model=model, **bounded_call_kwargs(model, kwargs)):
+                        if not received and trace is not None:
+                            # 스트림은 응답 이후에도 이어지므로 첫 청크까지만 span으로 기록
+                            trace.add("model.first_chunk", call_started, time.perf_counter() - call_started, model=model)
+                        received = True
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        grounding_calls = grounding_calls or grounding_call_count(kwargs.get("config"), chunk)
+                        yield chunk
+                    return
+                except Exception as e:
+                    # 첫 청크를 받기 전의 429/503만 재시도 (이미 보낸 청크는 되돌릴 수 없음)
+                    status = error_status(e)
+                    if received or status not in RETRYABLE_STATUS:
+                        raise
+                    delay = error_retry_after(e) or backoff_delay(attempt)
+                    self._scheduler.penalize(model, delay)
+                    if attempt == MAX_RETRIES:
+                        raise RateLimitExceeded(f"{model} 호출 한도 초과 ({status})", retry_after=max(delay, 1.0)) from e
+                    logging.warning(f"{model} stream returned {status}, retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    attempt += 1
+        except Exception:
+            error = True
+            raise
+        finally:
+            # 소비자가 중간에 스트림을 닫아도 기록
+            self._record(model, time.monotonic() - started, usage, error=error, grounding_calls=grounding_calls)
+
+    def count_tokens(self, *, model: str, **kwargs):
+        """토큰 수 계산 (스케줄러/백오프 경유, 통계에는 기록하지 않음)"""
+        return call_with_backoff(
+            self._scheduler, model, lambda: self._models.count_tokens(model=model, **kwargs),
+            max_retries=MAX_RETRIES, queue_timeout=queue_timeout()
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class _ScheduledCaches:
+    """client.caches.create를 모델별 스케줄러/백오프에 통과시키는 프록시"""
+
+    def __init__(self, caches, scheduler: ModelScheduler):
+        self._caches = caches
+        self._scheduler = scheduler
+
+    def create(self, *, model: str, **kwargs):
+        return call_with_backoff(
+            self._scheduler, model, lambda: self._caches.create(model=model, **kwargs),
+            max_retries=MAX_RETRIES, queue_timeout=queue_timeout()
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._caches, name)
+
+
+class PooledClient:
+    """풀에서 관리되는 genai.Client 래퍼 (models/caches 외 속성은 원본 그대로 위임)"""
+
+    def __init__(self, client, stats: ModelStats, scheduler: ModelScheduler, ledger=None):
+        self._client = client
+        self.models = _InstrumentedModels(client.models, stats, scheduler, ledger)
+        self.caches = _ScheduledCaches(client.caches, scheduler)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_genai_client(api_key: str) -> PooledClient:
+    """
+    API 키별 genai.Client를 재사용하여 반환
+
+    SDK 클라이언트는 모델과 무관하므로 키당 하나를 두고 모든 모델이 공유한다.
+    (모델별 구분은 MODEL_STATS에서 한다)
+    """
+    client = _clients.get(api_key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = PooledClient(genai.Client(api_key=api_key), MODEL_STATS, MODEL_SCHEDULER, usage_ledger)
+            _clients[api_key] = client
+            logging.info(f"Created pooled Gemini client (pool size: {len(_clients)})")
+        return client
+
+
+def get_model_stats() -> dict:
+    """모델별 호출 통계 조회"""
+    return MODEL_STATS.snapshot()
+
+
+def get_scheduler_stats() -> dict:
+    """스케줄러 통계 조회 (429 수신 수, 대기열 시간 초과 수, 현재 대기 수)"""
+    return MODEL_SCHEDULER.stats()
@@ -0,0 +1,2157 @@
+"""
+글 / 주제 추천 / 분석 / 이미지 생성 모드
+모델 SDK(google-genai)와 프롬프트 설정을 불러오는 무거운 모듈이라
+생성 모드 요청이 처음 들어올 때 handlers 레지스트리가 불러온다
+"""
+import os
+import json
+import re
+import base64
+import contextvars
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from firebase_functions import https_fn
+from google.genai import types
+
+from accounts import (
+    get_db, verify_user_token,
+    reserve_image_quota, refund_image_quota, summarize_image_usage
+)
+from block_lexer import lex_blocks
+from genai_pool import MODEL_SCHEDULER, get_genai_client
+from grounding_cache import create_grounding_cache, format_grounding_context
+from handlers import rate_limited_response
+from hedging import Hedger, HedgePolicy, apply_policy_overrides
+from rate_limiter import RateLimitExceeded
+from image_utils import transcode_image
+from job_store import create_job_store, JOB_DONE, JOB_ERROR, TERMINAL_STATUSES
+from json_response import json_response, ndjson_lines
+from model_json import ModelJsonParser, parse_model_json, log_salvage
+from prompt_cache import StaticPrompt, create_prefix_cache
+from rate_limiter import call_deadline, request_priority, PRIORITY_LOW
+from response_cache import create_response_cache, prompt_key
+from topic_pool import KST, create_topic_pool, pool_date
+from tracing import annotate, traced
+from usage_ledger import ANONYMOUS, UsageOwner, usage_owner
+from visual_cache import create_visual_description_cache
+
+# 사용 모델
+MODEL_NAME = "gemini-2.0-flash"
+IMAGE_MODEL_NAME = "gemini-2.0-flash-exp-image-generation"
+FALLBACK_MODEL_NAME = "gemini-2.0-flash-lite"  # 헤징용 경량 모델 (검색 Grounding 미지원)
+
+# 모드별 헤징 정책: 기본 호출이 지연시간 p90 예산을 넘기면 대체 모델로 두 번째 호출
+# (HEDGE_POLICY 환경변수 JSON으로 덮어쓰기 가능, 예: '{"write": {"enabled": false}}')
+HEDGE_POLICIES = apply_policy_overrides({
+    "recommend": HedgePolicy(FALLBACK_MODEL_NAME, default_budget=15, fallback_tools=False),
+    "recommend_by_keywords": HedgePolicy(FALLBACK_MODEL_NAME, default_budget=15, fallback_tools=False),
+    "analyze": HedgePolicy(FALLBACK_MODEL_NAME, default_budget=20, fallback_tools=False),
+    "generate_illustration_prompts": HedgePolicy(FALLBACK_MODEL_NAME, default_budget=10, min_budget=3),
+    # 글 작성 헤징은 검색 도구 없이 경량 모델로 (같은 모델로 보내면 Grounding 검색 비용만 두 배가 됨)
+    "write": HedgePolicy(FALLBACK_MODEL_NAME, default_budget=60, min_budget=30, max_budget=120, fallback_tools=False),
+}, os.environ.get("HEDGE_POLICY", ""))
+
+# 주제 → 시각적 설명 캐시 저장소 ("firestore": 메모리 + Firestore, "memory": 인스턴스 메모리만)
+VISUAL_CACHE_BACKEND = os.environ.get("VISUAL_CACHE_BACKEND", "firestore")
+
+# write_with_assets 썸네일 기본 스타일 (앱의 썸네일 생성과 동일)
+THUMBNAIL_STYLE = "블로그 대표 썸네일, 텍스트 없이, 주제를 잘 나타내는 시각적 이미지, 16:9 가로 비율"
+
+# write_batch 제한: 요청당 최대 주제 수, 동시 생성 수, 주제별 기본/최대 제한시간 (초)
+BATCH_MAX_TOPICS = 30
+BATCH_MAX_CONCURRENCY = 5
+BATCH_DEFAULT_CONCURRENCY = 3
+BATCH_DEFAULT_DEADLINE = 150
+BATCH_MAX_DEADLINE = 240
+# 배치 전체 시간 예산: 함수 제한시간(generate_blog_post 300초)에서 응답 직렬화/전송 여유를 뺀 값
+BATCH_TIME_BUDGET = 270
+# 남은 예산이 이보다 짧으면 대기 중인 주제는 시작하지 않고 실패로 보고 (초)
+BATCH_MIN_START = 30
+
+# 비동기 작업 저장소 ("firestore": 문서 생성 트리거로 실행, "memory": 요청 인스턴스의 스레드로 실행)
+JOB_STORE_BACKEND = os.environ.get("JOB_STORE_BACKEND", "firestore")
+JOB_MAX_WAIT = 25           # status/result long-poll 최대 대기 (초)
+JOB_PROGRESS_INTERVAL = 2.0  # 중간 블록 저장 최소 간격 (초)
+# 이 시간 동안 갱신이 없는 미완료 작업은 실행 함수가 시간 초과로 종료된 것으로 보고 오류 처리
+# (process_generation_job timeout_sec=540 + 여유)
+JOB_STALE_AFTER = 600
+
+# 고정 프롬프트 컨텍스트 캐시 ("gemini": Gemini 컨텍스트 캐시, "fake": 로컬/테스트, "off": 직접 전송)
+# 현재 고정 프롬프트는 명시적 캐시 최소 토큰 수(prompt_cache.MIN_CACHE_TOKENS)보다 훨씬 작아 기본은 "off"
+# (고정 부분이 앞에 오므로 암시적 캐시는 그대로 적용). 고정 프롬프트가 최소 토큰 수를 넘게 커지면 "gemini"로 켠다
+PROMPT_CACHE_BACKEND = os.environ.get("PROMPT_CACHE_BACKEND", "off")
+PROMPT_CACHE_TTL = int(os.environ.get("PROMPT_CACHE_TTL", "3600"))
+
+# 일별 주제 추천 풀 ("firestore": 인스턴스 간 공유, "memory": 로컬/테스트, "off": 항상 실시간 생성)
+TOPIC_POOL_BACKEND = os.environ.get("TOPIC_POOL_BACKEND", "firestore")
+TOPIC_POOL_SLOTS = int(os.environ.get("TOPIC_POOL_SLOTS", "4"))  # 카테고리당 컨텍스트 슬롯 수 (슬롯당 주제 5개)
+TOPIC_POOL_CONCURRENCY = 4  # 풀 생성 시 동시 모델 호출 수
+RECOMMEND_TOPIC_COUNT = 5
+
+# 동적 컨텍스트 슬롯 길이 (시간) - 같은 (사용자, 카테고리, 날짜, 슬롯)은 같은 컨텍스트
+CONTEXT_SLOT_HOURS = 3
+
+# 프롬프트 응답 캐시 ("firestore": 메모리 + Firestore, "memory": 인스턴스 메모리만, "off": 사용 안 함)
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "firestore")
+RESPONSE_CACHE_TTLS = {
+    "recommend": CONTEXT_SLOT_HOURS * 3600,   # 컨텍스트 슬롯과 같은 주기
+    "recommend_by_keywords": 6 * 3600,
+    "analyze": 24 * 3600,                     # 프롬프트에 날짜가 들어가므로 사실상 하루
+}
+
+# write 분량 보충: 본문 한글 글자 수가 요청 분량의 이 비율 미만이면 전체 재생성 대신 부족한 섹션만 이어서 생성
+WRITE_CONTINUATION_RATIO = float(os.environ.get("WRITE_CONTINUATION_RATIO", "0.9"))
+WRITE_CONTINUATION_MAX_CALLS = int(os.environ.get("WRITE_CONTINUATION_MAX_CALLS", "1"))
+
+# 마무리 섹션 소제목 (보충 섹션은 이 섹션 앞에 넣음)
+CLOSING_HEADING_KEYWORDS = ("마무리", "맺음", "결론", "정리")
+
+# regenerate_blocks: 요청당 다시 쓰는 최대 블록 수, 대상 구간 앞뒤로 함께 보내는 문맥 블록 수
+REGENERATE_MAX_BLOCKS = 12
+REGENERATE_CONTEXT_BLOCKS = 2
+
+# 카테고리별 검색 자료 캐시 ("firestore": 인스턴스 간 공유, "memory": 로컬/테스트, "off": 항상 검색)
+# 같은 카테고리의 오늘 근거 자료가 GROUNDING_CACHE_MAX_AGE시간 이내면 write는 검색 도구 없이 캐시된 근거로 생성
+GROUNDING_CACHE_BACKEND = os.environ.get("GROUNDING_CACHE_BACKEND", "firestore")
+GROUNDING_CACHE_MAX_AGE = float(os.environ.get("GROUNDING_CACHE_MAX_AGE", "6")) * 3600
+
+
+@traced("blocks.to_text")
+def convert_blocks_to_text(blocks: list) -> str:
+    """
+    구조화된 blocks를 미리보기용 순수 텍스트로 변환
+    (앱에서 사용자에게 보여주기 위한 용도)
+    """
+    lines = []
+    
+    for block in blocks:
+        block_type = block.get("type", "paragraph")
+        
+        if block_type == "heading":
+            level = block.get("level", 2)
+            text = block.get("text", "")
+            if level == 2:
+                lines.append(f"\n【{text}】\n")
+            else:
+                lines.append(f"\n▶ {text}\n")
+                
+        elif block_type == "paragraph":
+            text = block.get("text", "")
+            lines.append(f"{text}\n")
+            
+        elif block_type == "list":
+            style = block.get("style", "bullet")
+            items = block.get("items", [])
+            for i, item in enumerate(items):
+                if style == "number":
+                    lines.append(f"{i+1}. {item}")
+                else:
+                    lines.append(f"• {item}")
+            lines.append("")
+            
+        elif block_type == "divider":
+            lines.append("\n━━━━━━━━━━━━━━━━━━━━\n")
+            
+        elif block_type == "quotation":
+            text = block.get("text", "")
+            lines.append(f"\n「{text}」\n")
+    
+    return "\n".join(lines).strip()
+
+
+def convert_text_to_blocks(text: str) -> list:
+    """
+    기존 텍스트 형식을 blocks 구조로 변환 (하위 호환성, 문법은 block_lexer와 데스크톱 앱 공용)
+    """
+    return lex_blocks(text)
+
+
+# ============================================
+# 동적 프롬프트 생성 시스템
+# ============================================
+
+def get_dynamic_context(now: datetime = None, rng=None):
+    """
+    실시간 컨텍스트 생성 - 매 요청마다 다른 변수
+    
+    Args:
+        now: 기준 시각 (기본: 현재, 주제 풀은 풀 날짜의 한국 시간)
+        rng: 무작위 선택에 쓸 random.Random (주제 풀 슬롯은 날짜/카테고리/슬롯으로 고정)
+    """
+    now = now or datetime.now()
+    rng = rng or random
+    
+    # 요일별 테마
+    weekday_themes = {
+        0: "주말 드라이브 준비",  # 월요일
+        1: "자동차 관리 팁",
+        2: "중고차 시장 동향", 
+        3: "신차 소식",
+        4: "주말 여행 준비",  # 금요일
+        5: "가족 나들이",  # 토요일
+        6: "다음 주 준비"  # 일요일
+    }
+    
+    # 계절별 키워드
+    month = now.month
+    if month in [3, 4, 5]:
+        season = "봄"
+        season_keywords = ["봄맞이 세차", "황사 대비", "에어컨 점검", "봄나들이", "꽃구경 드라이브"]
+    elif month in [6, 7, 8]:
+        season = "여름"
+        season_keywords = ["에어컨 관리", "장마철 대비", "여름휴가 차량점검", "타이어 공기압", "냉각수 점검"]
+    elif month in [9, 10, 11]:
+        season = "가을"
+        season_keywords = ["단풍 드라이브", "가을철 차량관리", "겨울 대비", "히터 점검", "부동액 교체"]
+    else:
+        season = "겨울"
+        season_keywords = ["동절기 관리", "스노우타이어", "배터리 점검", "결빙 주의", "워셔액 보충"]
+    
+    # 관점/앵글 다양화
+    perspectives = [
+        "비용 절감 관점",
+        "초보 운전자 관점",
+        "가족 중심 관점",
+        "성능/퍼포먼스 관점",
+        "친환경/전기차 관점",
+        "안전 중심 관점",
+        "중고차 구매자 관점",
+        "장거리 운전자 관점",
+        "출퇴근 운전자 관점",
+        "주말 드라이버 관점"
+    ]
+    
+    # 콘텐츠 유형 다양화
+    content_types = [
+        "비교 분석 (A vs B)",
+        "체크리스트/가이드",
+        "흔한 실수와 해결법",
+        "숨겨진 팁 공개",
+        "실제 경험담 기반",
+        "전문가 인터뷰 형식",
+        "Q&A 형식",
+        "타임라인/순서 가이드",
+        "비용 분석표",
+        "before/after 비교"
+    ]
+    
+    # 세부 카테고리 (자동차)
+    sub_categories = [
+        "신차 정보", "중고차 팁", "자동차 관리", "보험/금융",
+        "튜닝/액세서리", "전기차/하이브리드", "수입차", "국산차",
+        "SUV/RV", "세단", "경차", "상용차",
+        "자동차 여행", "드라이브 코스", "주차 팁", "운전 습관",
+        "자동차 세금", "명의이전", "폐차", "리스/렌트"
+    ]
+    
+    return {
+        "date": now.strftime("%Y년 %m월 %d일"),
+        "weekday": ["월", "화", "수", "목", "금", "토", "일"][now.weekday()],
+        "weekday_theme": weekday_themes[now.weekday()],
+        "season": season,
+        "season_keyword": rng.choice(season_keywords),
+        "perspective": rng.choice(perspectives),
+        "content_type": rng.choice(content_types),
+        "sub_category": rng.choice(sub_categories),
+        "hour": now.hour,
+        "random_seed": rng.randint(1, 1000)  # 추가 랜덤성
+    }
+
+
+def seeded_dynamic_context(key: str, user: str = "", now: datetime = None, slot: int = None) -> dict:
+    """
+    (사용자, 카테고리/키워드/주제, 날짜, 슬롯)으로 고정한 동적 컨텍스트
+    같은 슬롯 안에서는 같은 프롬프트가 만들어져 응답을 캐시할 수 있고,
+    사용자/날짜/슬롯이 바뀌면 관점과 콘텐츠 유형이 달라진다
+    
+    Args:
+        key: 카테고리 등 요청 대상
+        user: 사용자 식별자 (주제 풀처럼 공용이면 빈 문자열)
+        now: 기준 시각 (기본: 현재 한국 시간)
+        slot: 슬롯 번호 (기본: 시각을 CONTEXT_SLOT_HOURS 단위로 나눈 값)
+    """
+    now = now or datetime.now(KST)
+    if slot is None:
+        slot = now.hour // CONTEXT_SLOT_HOURS
+    context = get_dynamic_context(now, random.Random(f"{user}:{key}:{pool_date(now)}:{slot}"))
+    context["slot"] = slot
+    return context
+
+
+def request_requester(req: https_fn.Request) -> str:
+    """요청자 식별자 (토큰이 있으면 uid, 없으면 클라이언트 IP)"""
+    user = verify_user_token(req) if req.headers.get("Authorization") else None
+    if user:
+        return user["uid"]
+    return req.headers.get("X-Forwarded-For", req.remote_addr or "").split(",")[0].strip()
+
+
+# 카테고리별 키워드 및 예시 정의
+CATEGORY_CONFIG = {
+    "차량 관리 상식": {
+        "keywords": ["엔진오일 교체", "타이어 관리", "와이퍼 교체", "배터리 점검", "냉각수", "브레이크 패드", "에어컨 필터", "세차", "광택", "부식 방지"],
+        "examples": ["엔진오일 5,000km vs 10,000km 교체, 정답은?", "타이어 마모 한계선, 직접 확인하는 3가지 방법", "겨울철 배터리 방전 예방, 이것만 알면 OK"]
+    },
+    "자동차 보험/사고처리": {
+        "keywords": ["자동차보험", "사고 접수", "과실비율", "블랙박스", "렌터카 특약", "자기부담금", "보험료 할인", "무보험 사고", "대물배상", "대인배상"],
+        "examples": ["내 과실 0%인데 보험료 오른다? 진실 공개", "블랙박스 없이 사고 났을 때 과실비율 정하는 법", "자동차보험 갱신 전 꼭 확인해야 할 3가지"]
+    },
+    "리스/렌트/할부 금융": {
+        "keywords": ["자동차 리스", "장기렌트", "할부 금융", "잔존가치", "선납금", "보증금", "리스료", "렌트료", "신용등급", "중도해지"],
+        "examples": ["리스 vs 렌트 vs 할부, 내 상황에 맞는 선택은?", "장기렌트 3년 후 인수 vs 반납, 뭐가 이득?", "자동차 할부 금리 비교, 캐피탈별 실제 이자율"]
+    },
+    "교통법규/범칙금": {
+        "keywords": ["속도위반", "신호위반", "주정차 위반", "음주운전", "무면허", "범칙금", "과태료", "벌점", "면허정지", "면허취소"],
+        "examples": ["범칙금 vs 과태료, 뭐가 다르고 뭐가 더 불리할까?", "2026년 바뀐 교통법규 총정리", "어린이보호구역 속도위반, 벌점과 벌금은?"]
+    },
+    "자동차 여행 코스": {
+        "keywords": ["드라이브 코스", "자동차 여행", "차박", "오토캠핑", "휴게소 맛집", "해안도로", "단풍 드라이브", "벚꽃 드라이브", "야경 드라이브", "국도 여행"],
+        "examples": ["서울 근교 2시간 드라이브 코스 TOP 5", "차박 초보를 위한 장비 리스트와 추천 장소", "겨울 야경 드라이브, 수도권 베스트 코스"]
+    },
+    "전기차 라이프": {
+        "keywords": ["전기차 충전", "충전소", "보조금", "주행거리", "배터리 관리", "테슬라", "아이오닉", "EV6", "충전요금", "완속충전", "급속충전"],
+        "examples": ["2026년 전기차 보조금 변경사항 총정리", "전기차 겨울철 주행거리 줄어드는 이유와 대처법", "아파트 전기차 충전, 설치부터 요금까지"]
+    },
+    "중고차 거래 팁": {
+        "keywords": ["중고차 시세", "허위매물", "침수차 확인", "사고차 확인", "중고차 딜러", "직거래", "중고차 감가", "중고차 계약", "명의이전", "이전비용"],
+        "examples": ["중고차 허위매물 구별하는 5가지 방법", "침수차 확인법, 이 부분만 보면 바로 알 수 있다", "2026년 중고차 시세 전망, 지금 사야 할까?"]
+    }
+}
+
+# 글 작성 고정 프롬프트 (역할/출력 형식/블록 규칙) - 요청마다 같으므로 컨텍스트 캐시로 전송
+WRITE_STATIC_PROMPT = StaticPrompt("write", """
+[ROLE] 네이버 자동차 파워 블로거
+당신은 자동차에 대해 깊은 지식을 가진 전문 블로거입니다.
+최신 정보를 검색하여 정확하고 신뢰할 수 있는 정보를 제공하세요.
+사용자 메시지의 [TOPIC], [STYLE], [QUESTIONS TO ANSWER], [KEY POINTS], [PERSONAL INSIGHT] 조건에 맞춰 글을 작성하세요.
+
+[OUTPUT FORMAT - 구조화된 블록 형식]
+네이버 블로그 에디터에서 서식을 적용할 수 있도록 구조화된 JSON을 출력하세요.
+
+반드시 아래 형식의 JSON을 출력하세요:
+{
+    "title": "SEO 최적화된 매력적인 제목",
+    "blocks": [
+        {"type": "paragraph", "text": "인사말/서론 내용"},
+        {"type": "heading", "text": "소제목1", "level": 2},
+        {"type": "paragraph", "text": "본문 내용..."},
+        {"type": "list", "style": "bullet", "items": ["항목1", "항목2", "항목3"]},
+        {"type": "divider"},
+        {"type": "heading", "text": "소제목2", "level": 2},
+        {"type": "paragraph", "text": "본문 내용..."},
+        {"type": "quotation", "text": "강조하고 싶은 인용구 내용"},
+        {"type": "heading", "text": "마무리", "level": 2},
+        {"type": "paragraph", "text": "마무리 인사..."}
+    ]
+}
+
+[BLOCK TYPES]
+- "paragraph": 일반 본문 텍스트 (여러 문장 가능)
+- "heading": 소제목 (level: 2=큰 소제목, 3=작은 소제목)
+- "list": 목록 (style: "bullet"=●, "number"=1.2.3.)
+- "divider": 구분선
+- "quotation": 인용구 (강조하고 싶은 핵심 문구)
+
+[IMPORTANT]
+- 최신 정보와 실제 데이터를 검색하여 포함
+- 실용적이고 구체적인 정보 제공
+- 독자가 바로 활용할 수 있는 팁 포함
+- [STYLE]의 분량 이상으로 작성
+- blocks 배열에 10~20개 블록 포함
+- 각 paragraph는 2~5문장 정도로 충분히 작성
+- JSON 형식 외의 텍스트 출력 금지
+""", tools=[types.Tool(google_search=types.GoogleSearch())])
+
+# 캐시된 검색 자료로 글을 쓸 때의 고정 프롬프트 (검색 도구 없음, 자료는 사용자 메시지의 [REFERENCE])
+WRITE_REFERENCE_STATIC_PROMPT = StaticPrompt("write_reference", WRITE_STATIC_PROMPT.text.replace(
+    "최신 정보를 검색하여 정확하고 신뢰할 수 있는 정보를 제공하세요.",
+    "사용자 메시지의 [REFERENCE] 사실 자료를 바탕으로 정확하고 신뢰할 수 있는 정보를 제공하세요."
+).replace(
+    "- 최신 정보와 실제 데이터를 검색하여 포함",
+    "- [REFERENCE] 사실 자료의 최신 정보를 반영 (자료 문장은 그대로 옮기지 않고, 자료에 없는 수치는 단정하지 않음)"
+))
+
+# 부분 재작성(regenerate_blocks) 고정 프롬프트 - 검색 도구 없이 지정 구간의 새 블록만 출력
+REGENERATE_STATIC_PROMPT = StaticPrompt("regenerate", """
+[ROLE] 네이버 자동차 파워 블로거 (기존 글 부분 수정)
+이미 작성된 블로그 글의 일부 구간만 다시 작성합니다. 글 전체나 제목은 다시 쓰지 않습니다.
+사용자 메시지의 [TOPIC], [STYLE], [REGENERATE], [OUTLINE], [TARGET n] 조건에 맞춰 각 TARGET의 새 블록을 작성하세요.
+
+[OUTPUT FORMAT]
+반드시 아래 형식의 JSON만 출력하세요 (TARGET마다 sections 원소 하나):
+{
+    "sections": [
+        {"target": 0, "blocks": [
+            {"type": "heading", "text": "소제목", "level": 2},
+            {"type": "paragraph", "text": "본문 내용..."}
+        ]}
+    ]
+}
+
+[BLOCK TYPES]
+- "paragraph": 일반 본문 텍스트 (여러 문장 가능)
+- "heading": 소제목 (level: 2=큰 소제목, 3=작은 소제목)
+- "list": 목록 (style: "bullet"=●, "number"=1.2.3.)
+- "divider": 구분선
+- "quotation": 인용구 (강조하고 싶은 핵심 문구)
+
+[IMPORTANT]
+- "target"은 사용자 메시지의 TARGET 번호 그대로
+- 각 TARGET의 blocks는 그 구간을 대신할 블록만 (앞뒤 문맥 블록은 다시 쓰지 않음)
+- 앞뒤 문맥에 없는 새로운 수치는 단정하지 않음
+- 각 paragraph는 2~5문장 정도로 충분히 작성
+- JSON 형식 외의 텍스트 출력 금지
+""")
+
+# 주제 추천 고정 프롬프트 (공통 규칙/출력 형식)
+RECOMMEND_STATIC_PROMPT = StaticPrompt("recommend", """
+[ROLE] 네이버 자동차 블로그 주제 기획자
+Google 검색으로 최신 뉴스, 인기 검색어, 커뮤니티 화제를 조사한 뒤
+사용자 메시지의 카테고리와 오늘의 조건에 맞는 블로그 주제 5개를 추천하세요.
+
+[공통 필수 조건]
+- 5개 주제 모두 반드시 지정된 카테고리 범위 내에서만
+- 구체적인 숫자, 상황이 포함된 제목
+- 클릭을 유도하는 호기심 자극 제목
+
+[공통 금지 사항]
+- 지정된 카테고리와 관련 없는 일반 자동차 주제
+- "~하는 방법", "~팁" 같은 뻔한 제목
+- 너무 광범위한 주제
+
+반드시 아래 JSON 형식으로만 응답하세요:
+{"topics": ["주제1", "주제2", "주제3", "주제4", "주제5"], "trend_keywords": ["검색에서 발견한 트렌드 키워드 3개"]}
+""", tools=[types.Tool(google_search=types.GoogleSearch())])
+
+
+def build_dynamic_recommend_prompt(category: str, context: dict) -> str:
+    """2단계 동적 프롬프트 생성 - 카테고리 강제 적용"""
+    
+    # 카테고리 설정 가져오기 (없으면 기본값)
+    cat_config = CATEGORY_CONFIG.get(category, {
+        "keywords": ["자동차"],
+        "examples": ["자동차 관련 주제"]
+    })
+    
+    keywords_str = ", ".join(cat_config["keywords"][:5])
+    examples_str = "\n    ".join([f'- "{ex}"' for ex in cat_config["examples"]])
+    
+    # 공통 규칙/출력 형식은 RECOMMEND_STATIC_PROMPT로 분리 (컨텍스트 캐시)
+    prompt = f"""
+    [🎯 중요: 카테고리 제한]
+    **반드시 "{category}" 카테고리에 해당하는 주제만 생성하세요!**
+    관련 키워드: {keywords_str}
+    
+    다른 카테고리 주제는 절대 포함하지 마세요.
+    예를 들어 "{category}"를 선택했으면:
+    - ❌ 일반적인 자동차 관리 → 포함 금지
+    - ❌ 다른 카테고리 주제 → 포함 금지  
+    - ✅ "{category}" 관련 구체적 주제만 → 필수
+    
+    [CONTEXT - 오늘의 조건]
+    - 오늘 날짜: {context['date']} ({context['weekday']}요일)
+    - 계절: {context['season']}
+    - 오늘의 테마: {context['weekday_theme']}
+    - 계절 키워드: {context['season_keyword']}
+    
+    [TASK 1] Google 검색으로 "{category}" 관련 최신 정보를 조사하세요:
+    1. "{category}" 관련 최신 뉴스나 이슈
+    2. 네이버/구글에서 "{category}" 인기 검색어
+    3. "{category}" 관련 커뮤니티 화제 주제
+    4. {context['season']}철 "{category}" 관련 관심사
+    
+    [TASK 2] 조사 결과를 바탕으로 "{category}" 블로그 주제 5개를 추천하세요.
+    
+    ["{category}" 카테고리 좋은 예시]
+    {examples_str}
+    
+    [이번 요청 조건]
+    - 콘텐츠 유형: {context['content_type']} 스타일 1개 이상
+    - 타깃 관점: {context['perspective']}에서 1개 이상
+    - 계절감: {context['season']}철 관련 1개 포함
+    """
+    
+    return prompt
+
+
+# 주제 → 영어 시각적 설명 캐시 (재생성/반복 주제는 변환 호출 생략)
+visual_description_cache = create_visual_description_cache(VISUAL_CACHE_BACKEND, get_db)
+
+# 텍스트 모드 헤징 호출기 (모드별 지연시간 히스토그램 포함)
+# 스레드 수는 스케줄러가 바로 내보내는 기본 모델 호출 수(버스트)마다 헤지 호출 자리 하나씩
+hedger = Hedger(HEDGE_POLICIES, max_workers=int(2 * MODEL_SCHEDULER.burst(MODEL_NAME)))
+
+# 고정 프롬프트 컨텍스트 캐시 (TTL 만료 전 자동 재생성)
+prompt_cache = create_prefix_cache(PROMPT_CACHE_BACKEND)
+prompt_cache.ttl = PROMPT_CACHE_TTL
+
+# 일별 주제 추천 풀 (recommend는 풀에서 즉시 응답, 부족하면 실시간 생성)
+topic_pool = create_topic_pool(TOPIC_POOL_BACKEND, get_db)
+
+# 추천/분석 응답 캐시 (프롬프트 해시 키, 모드별 TTL)
+response_cache = create_response_cache(RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_TTLS, get_db)
+
+# 카테고리별 검색 자료 캐시 (write/recommend/analyze 응답의 grounding_metadata 수집)
+grounding_cache = create_grounding_cache(GROUNDING_CACHE_BACKEND, get_db, GROUNDING_CACHE_MAX_AGE)
+
+
+def is_json_response(resp) -> bool:
+    """헤징 승자 판정용: 응답에서 JSON 객체를 추출할 수 있는지"""
+    return parse_model_json(resp.text or "")[0] is not None
+
+
+@traced("visual.describe")
+def convert_topic_to_visual_description(client, model_name: str, topic: str) -> str:
+    """
+    한국어 주제를 영어 시각적 설명으로 변환
+    이미지 생성 시 한국어 텍스트가 이미지에 들어가는 것을 방지
+    """
+    cached = visual_description_cache.get(topic)
+    if cached:
+        return cached
+    
+    try:
+        conversion_prompt = f"""
+You are a visual description translator. Convert the following Korean blog topic into a detailed English visual description for image generation.
+
+Korean topic: {topic}
+
+IMPORTANT RULES:
+1. DO NOT include any text, words, or letters in the description
+2. Describe only VISUAL ELEMENTS: objects, scenes, colors, composition, mood
+3. Focus on what can be PHOTOGRAPHED or ILLUSTRATED
+4. Be specific about visual details (lighting, angle, atmosphere)
+5. Output ONLY the English visual description, nothing else
+
+Example:
+- Input: "겨울철 와이퍼 관리법"
+- Output: "A car windshield with clean wiper blades on a snowy winter day, frost crystals on glass, cold blue morning light, close-up angle showing the rubber blade detail"
+
+- Input: "엔진오일 교체주기"
+- Output: "A mechanic's gloved hand pouring golden engine oil from a bottle into a car engine, workshop setting with warm lighting, oil droplets catching light, clean professional environment"
+
+Now convert this topic into a visual description:
+"""
+        
+        resp = client.models.generate_content(
+            model=model_name,
+            contents=conversion_prompt,
+            config=types.GenerateContentConfig(
+                temperature=0.3  # 낮은 온도로 일관된 결과
+            )
+        )
+        
+        visual_desc = resp.text.strip()
+        logging.info(f"Topic '{topic}' converted to visual: {visual_desc[:100]}...")
+        if visual_desc:
+            visual_description_cache.set(topic, visual_desc)
+        return visual_desc
+        
+    except Exception as e:
+        logging.error(f"Failed to convert topic to visual description: {e}")
+        # 실패 시 기본 설명 반환
+        return f"Professional photograph related to automotive topic, clean composition, natural lighting"
+
+
+# 이미지 프롬프트 공통 텍스트 금지 지시문 (모든 스타일 프롬프트의 고정 접두부)
+# 이미지 모델은 컨텍스트 캐시를 지원하지 않아 직접 전송하되, 항상 같은 접두부로 두어 암시적 캐시에 유리하게 한다
+IMAGE_NO_TEXT_INSTRUCTION = """
+CRITICAL REQUIREMENTS:
+- ABSOLUTELY NO TEXT, LETTERS, WORDS, NUMBERS, SYMBOLS, or CHARACTERS of any kind in the image
+- Do NOT render any Korean, English, Chinese, or any language text
+- Do NOT include any typography, labels, watermarks, or signs
+- Pure visual imagery only - photograph style without any overlays
+- If you feel tempted to add text, DO NOT - leave that space empty or fill with visual elements
+"""
+
+
+def build_image_prompt(client, model_name: str, image_prompt: str, style: str = "블로그 썸네일") -> str:
+    """이미지 주제와 스타일로 이미지 모델용 프롬프트 구성 (텍스트 금지 지시 포함)"""
+    # 2단계 프롬프트 생성: 먼저 주제를 시각적 설명으로 변환
+    # 한국어 주제가 이미지에 텍스트로 들어가는 것을 방지
+    visual_description = convert_topic_to_visual_description(client, model_name, image_prompt)
+    
+    # 스타일별 프롬프트 구성 - 텍스트 제거 강화 (공통 지시문은 항상 맨 앞에 오는 고정 접두부)
+    base_no_text_instruction = IMAGE_NO_TEXT_INSTRUCTION
+    
+    style_prompts = {
+        "블로그 썸네일": f"""
+{base_no_text_instruction}
+
+Create a professional blog thumbnail photograph.
+Visual concept: {visual_description}
+Style: Clean, modern, minimal design with soft natural colors. Professional photography with shallow depth of field. 16:9 landscape aspect ratio.
+Mood: Professional, inviting, trustworthy.
+
+REMINDER: NO TEXT WHATSOEVER in the image.
+""",
+        "블로그 대표 썸네일, 텍스트 없이, 주제를 잘 나타내는 시각적 이미지, 16:9 가로 비율": f"""
+{base_no_text_instruction}
+
+Create a beautiful, eye-catching blog thumbnail photograph.
+Visual concept: {visual_description}
+Style: Professional photography, vibrant but balanced colors, clean composition.
+Aspect ratio: 16:9 landscape (wide format).
+Lighting: Natural, soft lighting with gentle shadows.
+
+REMINDER: ZERO TEXT - this means no letters, no words, no numbers, no symbols. Pure photography only.
+""",
+        "블로그 본문 삽화, 텍스트 없이, 심플하고 깔끔한 일러스트레이션": f"""
+{base_no_text_instruction}
+
+Create a simple, clean illustration.
+Visual concept: {visual_description}
+Style: Flat design, minimal modern illustration. Soft pastel colors.
+Format: Square composition.
+
+REMINDER: NO TEXT - pure illustration only, no labels or captions.
+""",
+        "자동차": f"""
+{base_no_text_instruction}
+
+Create a professional automotive photograph.
+Visual concept: {visual_description}
+Style: Sleek, modern car photography. Studio or outdoor setting with professional lighting.
+Mood: Premium, sophisticated.
+
+REMINDER: NO TEXT on the image - no brand names, no labels, no overlays.
+""",
+        "출고 후기": f"""
+{base_no_text_instruction}
+
+Create a warm car delivery celebration photograph.
+Visual concept: {visual_description}
+Style: Candid photography style. Happy moment of receiving a new car.
+Mood: Bright, positive, celebratory.
+
+REMINDER: NO TEXT - no dealership names, no signs, no congratulation text.
+""",
+        "인포그래픽": f"""
+{base_no_text_instruction}
+
+Create a visual infographic-style image using only icons and visual elements.
+Visual concept: {visual_description}
+Style: Clean icons, visual diagrams, flowchart shapes WITHOUT any text labels.
+Use arrows, shapes, and pictograms to convey information visually.
+
+REMINDER: NO TEXT - use only visual symbols, icons, and shapes. No labels or captions.
+"""
+    }
+    
+    return style_prompts.get(style, style_prompts["블로그 썸네일"])
+
+
+def generate_image_bytes(
+    client,
+    image_model_name: str,
+    full_prompt: str,
+    max_width: int = None,
+    image_format: str = None,
+    quality: int = 85
+):
+    """
+    이미지 모델 호출 후 첫 번째 이미지를 (선택적으로) 축소/재인코딩하여 반환
+
+    Returns:
+        (이미지 바이트, MIME 타입) 또는 이미지가 없으면 None
+    """
+    response = client.models.generate_content(
+        model=image_model_name,
+        contents=full_prompt,
+        config=types.GenerateContentConfig(
+            response_modalities=['Text', 'Image']
+        )
+    )
+    
+    for part in response.candidates[0].content.parts:
+        if part.inline_data is not None:
+            return transcode_image(
+                part.inline_data.data,
+                part.inline_data.mime_type or "image/png",
+                max_width=int(max_width) if max_width else None,
+                image_format=image_format,
+                quality=quality
+            )
+    return None
+
+
+def parse_char_count(length: str) -> int:
+    """분량 옵션 문자열("보통 (1,500자)" 등)에서 요청 글자 수"""
+    if "2,000" in length or "2000" in length:
+        return 2000
+    if "2,500" in length or "2500" in length:
+        return 2500
+    return 1500
+
+
+def build_write_prompt(req_json: dict) -> tuple:
+    """
+    글 작성(write) 요청 페이로드로부터 프롬프트 구성
+
+    Returns:
+        (topic, full_prompt)
+    """
+    topic = req_json.get("topic", "")
+    tone = req_json.get("tone", "친근한 이웃 (해요체)")
+    length = req_json.get("length", "보통 (1,500자)")
+    emoji_level = req_json.get("emoji_level", "사용 안 함")
+    targets = req_json.get("targets", [])
+    questions = req_json.get("questions", [])
+    summary = req_json.get("summary", "")
+    insight = req_json.get("insight", "")
+    
+    # 인사말/마무리말 (직접 전달받거나 prompt에서 추출)
+    intro = req_json.get("intro", "")
+    outro = req_json.get("outro", "")
+    
+    # 구버전 호환: prompt에서 추출
+    if not intro or not outro:
+        prompt_text = req_json.get("prompt", "")
+        if "인사말:" in prompt_text:
+            try:
+                intro_part = prompt_text.split("인사말:")[1]
+                intro = intro_part.split("맺음말:")[0].strip() if "맺음말:" in intro_part else intro_part.strip()
+            except:
+                pass
+        if "맺음말:" in prompt_text:
+            try:
+                outro = prompt_text.split("맺음말:")[1].strip()
+            except:
+                pass
+    
+    # 출력 스타일 설정 (텍스트 전용으로 변경)
+    output_style = req_json.get("output_style", {})
+    if isinstance(output_style, (list, str)):
+        output_style = {}
+    
+    # 텍스트 스타일 기본값 설정
+    heading_style = output_style.get("heading", "【 】 대괄호")
+    emphasis_style = output_style.get("emphasis", "「강조」 꺽쇠괄호")
+    divider_style = output_style.get("divider", "━━━━━━━━ (실선)")
+    spacing_style = output_style.get("spacing", "기본 (빈 줄 1개)")
+    qa_style = output_style.get("qa", "Q. 질문 / A. 답변")
+    list_style = output_style.get("list", "• 불릿 기호")
+    
+    # 이미지 정보 처리 (호환성)
+    images = req_json.get("images", {})
+    if isinstance(images, list):
+        images = {"thumbnail": None, "illustrations": images}
+    
+    # 타깃 문자열 처리
+    target_str = ""
+    if targets:
+        if isinstance(targets, list):
+            target_str = ", ".join(targets)
+        else:
+            target_str = str(targets)
+    
+    char_count = parse_char_count(length)
+    
+    # 이모지 사용 여부
+    use_emoji = "조금" in emoji_level or "많이" in emoji_level
+    emoji_instruction = "이모지 적절히 사용" if use_emoji else "이모지 사용하지 마세요. 텍스트만 사용하세요."
+    
+    # 인사말/마무리말 프롬프트 구성
+    intro_instruction = f"[인사말] 다음 인사말로 글을 시작하세요: \"{intro}\"" if intro else ""
+    outro_instruction = f"[마무리말] 다음 맺음말로 글을 마무리하세요: \"{outro}\"" if outro else ""
+    
+    # 고정 부분(역할/출력 형식/블록 규칙)은 WRITE_STATIC_PROMPT로 분리 (컨텍스트 캐시)
+    full_prompt = f"""
+    [TOPIC] {topic}
+    
+    [STYLE]
+    - 말투: {tone}
+    - 분량: {char_count}자 이상
+    - {emoji_instruction}
+    - 타깃 독자: {target_str}
+    
+    {intro_instruction}
+    
+    [QUESTIONS TO ANSWER]
+    {chr(10).join([f"- {q}" for q in questions]) if questions else "없음"}
+    
+    [KEY POINTS]
+    {summary if summary else "없음"}
+    
+    [PERSONAL INSIGHT]
+    {insight if insight else "없음"}
+    
+    {outro_instruction}
+    
+    [LENGTH]
+    - 최소 {char_count}자 분량의 내용
+    """
+
+    return topic, full_prompt
+
+
+def finalize_write_data(data: dict, topic: str = "") -> dict:
+    """모델이 생성한 글 데이터에 title/content_text/content/blocks 필드를 채워 반환"""
+    if not data.get("title"):
+        data["title"] = topic
+    
+    # blocks가 있으면 content_text 자동 생성 (미리보기용)
+    if "blocks" in data and isinstance(data["blocks"], list):
+        content_text = convert_blocks_to_text(data["blocks"])
+        data["content_text"] = content_text
+        data["content"] = content_text  # 하위 호환성
+    else:
+        # 구버전 호환: blocks가 없으면 기존 방식
+        if "content" not in data:
+            data["content"] = data.get("content_text", data.get("body", "내용 생성 실패"))
+        if "content_text" not in data:
+            data["content_text"] = data.get("content", "")
+        # blocks가 없으면 텍스트에서 blocks 생성 시도
+        data["blocks"] = convert_text_to_blocks(data.get("content_text", ""))
+    return data
+
+
+def build_write_fallback(topic: str, raw_text: str) -> dict:
+    """JSON 파싱 실패 시 전체 텍스트를 하나의 paragraph 블록으로"""
+    return {
+        "title": f"{topic}",
+        "content": raw_text,
+        "content_text": raw_text,
+        "blocks": [{"type": "paragraph", "text": raw_text}]
+    }
+
+
+def generate_with_static_prompt(client, mode: str, model_name: str, static_prompt: StaticPrompt,
+                                contents: str, validate=None, **fields):
+    """
+    고정 프롬프트는 컨텍스트 캐시로, 동적 부분만 contents로 보내 헤징 호출
+    캐시 참조가 실패하면(만료/삭제) 캐시를 버리고 직접 전송으로 한 번 재시도한다
+    """
+    config = prompt_cache.config(client, model_name, static_prompt, **fields)
+    inline_config = prompt_cache.inline_config(static_prompt, **fields)
+    try:
+        return hedger.generate(
+            client, mode, model_name, validate=validate,
+            contents=contents, config=config, fallback_config=inline_config
+        )
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        if not config.cached_content:
+            raise
+        logging.warning(f"Cached content call failed for {mode}, retrying inline: {e}")
+        prompt_cache.invalidate(model_name, static_prompt)
+        return hedger.generate(
+            client, mode, model_name, validate=validate,
+            contents=contents, config=inline_config
+        )
+
+
+def iter_write_stream_chunks(client, model_name: str, full_prompt: str, static_prompt: StaticPrompt = WRITE_STATIC_PROMPT):
+    """
+    write 스트리밍 청크 (고정 프롬프트는 컨텍스트 캐시로 전송)
+    첫 청크 전에 캐시 참조가 실패하면 캐시를 버리고 직접 전송으로 한 번 재시도한다
+    """
+    config = prompt_cache.config(client, model_name, static_prompt)
+    received = False
+    try:
+        for chunk in client.models.generate_content_stream(model=model_name, contents=full_prompt, config=config):
+            received = True
+            yield chunk
+        return
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        if received or not config.cached_content:
+            raise
+        logging.warning(f"Cached content stream failed, retrying inline: {e}")
+        prompt_cache.invalidate(model_name, static_prompt)
+    
+    yield from client.models.generate_content_stream(
+        model=model_name,
+        contents=full_prompt,
+        config=prompt_cache.inline_config(static_prompt)
+    )
+
+
+def resolve_topic_category(topic: str, category: str = "") -> str:
+    """
+    글 주제의 카테고리 (검색 자료 캐시 키)
+    요청에 카테고리가 없으면 카테고리 키워드가 가장 많이 들어간 카테고리, 하나도 없으면 ""
+    """
+    if category in CATEGORY_CONFIG:
+        return category
+    best, best_hits = "", 0
+    for name, config in CATEGORY_CONFIG.items():
+        hits = sum(1 for keyword in config["keywords"] if keyword in topic)
+        if hits > best_hits:
+            best, best_hits = name, hits
+    return best
+
+
+def plan_write_grounding(category: str, full_prompt: str, fresh_search: bool = False) -> tuple:
+    """
+    글 작성 검색 방식 결정
+    같은 카테고리의 최신 검색 근거가 충분하면 검색 도구 없는 고정 프롬프트 + 근거를 붙인 프롬프트로 생성
+    
+    Returns:
+        (고정 프롬프트, contents, 지연시간 비교 구분 "search"/"cached")
+    """
+    if grounding_cache is None or fresh_search:
+        return WRITE_STATIC_PROMPT, full_prompt, "search"
+    context = grounding_cache.fresh(category)
+    if context is None:
+        return WRITE_STATIC_PROMPT, full_prompt, "search"
+    return WRITE_REFERENCE_STATIC_PROMPT, format_grounding_context(context) + full_prompt, "cached"
+
+
+def capture_grounding(category: str, response, mode: str):
+    """응답의 검색 자료를 카테고리 자료에 합침 (캐시 저장 실패는 응답에 영향 없음)"""
+    if grounding_cache is None or not category or response is None:
+        return
+    try:
+        grounding_cache.add(category, response, mode)
+    except Exception as e:
+        logging.warning(f"Grounding capture failed in {mode}: {e}")
+
+
+def record_grounding_latency(mode: str, variant: str, latency: float):
+    """검색 사용/캐시 사용 지연시간 집계 + 요청 trace 로그에 구분/시간 기록 (인스턴스 간 비교용)"""
+    annotate(grounding=variant, grounding_latency_ms=round(latency * 1000))
+    if grounding_cache is not None:
+        grounding_cache.latency.record(mode, variant, latency)
+
+
+def get_grounding_stats() -> dict:
+    """검색 자료 캐시 적중/수집 수와 모드별 검색 사용/캐시 사용 지연시간 비교"""
+    return grounding_cache.stats() if grounding_cache is not None else {}
+
+
+def generate_recommend_topics(client, model_name: str, category: str, context: dict,
+                              mode: str = "recommend", reuse: bool = True, exclude=()):
+    """
+    컨텍스트 조건으로 카테고리 추천 주제 생성 (Grounding)
+    
+    Args:
+        reuse: 같은 프롬프트의 캐시된 응답 사용 여부
+        exclude: 클라이언트가 이미 받은 주제 (캐시된 주제를 모두 받았으면 새로 생성)
+    
+    Returns:
+        {"topics", "trend_keywords"} 또는 None (응답에서 주제를 얻지 못한 경우)
+    """
+    prompt = build_dynamic_recommend_prompt(category, context)
+    cache_key = prompt_key(model_name, prompt, static=RECOMMEND_STATIC_PROMPT.key(model_name), temperature=0.9)
+    if reuse:
+        cached = response_cache.get(mode, cache_key)
+        if cached and not set(cached["topics"]) <= set(exclude or ()):
+            return cached
+    
+    resp = generate_with_static_prompt(
+        client, mode, model_name, RECOMMEND_STATIC_PROMPT, prompt,
+        validate=is_json_response,
+        temperature=0.9  # 더 창의적인 응답
+    )
+    capture_grounding(category, resp, mode)
+    
+    # 응답에서 JSON 추출 (잘린 응답이면 완성된 주제까지 복구)
+    parsed, report = parse_model_json(resp.text)
+    log_salvage(mode, report, resp.text)
+    if parsed and parsed.get("topics"):
+        response_cache.set(mode, cache_key, parsed)
+        return parsed
+    logging.error(f"JSON parse error in {mode}, raw: {resp.text[:500]}")
+    return None
+
+
+def build_topic_pool(client, model_name: str, category: str, now: datetime = None, slots: int = None) -> dict:
+    """
+    카테고리의 오늘 주제 풀 생성/저장
+    슬롯마다 날짜/카테고리/슬롯 번호로 고정한 컨텍스트(관점, 콘텐츠 유형, 계절 키워드)로 주제를 생성한다
+    """
+    now = now or datetime.now(KST)
+    slots = slots or TOPIC_POOL_SLOTS
+    date = pool_date(now)
+    
+    def _slot(slot: int):
+        context = seeded_dynamic_context(category, now=now, slot=slot)
+        return context, generate_recommend_topics(client, model_name, category, context, mode="recommend_pool")
+    
+    entries = []
+    seen = set()
+    context = None
+    with ThreadPoolExecutor(max_workers=min(slots, TOPIC_POOL_CONCURRENCY)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _slot, slot) for slot in range(slots)]
+        for future in futures:
+            try:
+                context, parsed = future.result()
+            except Exception as e:
+                logging.warning(f"Topic pool slot failed for {category}: {e}")
+                continue
+            for topic in (parsed or {}).get("topics", []):
+                topic = str(topic).strip()
+                if topic and topic not in seen:
+                    seen.add(topic)
+                    entries.append({
+                        "topic": topic,
+                        "trend_keywords": parsed.get("trend_keywords", []),
+                        "perspective": context["perspective"],
+                        "content_type": context["content_type"]
+                    })
+    
+    if not entries:
+        raise RuntimeError(f"{category} 주제 풀 생성 실패 (모든 슬롯 실패)")
+    
+    day_context = {"date": context["date"], "theme": context["weekday_theme"], "season": context["season"]}
+    return topic_pool.save(category, entries, context=day_context, date=date)
+
+
+def refresh_topic_pools(client, categories: list = None, now: datetime = None, slots: int = None) -> dict:
+    """
+    카테고리별 오늘 주제 풀 일괄 생성 (스케줄러/CLI)
+    
+    Returns:
+        {카테고리: 주제 수 또는 오류 메시지}
+    """
+    if topic_pool is None:
+        raise RuntimeError("TOPIC_POOL_BACKEND=off 에서는 주제 풀을 만들 수 없습니다.")
+    
+    # 사용자 요청보다 뒤로 대기
+    request_priority.set(PRIORITY_LOW)
+    usage_owner.set(UsageOwner("system", "topic_pool"))
+    
+    summary = {}
+    for category in categories or list(CATEGORY_CONFIG):
+        started = time.monotonic()
+        try:
+            pool = build_topic_pool(client, MODEL_NAME, category, now, slots)
+            summary[category] = len(pool["entries"])
+            logging.info(f"Topic pool for {category}: {len(pool['entries'])} topics in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            summary[category] = f"error: {e}"
+            logging.error(f"Topic pool for {category} failed: {e}")
+    return summary
+
+
+def generate_write_data(client, model_name: str, req_json: dict) -> dict:
+    """
+    write 요청을 Grounding(Google Search) 적용하여 생성하고 최종 글 데이터 반환
+    JSON이 잘리거나 깨지면 완성된 블록까지 복구하고, 실패 시 전체 텍스트를 하나의 블록으로
+    """
+    topic, full_prompt = build_write_prompt(req_json)
+    category = resolve_topic_category(topic, req_json.get("category", ""))
+    static_prompt, contents, variant = plan_write_grounding(category, full_prompt, req_json.get("fresh_search", False))
+
+    # Grounding with Google Search로 최신 정보 반영 (같은 카테고리의 최신 검색 자료가 있으면 자료로 대체)
+    started = time.monotonic()
+    resp = generate_with_static_prompt(
+        client, "write", model_name, static_prompt, contents, validate=is_json_response
+    )
+    record_grounding_latency("write", variant, time.monotonic() - started)
+    if variant == "search":
+        capture_grounding(category, resp, "write")
+    
+    # JSON 객체 추출 (잘린 응답이면 완성된 블록까지 복구)
+    data, report = parse_model_json(resp.text)
+    log_salvage("write", report, resp.text)
+    
+    if data is None or (report["truncated"] and not data.get("blocks")):
+        # 실패 시 전체 텍스트를 하나의 paragraph 블록으로
+        raw_text = resp.text.replace("```json", "").replace("```", "").strip()
+        logging.error(f"JSON parse error in write, raw: {raw_text[:500]}")
+        return build_write_fallback(topic, raw_text)
+    
+    data = finalize_write_data(data, topic)
+    if not report["complete"]:
+        data["salvage"] = report
+    
+    # 분량이 부족하면 부족한 섹션만 이어서 생성 (사용자가 전체 재생성하지 않도록)
+    target = parse_char_count(req_json.get("length", "보통 (1,500자)"))
+    return extend_short_write(client, model_name, static_prompt, topic, contents, data, target)
+
+
+HANGUL_PATTERN = re.compile(r"[가-힣]")
+
+
+def count_hangul(text: str) -> int:
+    """한글 음절 수 (공백/기호/영문 제외)"""
+    return len(HANGUL_PATTERN.findall(text or ""))
+
+
+def closing_section_index(blocks: list) -> int:
+    """마무리 섹션 소제목 위치 (없으면 끝 = len(blocks))"""
+    for i in range(len(blocks) - 1, -1, -1):
+        block = blocks[i]
+        if block.get("type") == "heading" and any(k in block.get("text", "") for k in CLOSING_HEADING_KEYWORDS):
+            return i
+    return len(blocks)
+
+
+def build_continuation_prompt(full_prompt: str, blocks: list, current: int, target: int, insert_at: int) -> str:
+    """이미 작성된 블록 뒤에 부족한 섹션만 요청하는 프롬프트"""
+    missing = target - current
+    headings = [block.get("text", "") for block in blocks if block.get("type") == "heading"]
+    position = (
+        f'새 섹션은 기존 "{blocks[insert_at].get("text", "")}" 섹션 바로 앞에 들어갑니다.'
+        if insert_at < len(blocks) else "새 섹션은 글의 마지막에 이어집니다."
+    )
+    return f"""{full_prompt}
+    
+    [CONTINUATION]
+    아래 [EXISTING BLOCKS]는 이미 작성된 글입니다. 현재 본문은 한글 약 {current}자로, 요청 분량 {target}자에 약 {missing}자가 부족합니다.
+    - 기존 내용을 반복하지 말고, 아직 다루지 않은 내용으로 새 섹션(heading + paragraph/list 등)만 작성하세요.
+    - {position}
+    - 인사말, 맺음말, 제목은 다시 쓰지 마세요.
+    - 새 섹션의 분량은 한글 {missing}자 이상
+    - 출력: {{"blocks": [새 블록들]}} 형식의 JSON만 (title 없이)
+    
+    [EXISTING HEADINGS]
+    {chr(10).join(f"- {heading}" for heading in headings) if headings else "없음"}
+    
+    [EXISTING BLOCKS]
+    {json.dumps(blocks, ensure_ascii=False)}
+    """
+
+
+# 분량 보충 통계 (전체 재생성을 얼마나 줄였는지)
+continuation_stats = {"checked": 0, "short": 0, "continued": 0, "saved_reruns": 0, "failed": 0}
+_continuation_lock = threading.Lock()
+
+
+def _count_continuation(key: str):
+    with _continuation_lock:
+        continuation_stats[key] += 1
+
+
+def get_continuation_stats() -> dict:
+    with _continuation_lock:
+        return dict(continuation_stats)
+
+
+def extend_short_write(client, model_name: str, static_prompt: StaticPrompt, topic: str,
+                       full_prompt: str, data: dict, target: int) -> dict:
+    """
+    본문 한글 글자 수가 요청 분량보다 부족하면 부족한 섹션만 이어서 생성하여 병합
+    (Grounding 글 작성 전체를 다시 호출하는 대신 짧은 보충 호출)
+    
+    Args:
+        static_prompt: 원래 글 작성에 쓴 고정 프롬프트 (캐시 자료로 썼으면 검색 도구 없는 쪽)
+        full_prompt: 원래 글 작성에 보낸 contents (캐시 자료의 [REFERENCE] 포함)
+    """
+    blocks = data.get("blocks") or []
+    if not blocks or WRITE_CONTINUATION_MAX_CALLS <= 0:
+        return data
+    
+    _count_continuation("checked")
+    initial = current = count_hangul(convert_blocks_to_text(blocks))
+    if current >= target * WRITE_CONTINUATION_RATIO:
+        return data
+    _count_continuation("short")
+    
+    for attempt in range(WRITE_CONTINUATION_MAX_CALLS):
+        insert_at = closing_section_index(blocks)
+        prompt = build_continuation_prompt(full_prompt, blocks, current, target, insert_at)
+        try:
+            resp = generate_with_static_prompt(
+                client, "write_continue", model_name, static_prompt, prompt, validate=is_json_response
+            )
+            extra, report = parse_model_json(resp.text)
+            log_salvage("write_continue", report, resp.text)
+        except RateLimitExceeded:
+            # 이미 받은 본문으로 응답 (보충 때문에 요청 전체를 429로 만들지 않음)
+            logging.warning("Write continuation rate limited, returning short post")
+            break
+        except Exception as e:
+            logging.error(f"Write continuation failed: {e}")
+            extra = None
+        
+        new_blocks = [
+            block for block in (extra or {}).get("blocks") or []
+            if isinstance(block, dict) and block.get("type")
+        ]
+        if not new_blocks:
+            _count_continuation("failed")
+            break
+        
+        _count_continuation("continued")
+        blocks = blocks[:insert_at] + new_blocks + blocks[insert_at:]
+        current = count_hangul(convert_blocks_to_text(blocks))
+        if current >= target * WRITE_CONTINUATION_RATIO:
+            break
+    
+    if current == initial:
+        return data
+    
+    saved = current >= target * WRITE_CONTINUATION_RATIO
+    if saved:
+        _count_continuation("saved_reruns")
+    stats = get_continuation_stats()
+    logging.info(
+        f"Write continuation for '{topic}': {initial} -> {current}/{target} chars "
+        f"({'saved a full rerun' if saved else 'still short'}; "
+        f"saved {stats['saved_reruns']}/{stats['short']} short posts, {stats['checked']} checked)"
+    )
+    data = finalize_write_data(dict(data, blocks=blocks), topic)
+    data["continuation"] = {"initial_chars": initial, "chars": current, "target_chars": target}
+    return data
+
+
+def section_range(blocks: list, heading_index: int) -> tuple:
+    """소제목 블록부터 같거나 더 큰 소제목 직전까지의 구간 (start, end)"""
+    level = blocks[heading_index].get("level", 2)
+    end = heading_index + 1
+    while end < len(blocks):
+        block = blocks[end]
+        if block.get("type") == "heading" and block.get("level", 2) <= level:
+            break
+        end += 1
+    return heading_index, end
+
+
+def contiguous_ranges(indices) -> list:
+    """블록 인덱스 목록을 연속 구간 [(start, end), ...]으로 묶음"""
+    ranges = []
+    for index in sorted(set(indices)):
+        if ranges and ranges[-1][1] == index:
+            ranges[-1] = (ranges[-1][0], index + 1)
+        else:
+            ranges.append((index, index + 1))
+    return ranges
+
+
+def build_regenerate_prompt(topic: str, tone: str, blocks: list, ranges: list, instruction: str = "") -> str:
+    """대상 구간과 앞뒤 문맥 블록만 담은 부분 재작성 프롬프트 (글 전체는 보내지 않음)"""
+    headings = [block.get("text", "") for block in blocks if block.get("type") == "heading"]
+    targets = []
+    for target_id, (start, end) in enumerate(ranges):
+        before = blocks[max(0, start - REGENERATE_CONTEXT_BLOCKS):start]
+        after = blocks[end:end + REGENERATE_CONTEXT_BLOCKS]
+        original = blocks[start:end]
+        targets.append(f"""
+    [TARGET {target_id}] (한글 약 {count_hangul(convert_blocks_to_text(original))}자)
+    앞 문맥: {json.dumps(before, ensure_ascii=False)}
+    다시 쓸 블록: {json.dumps(original, ensure_ascii=False)}
+    뒤 문맥: {json.dumps(after, ensure_ascii=False)}""")
+    
+    return f"""
+    [TOPIC] {topic}
+    
+    [STYLE]
+    - 말투: {tone}
+    
+    [REGENERATE]
+    이미 작성된 글의 일부 구간만 다시 작성합니다. 각 [TARGET]의 "다시 쓸 블록"을 대신할 새 블록을 작성하세요.
+    - 원래 구간과 같은 역할 유지 (소제목으로 시작하면 같은 수준의 소제목으로 시작)
+    - 원래 분량 이상, 앞뒤 문맥과 자연스럽게 이어지도록
+    - 다른 섹션([OUTLINE])의 내용을 반복하지 말 것
+    {f"- 추가 요청: {instruction}" if instruction else ""}
+    
+    [OUTLINE]
+    {chr(10).join(f"- {heading}" for heading in headings) if headings else "없음"}
+    {"".join(targets)}
+    
+    출력: {{"sections": [{{"target": 0, "blocks": [새 블록들]}}]}} 형식의 JSON만 (title 없이, TARGET마다 하나)
+    """
+
+
+def regenerate_block_ranges(client, model_name: str, req_json: dict, blocks: list, ranges: list) -> dict:
+    """
+    대상 구간만 다시 생성하여 병합한 글 데이터 반환
+    (검색 도구 없는 REGENERATE_STATIC_PROMPT로 한 번 호출, 새 블록을 받지 못한 구간은 원래 블록 유지)
+    """
+    prompt = build_regenerate_prompt(
+        req_json.get("topic", ""),
+        req_json.get("tone", "친근한 이웃 (해요체)"),
+        blocks, ranges, req_json.get("instruction", "")
+    )
+    resp = generate_with_static_prompt(
+        client, "regenerate_blocks", model_name, REGENERATE_STATIC_PROMPT, prompt, validate=is_json_response
+    )
+    parsed, report = parse_model_json(resp.text)
+    log_salvage("regenerate_blocks", report, resp.text)
+    
+    replacements = {}
+    for section in (parsed or {}).get("sections") or []:
+        new_blocks = [
+            block for block in section.get("blocks") or []
+            if isinstance(block, dict) and block.get("type")
+        ]
+        target_id = section.get("target")
+        if new_blocks and isinstance(target_id, int) and 0 <= target_id < len(ranges):
+            replacements[target_id] = new_blocks
+    
+    # 뒤 구간부터 교체하여 앞 구간 인덱스 유지
+    merged = list(blocks)
+    replaced = []
+    for target_id in sorted(replacements, key=lambda i: ranges[i][0], reverse=True):
+        start, end = ranges[target_id]
+        merged[start:end] = replacements[target_id]
+        replaced.append({"start": start, "end": end, "count": len(replacements[target_id])})
+    
+    data = finalize_write_data({"title": req_json.get("title", ""), "blocks": merged}, req_json.get("topic", ""))
+    data["replaced"] = sorted(replaced, key=lambda item: item["start"])
+    data["missing"] = [list(ranges[i]) for i in range(len(ranges)) if i not in replacements]
+    return data
+
+
+def generate_illustration_prompt_data(client, model_name: str, content: str, count: int = 2) -> dict:
+    """본문(또는 개요)을 분석하여 삽화 프롬프트/위치 목록 생성"""
+    # 다양한 이미지 스타일 목록
+    styles = [
+        "realistic photo style",
+        "minimalist flat illustration",
+        "isometric 3D style",
+        "watercolor painting style",
+        "infographic diagram style"
+    ]
+    style_list = ", ".join(styles[:count])
+    
+    prompt = f"""
+    다음 블로그 글의 본문을 분석하여 삽화 이미지 {count}개를 위한 프롬프트를 생성해주세요.
+    
+    [본문]
+    {content[:3000]}
+    
+    요구사항:
+    - 각 삽화는 본문의 서로 다른 섹션/주제를 시각화
+    - 이미지에 텍스트나 글자가 절대 들어가지 않도록 명시
+    - 각 이미지는 서로 다른 스타일로 생성 (예: {style_list})
+    - 블로그 글의 이해를 돕는 구체적인 시각 자료
+    - 프롬프트는 영어로 작성, 구체적이고 상세하게 (50단어 이상)
+    - 각 프롬프트 끝에 "NO TEXT, NO LETTERS, NO WORDS" 필수 포함
+    
+    반드시 아래 JSON 형식으로만 응답하세요:
+    {{"prompts": ["삽화1 영어 상세 설명 (스타일 포함)", "삽화2 영어 상세 설명 (다른 스타일)"], "positions": ["서론 후", "중반", "결론 전"]}}
+    """
+    
+    resp = hedger.generate(
+        client, "generate_illustration_prompts", model_name, validate=is_json_response,
+        contents=prompt,
+        config=types.GenerateContentConfig(response_mime_type="application/json")
+    )
+    
+    parsed, report = parse_model_json(resp.text)
+    log_salvage("generate_illustration_prompts", report, resp.text)
+    
+    if not parsed:
+        logging.error(f"JSON parse error in illustration prompts, raw: {resp.text[:500]}")
+        parsed = {}
+    parsed.setdefault("prompts", [])
+    parsed.setdefault("positions", [])
+    return parsed
+
+
+def build_asset_outline(req_json: dict) -> str:
+    """
+    본문 생성 전에 삽화 프롬프트를 만들 수 있도록 요청 정보로 개요 텍스트 구성
+    (write_with_assets에서 본문과 삽화 프롬프트를 동시에 생성하기 위함)
+    """
+    lines = [f"주제: {req_json.get('topic', '')}"]
+    questions = req_json.get("questions", [])
+    if questions:
+        lines.append("다룰 질문:")
+        lines.extend(f"- {q}" for q in questions)
+    if req_json.get("summary"):
+        lines.append(f"핵심 내용: {req_json['summary']}")
+    if req_json.get("insight"):
+        lines.append(f"개인 의견: {req_json['insight']}")
+    return "\n".join(lines)
+
+
+def _timed(func, *args, **kwargs) -> tuple:
+    """함수 실행 결과와 소요시간 반환: (결과, 오류 메시지 또는 None, 초)"""
+    started = time.monotonic()
+    try:
+        return func(*args, **kwargs), None, time.monotonic() - started
+    except Exception as e:
+        logging.error(f"{getattr(func, '__name__', 'task')} failed: {e}")
+        return None, str(e), time.monotonic() - started
+
+
+def run_write_with_assets(
+    client,
+    model_name: str,
+    image_model_name: str,
+    req_json: dict,
+    include_thumbnail: bool = True
+) -> dict:
+    """
+    글 작성, 썸네일 생성, 삽화 프롬프트 생성을 스레드 풀에서 동시에 실행
+
+    각 작업은 서로 독립적이라 전체 소요시간은 가장 느린 작업 수준이 된다.
+    일부 작업이 실패해도 나머지 결과는 그대로 반환한다.
+
+    Returns:
+        {"post", "thumbnail", "illustrations", "errors", "timings"}
+        (실패했거나 요청하지 않은 항목은 None, 실패 사유는 errors에)
+    """
+    illustration_count = int(req_json.get("illustration_count", 2) or 0)
+    started = time.monotonic()
+    
+    def _make_thumbnail():
+        full_prompt = build_image_prompt(
+            client, model_name, req_json.get("topic", ""),
+            req_json.get("thumbnail_style", THUMBNAIL_STYLE)
+        )
+        image = generate_image_bytes(
+            client, image_model_name, full_prompt,
+            max_width=req_json.get("max_width"),
+            image_format=req_json.get("image_format"),
+            quality=req_json.get("quality", 85)
+        )
+        if image is None:
+            raise RuntimeError("이미지 생성 결과가 없습니다.")
+        image_bytes, mime_type = image
+        return {
+            "image_base64": base64.b64encode(image_bytes).decode('utf-8'),
+            "mime_type": mime_type
+        }
+    
+    tasks = {"post": (generate_write_data, (client, model_name, req_json))}
+    if include_thumbnail:
+        tasks["thumbnail"] = (_make_thumbnail, ())
+    if illustration_count > 0:
+        tasks["illustrations"] = (
+            generate_illustration_prompt_data,
+            (client, model_name, build_asset_outline(req_json), illustration_count)
+        )
+    
+    result = {"post": None, "thumbnail": None, "illustrations": None, "errors": {}, "timings": {}}
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, _timed, func, *args)
+            for name, (func, args) in tasks.items()
+        }
+        for name, future in futures.items():
+            value, error, elapsed = future.result()
+            result[name] = value
+            result["timings"][name] = round(elapsed, 3)
+            if error:
+                result["errors"][name] = error
+    
+    result["timings"]["total"] = round(time.monotonic() - started, 3)
+    logging.info(f"write_with_assets timings: {result['timings']}, errors: {list(result['errors'])}")
+    return result
+
+
+def build_batch_specs(req_json: dict) -> list:
+    """
+    write_batch 요청의 topics 목록을 write 요청 페이로드 목록으로 변환
+    각 항목은 주제 문자열 또는 write 필드 dict이며, 배치 공통 필드(tone, length 등) 위에 덮어쓴다
+    """
+    base = {
+        key: value for key, value in req_json.items()
+        if key not in ("mode", "topics", "concurrency", "deadline_sec", "stream")
+    }
+    specs = []
+    for item in req_json.get("topics", [])[:BATCH_MAX_TOPICS]:
+        spec = dict(base)
+        if isinstance(item, dict):
+            spec.update(item)
+        else:
+            spec["topic"] = str(item)
+        if spec.get("topic"):
+            specs.append(spec)
+    return specs
+
+
+def iter_write_batch(client, model_name: str, specs: list, concurrency: int, deadline: float,
+                     budget: float = BATCH_TIME_BUDGET):
+    """
+    여러 주제를 제한된 동시성으로 생성하며 완료되는 순서대로 이벤트를 yield
+
+    이벤트 형식:
+    - {"event": "result", "index": n, "topic": ..., "success": True, "data": {...}, "elapsed": 초}
+    - {"event": "result", "index": n, "topic": ..., "success": False, "error": ..., "elapsed": 초}
+      (시작하지 못한 주제는 "skipped": True)
+    - {"event": "done", "total": n, "succeeded": n, "failed": n, "skipped": n, "elapsed": 초}
+
+    주제별 제한시간은 생성을 시작한 시점부터 계산하되 배치 전체 예산(budget)을 넘지 않는다.
+    대기 중인 주제는 자리가 날 때 남은 예산이 BATCH_MIN_START 이상일 때만 시작하고,
+    그렇지 않으면 시작하지 않은 채 실패로 보고한다.
+    실행 중인 모델 호출은 취소할 수 없으므로 중단하지 않고 버린다. 대신 주제의 마감 시각을
+    call_deadline으로 넘겨 HTTP 요청 제한시간이 되게 하므로, 제한시간을 넘긴 호출도
+    마감 시각에 끊기고 그 뒤로 새 호출(분량 보충 등)을 보내지 않는다.
+    """
+    started = time.monotonic()
+    batch_end = started + budget
+    started_at = {}  # index -> 생성 시작 시각
+    ends = {}        # index -> 마감 시각 (주제 제한시간과 배치 예산 중 이른 쪽)
+    queue = list(range(len(specs)))
+    queue.reverse()
+    
+    def _run(index, spec):
+        call_deadline.set(ends[index])
+        return generate_write_data(client, model_name, spec)
+    
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = {}
+    
+    def _start_next():
+        while queue and len(pending) < concurrency:
+            now = time.monotonic()
+            if batch_end - now < BATCH_MIN_START:
+                return
+            index = queue.pop()
+            started_at[index] = now
+            ends[index] = min(now + deadline, batch_end)
+            # 요청 우선순위(contextvar)를 작업 스레드로 전달
+            pending[executor.submit(contextvars.copy_context().run, _run, index, specs[index])] = index
+    
+    succeeded = failed = skipped = 0
+    
+    try:
+        _start_next()
+        while pending:
+            # 가장 먼저 마감되는 작업까지만 대기
+            now = time.monotonic()
+            timeout = max(0.0, min(ends[i] for i in pending.values()) - now)
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                index = pending.pop(future)
+                event = {
+                    "event": "result",
+                    "index": index,
+                    "topic": specs[index].get("topic", ""),
+                    "elapsed": round(time.monotonic() - started_at[index], 3)
+                }
+                try:
+                    event["data"] = future.result()
+                    event["success"] = True
+                    succeeded += 1
+                except Exception as e:
+                    logging.error(f"write_batch topic {index} failed: {e}")
+                    event["success"] = False
+                    event["error"] = f"글 생성 실패: {str(e)}"
+                    failed += 1
+                yield event
+            
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                if now >= ends[index]:
+                    pending.pop(future)
+                    failed += 1
+                    limit = ends[index] - started_at[index]
+                    logging.warning(f"write_batch topic {index} exceeded deadline ({limit:.0f}s), abandoning call")
+                    yield {
+                        "event": "result",
+                        "index": index,
+                        "topic": specs[index].get("topic", ""),
+                        "success": False,
+                        "error": f"제한시간({limit:.0f}초) 초과",
+                        "elapsed": round(now - started_at[index], 3)
+                    }
+            
+            _start_next()
+        
+        # 남은 예산이 부족해 시작하지 못한 주제
+        skipped = len(queue)
+        while queue:
+            index = queue.pop()
+            failed += 1
+            yield {
+                "event": "result",
+                "index": index,
+                "topic": specs[index].get("topic", ""),
+                "success": False,
+                "skipped": True,
+                "error": f"배치 시간 예산({budget:.0f}초) 안에 시작하지 못했습니다. 다시 요청해주세요.",
+                "elapsed": 0.0
+            }
+        if skipped:
+            logging.warning(f"write_batch skipped {skipped} topics (batch budget {budget:.0f}s)")
+    finally:
+        # 마감을 넘긴 작업은 기다리지 않음 (호출은 call_deadline으로 제한됨)
+        executor.shutdown(wait=False)
+    
+    yield {
+        "event": "done",
+        "total": len(specs),
+        "succeeded": succeeded,
+        "failed": failed,
+        "skipped": skipped,
+        "elapsed": round(time.monotonic() - started, 3)
+    }
+
+
+def stream_write_events(client, model_name: str, topic: str, full_prompt: str,
+                        category: str = "", fresh_search: bool = False, target_chars: int = 0):
+    """
+    write 프롬프트를 스트리밍으로 생성하며 NDJSON 이벤트를 순서대로 yield
+    (category의 최신 검색 자료가 있으면 검색 도구 없이 자료를 붙여 생성)
+    target_chars가 있으면 본문이 그보다 짧을 때 부족한 섹션을 이어서 생성해 done 이벤트에 병합한다
+    (보충 블록은 block 이벤트로 보내지 않고 done의 blocks에만 들어간다)
+
+    이벤트 형식:
+    - {"event": "title", "title": ...}
+    - {"event": "block", "index": n, "block": {...}, "text": 미리보기 텍스트}
+    - {"event": "done", "title": ..., "content_text": ..., "blocks": [...]}
+    - {"event": "error", "error": ...}
+    """
+    parser = ModelJsonParser()
+    blocks = []
+    static_prompt, contents, variant = plan_write_grounding(category, full_prompt, fresh_search)
+    started = time.monotonic()
+    grounded_chunk = None
+    
+    try:
+        for chunk in iter_write_stream_chunks(client, model_name, contents, static_prompt):
+            # 검색 자료(grounding_metadata)는 보통 마지막 청크에 붙어 옴
+            if any(getattr(candidate, "grounding_metadata", None) for candidate in getattr(chunk, "candidates", None) or []):
+                grounded_chunk = chunk
+            for event in parser.feed(chunk.text or ""):
+                if event[0] == "value" and event[1] == "title":
+                    yield {"event": "title", "title": event[2]}
+                elif event[0] == "item" and event[1] == "blocks" and isinstance(event[3], dict):
+                    block = event[3]
+                    blocks.append(block)
+                    yield {
+                        "event": "block",
+                        "index": event[2],
+                        "block": block,
+                        "text": convert_blocks_to_text([block])
+                    }
+    except RateLimitExceeded as e:
+        logging.error(f"Streaming write rate limited: {e}")
+        if not blocks:
+            yield {"event": "error", "error": "요청이 많아 잠시 후 다시 시도해주세요.", "retry_after": round(e.retry_after)}
+            return
+    except Exception as e:
+        logging.error(f"Streaming write failed: {e}")
+        if not blocks:
+            yield {"event": "error", "error": f"글 생성 실패: {str(e)}"}
+            return
+    
+    record_grounding_latency("write_stream", variant, time.monotonic() - started)
+    if variant == "search":
+        capture_grounding(category, grounded_chunk, "write_stream")
+    
+    # 전체 응답으로 최종 데이터 구성 (잘린 응답이면 완성된 블록까지 복구)
+    data, report = parser.finish()
+    log_salvage("write_stream", report, parser.buffer)
+    
+    if data is None or (report["truncated"] and not data.get("blocks")):
+        raw_text = parser.buffer.replace("```json", "").replace("```", "").strip()
+        logging.error(f"JSON parse error in write_stream, raw: {raw_text[:500]}")
+        yield {"event": "done", **build_write_fallback(topic, raw_text)}
+        return
+    
+    data = finalize_write_data(data, topic)
+    if not report["complete"]:
+        data["salvage"] = report
+    if target_chars:
+        data = extend_short_write(client, model_name, static_prompt, topic, contents, data, target_chars)
+    yield {"event": "done", **data}
+
+
+job_store = create_job_store(JOB_STORE_BACKEND, get_db)
+
+
+def run_generation_job(job_id: str):
+    """
+    대기 중인 작업을 실행하여 중간 블록과 최종 결과를 작업 저장소에 기록
+    (동일 작업이 중복 전달되어도 claim에 성공한 실행자만 처리)
+    """
+    if not job_store.claim(job_id):
+        logging.info(f"Job {job_id} already claimed, skipping")
+        return
+    
+    try:
+        job = job_store.get(job_id)
+        usage_owner.set(UsageOwner(job.get("owner") or ANONYMOUS, "submit"))
+        client = get_genai_client(os.environ.get("GEMINI_API_KEY", "").strip())
+        topic, full_prompt = build_write_prompt(job["payload"])
+        category = resolve_topic_category(topic, job["payload"].get("category", ""))
+        
+        blocks = []
+        last_flush = 0.0
+        for event in stream_write_events(
+            client, MODEL_NAME, topic, full_prompt, category, job["payload"].get("fresh_search", False),
+            target_chars=parse_char_count(job["payload"].get("length", "보통 (1,500자)"))
+        ):
+            event_type = event.pop("event")
+            if event_type == "title":
+                job_store.update(job_id, {"title": event["title"]})
+            elif event_type == "block":
+                blocks.append(event["block"])
+                # 블록마다 쓰지 않고 일정 간격으로 모아서 저장
+                if time.monotonic() - last_flush >= JOB_PROGRESS_INTERVAL:
+                    job_store.update(job_id, {"blocks": list(blocks)})
+                    last_flush = time.monotonic()
+            elif event_type == "done":
+                job_store.update(job_id, {
+                    "status": JOB_DONE,
+                    "title": event.get("title", ""),
+                    "blocks": event.get("blocks", blocks),
+                    "result": event
+                })
+            elif event_type == "error":
+                job_store.update(job_id, {"status": JOB_ERROR, "error": event["error"]})
+    except Exception as e:
+        logging.error(f"Job {job_id} failed: {e}")
+        job_store.update(job_id, {"status": JOB_ERROR, "error": f"글 생성 실패: {str(e)}"})
+
+
+def build_job_view(job: dict) -> dict:
+    """status 응답용 작업 요약 (요청 payload 제외, 중간 블록 미리보기 포함)"""
+    blocks = job.get("blocks") or []
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "version": job.get("version", 0),
+        "title": job.get("title", ""),
+        "blocks": blocks,
+        "content_text": convert_blocks_to_text(blocks),
+        "error": job.get("error"),
+        "updated_at": job.get("updated_at")
+    }
+
+
+def handle_recommend(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 1] 주제 추천 (동적 프롬프트 + Grounding)"""
+    category = req_json.get("category", "자동차")
+    
+    exclude = req_json.get("exclude") or []
+    fresh = bool(req_json.get("fresh"))
+    requester = request_requester(req)
+    
+    # 오늘의 주제 풀에서 아직 보여주지 않은 주제로 즉시 응답 (fresh=true면 항상 실시간 생성)
+    if topic_pool is not None and not fresh:
+        pooled = topic_pool.sample(category, RECOMMEND_TOPIC_COUNT, exclude=exclude, requester=requester or None)
+        if pooled:
+            pooled["source"] = "pool"
+            return json_response(pooled)
+        logging.info(f"Topic pool miss for {category}, generating live")
+    
+    # 동적 컨텍스트 생성 (사용자/카테고리/날짜/슬롯 고정 - 같은 슬롯의 같은 프롬프트는 응답 캐시 사용)
+    context = seeded_dynamic_context(category, requester)
+    
+    logging.info(f"Recommend request - context: {context['sub_category']}, {context['perspective']}, slot: {context['slot']}")
+    
+    # Grounding with Google Search
+    parsed = generate_recommend_topics(client, MODEL_NAME, category, context, reuse=not fresh, exclude=exclude)
+    
+    if parsed:
+        # 응답에 컨텍스트 정보 추가 (디버깅/참고용)
+        parsed["context"] = {
+            "date": context["date"],
+            "theme": context["weekday_theme"],
+            "season": context["season"],
+            "perspective": context["perspective"]
+        }
+        parsed["source"] = "live"
+        
+        return json_response(parsed)
+    
+    # JSON 형식이 아니거나 주제가 하나도 없으면 기본값 반환
+    return json_response({"topics": ["주제를 다시 생성해주세요"]})
+
+
+def handle_recommend_by_keywords(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 1.5] 키워드 기반 주제 추천"""
+    keywords = req_json.get("keywords", [])
+    
+    if not keywords:
+        return json_response({"error": "키워드가 필요합니다."}, status=400)
+    
+    keywords_str = ", ".join(keywords)
+    context = seeded_dynamic_context(keywords_str, request_requester(req))
+    
+    prompt = f"""
+    [키워드 기반 블로그 주제 추천]
+    
+    사용자가 제공한 키워드: {keywords_str}
+    
+    [오늘의 컨텍스트]
+    - 날짜: {context['date']} ({context['weekday']}요일)
+    - 계절: {context['season']}
+    
+    [TASK] 위 키워드들을 조합하거나 관련된 주제로 블로그 포스팅 제목 5개를 추천해주세요.
+    
+    [조건]
+    - 키워드와 직접적으로 관련된 구체적인 주제
+    - 검색 유입이 잘 될 수 있는 SEO 최적화 제목
+    - 독자가 클릭하고 싶어하는 호기심 자극 제목
+    - {context['season']}철 트렌드 반영 1개 이상
+    - 너무 일반적인 제목 지양 (구체적인 숫자, 비교, 사례 포함)
+    
+    [예시]
+    키워드: 엔진오일, 교체주기
+    → "엔진오일 5,000km vs 10,000km 교체, 2026년 정답은?"
+    
+    키워드: 자동차관리, 겨울
+    → "겨울철 자동차 관리 체크리스트 7가지, 놓치면 큰일!"
+    
+    반드시 아래 JSON 형식으로만 응답하세요:
+    {{"topics": ["주제1", "주제2", "주제3", "주제4", "주제5"]}}
+    """
+    
+    logging.info(f"Keyword recommend request - keywords: {keywords_str}")
+    
+    cache_key = prompt_key(MODEL_NAME, prompt, search=True, temperature=0.8)
+    cached = None if req_json.get("fresh") else response_cache.get("recommend_by_keywords", cache_key)
+    if cached:
+        return json_response(cached)
+    
+    resp = hedger.generate(
+        client, "recommend_by_keywords", MODEL_NAME, validate=is_json_response,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            tools=[types.Tool(google_search=types.GoogleSearch())],
+            temperature=0.8
+        )
+    )
+    
+    parsed, report = parse_model_json(resp.text)
+    log_salvage("recommend_by_keywords", report, resp.text)
+    
+    if parsed and parsed.get("topics"):
+        response_cache.set("recommend_by_keywords", cache_key, parsed)
+        return json_response(parsed)
+    
+    logging.error(f"JSON parse error in keyword recommend, raw: {resp.text[:500]}")
+    return json_response({"topics": ["키워드 기반 주제를 다시 생성해주세요"]})
+
+
+def handle_analyze(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 2] 주제 분석 (Grounding 적용)"""
+    topic = req_json.get("topic", "")
+    
+    # 동적 컨텍스트 (주제/날짜/슬롯 고정 - 같은 주제의 분석은 응답 캐시 사용)
+    context = seeded_dynamic_context(topic, request_requester(req))
+    
+    prompt = f"""
+    주제 '{topic}'에 대한 심층 마케팅 분석을 해주세요.
+    
+    [오늘의 컨텍스트]
+    - 날짜: {context['date']} ({context['weekday']}요일)
+    - 계절: {context['season']}
+    
+    Google 검색으로 최신 정보를 조사하여 다음을 분석해주세요:
+    
+    1. 타깃 독자층 (4~5개)
+       - 구체적인 상황/니즈 포함 (예: "첫 차 구매 고민 중인 사회초년생")
+    
+    2. 독자들이 실제로 궁금해하는 질문 (6~8개)
+       - 네이버 지식인, 자동차 커뮤니티에서 실제로 묻는 질문
+       - 구체적인 상황이 담긴 질문
+    
+    3. 반드시 포함해야 할 핵심 정보 (6~8개)
+       - 최신 데이터, 가격, 비교 정보 포함
+       - {context['season']}철 관련 정보 1개 이상
+    
+    반드시 아래 JSON 형식으로만 응답하세요:
+    {{"targets": ["타깃1 (상황 설명)", "타깃2", ...], "questions": ["구체적 질문1", "질문2", ...], "key_points": ["핵심정보1 (수치 포함)", "포인트2", ...]}}
+    """
+    
+    cache_key = prompt_key(MODEL_NAME, prompt, search=True)
+    cached = None if req_json.get("fresh") else response_cache.get("analyze", cache_key)
+    if cached:
+        return json_response(cached)
+    
+    resp = hedger.generate(
+        client, "analyze", MODEL_NAME, validate=is_json_response,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            tools=[types.Tool(google_search=types.GoogleSearch())]
+        )
+    )
+    capture_grounding(resolve_topic_category(topic, req_json.get("category", "")), resp, "analyze")
+    
+    # 응답에서 JSON 추출 (잘린 응답이면 완성된 항목까지 복구)
+    parsed, report = parse_model_json(resp.text)
+    log_salvage("analyze", report, resp.text)
+    
+    if not parsed:
+        logging.error(f"JSON parse error in analyze, raw: {resp.text[:500]}")
+        parsed = {}
+    elif any(parsed.get(key) for key in ("targets", "questions", "key_points")):
+        response_cache.set("analyze", cache_key, parsed)
+    for key in ("targets", "questions", "key_points"):
+        parsed.setdefault(key, [])
+    
+    return json_response(parsed)
+
+
+def handle_generate_image(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 3] 이미지 생성 (인증 필요)"""
+    # 사용자 인증 체크
+    user = verify_user_token(req)
+    if not user:
+        return json_response({"error": "인증이 필요합니다. 로그인 후 이용해주세요."}, status=401)
+    
+    # 이미지 생성 프롬프트
+    image_prompt = req_json.get("prompt", "")
+    style = req_json.get("style", "블로그 썸네일")
+    
+    # 응답 형식: "binary"면 JSON/base64 대신 이미지 바이트를 그대로 반환
+    # (Accept 헤더가 image/* 인 경우도 동일)
+    binary_response = (
+        req_json.get("format") == "binary"
+        or req.headers.get("Accept", "").startswith("image/")
+    )
+    
+    # 선택적 서버 측 축소/재인코딩 (예: 960px JPEG)
+    max_width = req_json.get("max_width")
+    image_format = req_json.get("image_format")
+    quality = req_json.get("quality", 85)
+    
+    if not image_prompt:
+        return json_response({"error": "이미지 설명(prompt)이 필요합니다."}, status=400)
+    
+    # 권한 체크 및 사용량 1장 예약 (단일 트랜잭션, 실패 시 환불)
+    permission = reserve_image_quota(user["uid"], 1)
+    if not permission["allowed"]:
+        return json_response({
+            "error": permission["reason"],
+            "usage": permission["usage"]
+        }, status=403, default=str)
+    
+    full_prompt = build_image_prompt(client, MODEL_NAME, image_prompt, style)
+    
+    try:
+        image = generate_image_bytes(
+            client, IMAGE_MODEL_NAME, full_prompt,
+            max_width=max_width, image_format=image_format, quality=quality
+        )
+        
+        if image is not None:
+            image_bytes, mime_type = image
+            
+            usage = summarize_image_usage(permission)
+            
+            if binary_response:
+                # 사용량은 헤더로 전달
+                return https_fn.Response(
+                    image_bytes,
+                    status=200,
+                    mimetype=mime_type,
+                    headers={
+                        "X-Usage-Daily-Used": str(usage["daily_used"]),
+                        "X-Usage-Daily-Limit": str(usage["daily_limit"]),
+                        "X-Usage-Monthly-Used": str(usage["monthly_used"]),
+                        "X-Usage-Monthly-Limit": str(usage["monthly_limit"]),
+                        "Access-Control-Expose-Headers": "X-Usage-Daily-Used, X-Usage-Daily-Limit, X-Usage-Monthly-Used, X-Usage-Monthly-Limit"
+                    }
+                )
+            
+            return json_response({
+                "success": True,
+                "image_base64": base64.b64encode(image_bytes).decode('utf-8'),
+                "mime_type": mime_type,
+                "usage": usage
+            })
+        
+        refund_image_quota(user["uid"], permission)
+        return json_response({"error": "이미지 생성 결과가 없습니다."}, status=500)
+        
+    except Exception as img_error:
+        logging.error(f"Image generation failed: {img_error}")
+        refund_image_quota(user["uid"], permission)
+        if isinstance(img_error, RateLimitExceeded):
+            return rate_limited_response(img_error)
+        return json_response({"error": f"이미지 생성 실패: {str(img_error)}"}, status=500)
+
+
+def handle_illustration_prompts(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 5] 본문 기반 삽화 프롬프트 생성"""
+    content = req_json.get("content", "")
+    count = req_json.get("count", 2)
+    
+    if not content:
+        return json_response({"error": "본문 내용이 필요합니다."}, status=400)
+    
+    parsed = generate_illustration_prompt_data(client, MODEL_NAME, content, count)
+    
+    return json_response(parsed)
+
+
+def handle_write_stream(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 6-S] 글 작성 스트리밍 (완성된 블록부터 NDJSON으로 전송)"""
+    topic, full_prompt = build_write_prompt(req_json)
+    category = resolve_topic_category(topic, req_json.get("category", ""))
+    events = stream_write_events(
+        client, MODEL_NAME, topic, full_prompt, category, req_json.get("fresh_search", False),
+        target_chars=parse_char_count(req_json.get("length", "보통 (1,500자)"))
+    )
+    
+    return https_fn.Response(
+        ndjson_lines(events),
+        status=200,
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def handle_write_with_assets(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 6-A] 글 + 썸네일 + 삽화 프롬프트 동시 생성 (한 번의 요청으로)"""
+    include_thumbnail = req_json.get("include_thumbnail", True)
+    permission = None
+    thumbnail_error = None
+    
+    # 썸네일이 포함되면 인증 후 이미지 1장만 예약 (본문/삽화 프롬프트는 차감 없음)
+    if include_thumbnail:
+        user = verify_user_token(req)
+        if not user:
+            return json_response({"error": "인증이 필요합니다. 로그인 후 이용해주세요."}, status=401)
+        permission = reserve_image_quota(user["uid"], 1)
+        if not permission["allowed"]:
+            # 한도 초과 시 썸네일만 제외하고 나머지는 생성
+            thumbnail_error = permission["reason"]
+            include_thumbnail = False
+    
+    result = run_write_with_assets(
+        client, MODEL_NAME, IMAGE_MODEL_NAME, req_json,
+        include_thumbnail=include_thumbnail
+    )
+    
+    if thumbnail_error:
+        result["errors"]["thumbnail"] = thumbnail_error
+    if permission and permission["allowed"]:
+        if result["thumbnail"] is None:
+            refund_image_quota(user["uid"], permission)
+        else:
+            result["usage"] = summarize_image_usage(permission)
+    
+    result["success"] = result["post"] is not None
+    return json_response(result, status=200 if result["success"] else 500, default=str)
+
+
+def handle_write_batch(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 6-B] 여러 주제 일괄 작성 (동시성 제한, 완료 순서대로 결과 전송)"""
+    specs = build_batch_specs(req_json)
+    if not specs:
+        return json_response({"error": "주제 목록(topics)이 필요합니다."}, status=400)
+    
+    concurrency = max(1, min(int(req_json.get("concurrency", BATCH_DEFAULT_CONCURRENCY)), BATCH_MAX_CONCURRENCY))
+    deadline = max(1.0, min(float(req_json.get("deadline_sec", BATCH_DEFAULT_DEADLINE)), BATCH_MAX_DEADLINE))
+    events = iter_write_batch(client, MODEL_NAME, specs, concurrency, deadline)
+    
+    if req_json.get("stream", True):
+        return https_fn.Response(
+            ndjson_lines(events),
+            status=200,
+            mimetype="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    # stream=false: 모두 끝난 뒤 주제 순서대로 한 번에 반환
+    results = []
+    summary = {}
+    for event in events:
+        if event.pop("event") == "result":
+            results.append(event)
+        else:
+            summary = event
+    results.sort(key=lambda item: item["index"])
+    
+    return json_response({"results": results, **summary})
+
+
+def handle_submit(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 7] 비동기 작업 등록 (작업 ID 즉시 반환)"""
+    payload = req_json.get("job")
+    if not isinstance(payload, dict):
+        payload = {key: value for key, value in req_json.items() if key != "mode"}
+    if not payload.get("topic"):
+        return json_response({"error": "주제(topic)가 필요합니다."}, status=400)
+    
+    job_id = uuid.uuid4().hex
+    user = verify_user_token(req) if req.headers.get("Authorization") else None
+    job_store.create(job_id, "write", payload, owner=user["uid"] if user else None)
+    
+    # Firestore 저장소는 문서 생성 트리거(process_generation_job)가 실행
+    if JOB_STORE_BACKEND == "memory":
+        threading.Thread(target=run_generation_job, args=(job_id,), daemon=True).start()
+    
+    return json_response({"job_id": job_id, "status": "queued"}, status=202)
+
+
+def expire_stale_job(job):
+    """
+    실행 함수가 시간 초과로 종료되어 running/queued로 남은 작업을 오류로 전환
+    (updated_at이 JOB_STALE_AFTER초보다 오래됨)
+    """
+    if job is None or job["status"] in TERMINAL_STATUSES:
+        return job
+    age = (datetime.now(timezone.utc) - job["updated_at"]).total_seconds()
+    if age <= JOB_STALE_AFTER:
+        return job
+    error = "작업 시간 초과 (생성 작업이 중단되었습니다)"
+    logging.warning(f"Job {job['job_id']} stale for {age:.0f}s in {job['status']}, marking as error")
+    job_store.update(job["job_id"], {"status": JOB_ERROR, "error": error})
+    return dict(job, status=JOB_ERROR, error=error, version=job.get("version", 0) + 1)
+
+
+def handle_job_query(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 7-1] 작업 상태 / 결과 조회 (wait_sec 동안 long-poll, 로그인 사용자의 작업은 본인만 조회)"""
+    job_id = req_json.get("job_id", "")
+    wait_sec = max(0.0, min(float(req_json.get("wait_sec", 0)), JOB_MAX_WAIT))
+    
+    job = expire_stale_job(job_store.get(job_id))
+    if job is not None and job.get("owner"):
+        user = verify_user_token(req) if req.headers.get("Authorization") else None
+        if not user or user["uid"] != job["owner"]:
+            job = None
+    if job is None:
+        return json_response({"error": "작업을 찾을 수 없습니다."}, status=404)
+    
+    if mode == "status":
+        # since_version 이후 변경(새 블록, 완료 등)이 생기면 즉시 반환
+        since_version = int(req_json.get("since_version", -1))
+        if job.get("version", 0) <= since_version and job["status"] not in TERMINAL_STATUSES:
+            job = job_store.wait(job_id, since_version, wait_sec)
+    else:
+        # 끝날 때까지 대기
+        deadline = time.monotonic() + wait_sec
+        while job and job["status"] not in TERMINAL_STATUSES and time.monotonic() < deadline:
+            job = job_store.wait(job_id, job.get("version", 0), deadline - time.monotonic())
+    
+    if job is None:
+        return json_response({"error": "작업을 찾을 수 없습니다."}, status=404)
+    
+    if mode == "result" and job["status"] == JOB_DONE:
+        return json_response(job["result"])
+    if mode == "result" and job["status"] == JOB_ERROR:
+        return json_response({"error": job.get("error")}, status=500)
+    
+    # status 조회, 또는 아직 끝나지 않은 result 조회 (202)
+    return json_response(build_job_view(job), status=200 if mode == "status" else 202, default=str)
+
+
+def handle_write(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 6] 글 작성 (Grounding 적용 - 최신 정보 반영)"""
+    data = generate_write_data(client, MODEL_NAME, req_json)
+    
+    return json_response(data)
+
+
+def handle_regenerate_blocks(req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """[모드 6-R] 기존 글의 일부 블록(또는 소제목 섹션)만 다시 작성"""
+    blocks = req_json.get("blocks")
+    if not isinstance(blocks, list) or not blocks:
+        return json_response({"error": "기존 글의 블록(blocks)이 필요합니다."}, status=400)
+    
+    try:
+        if req_json.get("heading") is not None:
+            heading_index = int(req_json["heading"])
+            if not 0 <= heading_index < len(blocks) or blocks[heading_index].get("type") != "heading":
+                raise ValueError
+            start, end = section_range(blocks, heading_index)
+            indices = range(start, end)
+        else:
+            indices = [int(i) for i in req_json.get("indices") or []]
+            if not indices or not all(0 <= i < len(blocks) for i in indices):
+                raise ValueError
+    except (TypeError, ValueError, AttributeError):
+        return json_response({"error": "다시 쓸 블록 번호(indices) 또는 소제목 번호(heading)가 올바르지 않습니다."}, status=400)
+    
+    if len(set(indices)) > REGENERATE_MAX_BLOCKS:
+        return json_response({
+            "error": f"한 번에 최대 {REGENERATE_MAX_BLOCKS}개 블록까지 다시 쓸 수 있습니다. 전체를 바꾸려면 글을 새로 생성해주세요."
+        }, status=400)
+    
+    data = regenerate_block_ranges(client, MODEL_NAME, req_json, blocks, contiguous_ranges(indices))
+    if not data["replaced"]:
+        return json_response({"error": "블록을 다시 생성하지 못했습니다. 잠시 후 다시 시도해주세요."}, status=502)
+    return json_response(data)
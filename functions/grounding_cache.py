@@ -0,0 +1,244 @@
+"""
+카테고리별 Grounding 검색 자료 캐시
+Google Search Grounding 응답의 grounding_metadata에서 검색어, 출처(제목/URL)와 근거 자료를
+(카테고리, 날짜)별로 모아 두고, 같은 카테고리의 글 작성은 근거 자료가 충분히 최신이면
+검색 도구 없이 캐시된 근거를 프롬프트에 넣어 생성한다.
+Google Search 출처(grounding_chunks.web)에는 본문이 없으므로(제목은 도메인, URL은 리다이렉트 링크)
+근거 자료는 출처로 뒷받침된 구간(grounding_supports의 segment)과 검색 본문(retrieved_context.text)이다.
+segment는 다른 글의 문장이므로 프롬프트에는 "사실 자료"로만 넣고 문장을 그대로 쓰지 않도록 지시한다.
+검색 사용/캐시 사용 호출의 지연시간을 모드별로 비교 집계한다
+"""
+import logging
+import threading
+from datetime import datetime, timezone
+
+from topic_pool import KST, FirestoreTopicPoolStore, MemoryTopicPoolStore, pool_date, pool_key
+from ttl_cache import TTLCache
+
+# 카테고리별로 보관하는 최대 출처/검색어/근거 수
+MAX_SOURCES = 20
+MAX_QUERIES = 20
+MAX_EVIDENCE = 40
+# 근거 하나의 최대 길이 (자)
+MAX_EVIDENCE_CHARS = 400
+
+
+def _chunk_source(chunk) -> dict:
+    """grounding_chunk의 출처 정보 (web 또는 retrieved_context, 없으면 None)"""
+    for field in ("web", "retrieved_context"):
+        source = getattr(chunk, field, None)
+        if source is not None and getattr(source, "uri", None):
+            return {"title": getattr(source, "title", "") or "", "uri": source.uri}
+    return None
+
+
+def extract_grounding(response) -> dict:
+    """
+    응답의 grounding_metadata에서 검색어/출처/근거 추출
+
+    근거는 출처로 뒷받침된 답변 구간(grounding_supports)과 검색 본문(retrieved_context.text)이며
+    각 근거에는 뒷받침한 출처 제목을 붙인다
+
+    Returns:
+        {"queries": [...], "sources": [{"title", "uri"}], "evidence": [{"text", "sources"}]}
+        또는 None (검색 결과 없음)
+    """
+    for candidate in getattr(response, "candidates", None) or []:
+        metadata = getattr(candidate, "grounding_metadata", None)
+        if metadata is None:
+            continue
+        chunks = list(getattr(metadata, "grounding_chunks", None) or [])
+        sources, evidence = [], []
+        for chunk in chunks:
+            source = _chunk_source(chunk)
+            if source is not None:
+                sources.append(source)
+            context = getattr(chunk, "retrieved_context", None)
+            text = (getattr(context, "text", None) or "").strip() if context is not None else ""
+            if text:
+                evidence.append({"text": text[:MAX_EVIDENCE_CHARS], "sources": [source["title"]] if source else []})
+        for support in getattr(metadata, "grounding_supports", None) or []:
+            segment = getattr(support, "segment", None)
+            text = (getattr(segment, "text", None) or "").strip() if segment is not None else ""
+            if not text:
+                continue
+            titles = []
+            for index in getattr(support, "grounding_chunk_indices", None) or []:
+                source = _chunk_source(chunks[index]) if 0 <= index < len(chunks) else None
+                if source is not None and source["title"] not in titles:
+                    titles.append(source["title"])
+            evidence.append({"text": text[:MAX_EVIDENCE_CHARS], "sources": titles})
+        queries = list(getattr(metadata, "web_search_queries", None) or [])
+        if sources:
+            return {"queries": queries, "sources": sources, "evidence": evidence}
+    return None
+
+
+def _merge_unique(existing: list, new: list, limit: int, key=lambda item: item) -> list:
+    """새 항목을 앞에 두고 중복 제거 후 limit개까지"""
+    merged, seen = [], set()
+    for item in list(new) + list(existing):
+        marker = key(item)
+        if marker in seen:
+            continue
+        seen.add(marker)
+        merged.append(item)
+    return merged[:limit]
+
+
+def format_grounding_context(context: dict) -> str:
+    """캐시된 검색 자료(검색어/근거/출처)를 프롬프트용 참고 자료 텍스트로"""
+    queries = ", ".join(context.get("queries", [])[:10])
+    evidence = "\n".join(
+        f"- {item['text']}" + (f" (출처: {', '.join(item['sources'])})" if item.get("sources") else "")
+        for item in context.get("evidence", [])
+    )
+    sources = ", ".join(source["title"] for source in context.get("sources", []) if source.get("title"))
+    return f"""
+    [REFERENCE - {context.get('date', '')} 최신 검색 자료]
+    아래는 오늘 같은 카테고리 주제를 Google 검색해 확인한 사실 자료입니다.
+    주제와 관련된 사실만 골라 활용하되 문장은 그대로 옮기지 말고 새로 작성하세요.
+    자료에 없는 수치나 최신 정보는 단정하지 마세요.
+    검색어: {queries}
+
+    사실 자료:
+    {evidence}
+
+    출처: {sources}
+    """
+
+
+class LatencyComparison:
+    """모드별 검색 도구 사용/캐시 자료 사용 호출 지연시간 비교 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = {}
+
+    def record(self, mode: str, variant: str, latency: float):
+        with self._lock:
+            stats = self._modes.setdefault(mode, {}).setdefault(variant, {"calls": 0, "total": 0.0, "max": 0.0})
+            stats["calls"] += 1
+            stats["total"] += latency
+            stats["max"] = max(stats["max"], latency)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for mode, variants in self._modes.items():
+                result[mode] = {
+                    variant: dict(stats, avg=stats["total"] / stats["calls"])
+                    for variant, stats in variants.items()
+                }
+                search, cached = variants.get("search"), variants.get("cached")
+                if search and cached:
+                    result[mode]["avg_saved"] = search["total"] / search["calls"] - cached["total"] / cached["calls"]
+            return result
+
+
+class GroundingCache:
+    """
+    (카테고리, 날짜)별 검색 자료
+
+    자료 문서: {"date", "category", "queries", "sources", "evidence", "responses", "updated_at"}
+    """
+
+    def __init__(self, store, max_age: float = 6 * 3600, min_sources: int = 5, min_evidence: int = 8,
+                 cache_ttl: float = 300):
+        """
+        Args:
+            store: 자료 저장소 (topic_pool의 get/put 저장소 사용)
+            max_age: 검색 도구를 생략해도 되는 자료의 최대 경과 시간 (초)
+            min_sources: 검색 도구를 생략하는 데 필요한 최소 출처 수
+            min_evidence: 검색 도구를 생략하는 데 필요한 최소 근거 수 (출처만 있고 근거가 없으면 항상 검색)
+            cache_ttl: 인스턴스 메모리에 자료를 들고 있는 시간 (초, 저장소 조회 절약)
+        """
+        self.store = store
+        self.max_age = max_age
+        self.min_sources = min_sources
+        self.min_evidence = min_evidence
+        self._cache = TTLCache(max_size=64, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        self.latency = LatencyComparison()
+        self._counters = {"captured": 0, "fresh_hits": 0, "stale": 0, "misses": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counters[key] += 1
+
+    def get(self, category: str, date: str = None):
+        """해당 날짜 자료 (없으면 None)"""
+        key = pool_key(category, date or pool_date())
+        context = self._cache.get(key)
+        if context is None:
+            context = self.store.get(key) or {}
+            self._cache.set(key, context, ttl=None if context else 60)
+        return context or None
+
+    def add(self, category: str, response, mode: str = "", date: str = None) -> bool:
+        """응답의 검색 자료를 오늘 자료에 합침 (검색 결과가 없으면 False)"""
+        grounding = extract_grounding(response)
+        if not category or grounding is None:
+            return False
+        date = date or pool_date()
+        key = pool_key(category, date)
+        with self._lock:
+            context = dict(self.get(category, date) or {"date": date, "category": category, "responses": 0})
+            context["queries"] = _merge_unique(context.get("queries", []), grounding["queries"], MAX_QUERIES)
+            context["sources"] = _merge_unique(
+                context.get("sources", []), grounding["sources"], MAX_SOURCES, key=lambda source: source["uri"]
+            )
+            context["evidence"] = _merge_unique(
+                context.get("evidence", []), grounding["evidence"], MAX_EVIDENCE, key=lambda item: item["text"]
+            )
+            context["responses"] = context.get("responses", 0) + 1
+            context["updated_at"] = datetime.now(timezone.utc).isoformat()
+            context["last_mode"] = mode
+            self._cache.set(key, context)
+        try:
+            self.store.put(key, context)
+        except Exception as e:
+            logging.warning(f"Grounding cache write failed ({category}): {e}")
+        self._count("captured")
+        return True
+
+    def fresh(self, category: str, now: datetime = None):
+        """검색 도구 없이 써도 될 만큼 최신이고 근거가 충분한 자료 (없으면 None)"""
+        if not category:
+            return None
+        now = now or datetime.now(KST)
+        context = self.get(category, pool_date(now.astimezone(KST)))
+        if not context:
+            self._count("misses")
+            return None
+        age = (now - datetime.fromisoformat(context["updated_at"])).total_seconds()
+        if (age > self.max_age or len(context.get("sources", [])) < self.min_sources
+                or len(context.get("evidence", [])) < self.min_evidence):
+            self._count("stale")
+            return None
+        self._count("fresh_hits")
+        return context
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        return dict(counters, latency=self.latency.snapshot())
+
+
+def create_grounding_cache(backend: str, db_getter, max_age: float = 6 * 3600):
+    """
+    설정값으로 검색 자료 캐시 생성
+
+    Args:
+        backend: "firestore" (인스턴스 간 공유), "memory" (인스턴스 메모리, 로컬/테스트용), "off" (항상 검색)
+        db_getter: Firestore 클라이언트를 반환하는 함수
+        max_age: 검색 도구를 생략해도 되는 자료의 최대 경과 시간 (초)
+
+    Returns:
+        GroundingCache 또는 None ("off")
+    """
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return GroundingCache(MemoryTopicPoolStore(), max_age=max_age)
+    return GroundingCache(FirestoreTopicPoolStore(db_getter, collection="grounding_context", ttl=2 * 24 * 3600), max_age=max_age)
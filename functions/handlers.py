@@ -0,0 +1,107 @@
+"""
+모드별 요청 처리기 레지스트리
+모드 이름으로 처리 함수를 찾고, 처리 함수가 있는 모듈은 그 모드 요청이 처음 들어올 때 불러온다.
+계정 모드만 처리한 인스턴스는 google-genai와 생성 모듈(카테고리/프롬프트 설정 등)을 불러오지 않는다
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+from firebase_functions import https_fn
+
+from json_response import json_response
+from rate_limiter import RateLimitExceeded
+from tracing import annotate, span
+
+# 모드 -> (모듈, 처리 함수, 모델 클라이언트 필요 여부)
+HANDLERS = {
+    "register_user": ("accounts", "handle_register_user", False),
+    "user_info": ("accounts", "handle_user_info", False),
+    "usage_report": ("accounts", "handle_usage_report", False),
+    "recommend": ("generation", "handle_recommend", True),
+    "recommend_by_keywords": ("generation", "handle_recommend_by_keywords", True),
+    "analyze": ("generation", "handle_analyze", True),
+    "generate_image": ("generation", "handle_generate_image", True),
+    "generate_illustration_prompts": ("generation", "handle_illustration_prompts", True),
+    "write": ("generation", "handle_write", True),
+    "write_stream": ("generation", "handle_write_stream", True),
+    "write_with_assets": ("generation", "handle_write_with_assets", True),
+    "write_batch": ("generation", "handle_write_batch", True),
+    "regenerate_blocks": ("generation", "handle_regenerate_blocks", True),
+    "submit": ("generation", "handle_submit", False),
+    "status": ("generation", "handle_job_query", False),
+    "result": ("generation", "handle_job_query", False),
+}
+
+# 등록되지 않은 모드는 글 작성으로 처리 (기존 동작)
+DEFAULT_MODE = "write"
+
+# 모델 SDK 없이 처리되는 모드 (계정 전용 함수에서 받는 모드)
+LIGHT_MODES = tuple(mode for mode, (module, _, _) in HANDLERS.items() if module == "accounts")
+
+_resolved = {}
+_load_times = {}
+_lock = threading.Lock()
+
+
+def resolve_handler(mode: str) -> tuple:
+    """
+    모드의 처리 함수 조회 (모듈은 처음 필요할 때 import)
+
+    Returns:
+        (처리 함수, 모델 클라이언트 필요 여부)
+    """
+    module_name, func_name, uses_model = HANDLERS.get(mode, HANDLERS[DEFAULT_MODE])
+    with _lock:
+        handler = _resolved.get((module_name, func_name))
+        if handler is None:
+            first_load = module_name not in sys.modules
+            started = time.perf_counter()
+            with span("handler.load", module=module_name):
+                module = importlib.import_module(module_name)
+            if first_load:
+                _load_times[module_name] = time.perf_counter() - started
+                logging.info(f"Loaded handler module {module_name} in {_load_times[module_name]:.2f}s (mode: {mode})")
+            handler = getattr(module, func_name)
+            _resolved[(module_name, func_name)] = handler
+    return handler, uses_model
+
+
+def get_handler_load_stats() -> dict:
+    """처리기 모듈별 최초 import 소요 시간 (초)"""
+    with _lock:
+        return dict(_load_times)
+
+
+def get_model_client(gemini_key: str):
+    """모델 클라이언트 (웜 인스턴스에서는 기존 클라이언트/커넥션 재사용)"""
+    # genai_pool은 google-genai를 불러오므로 모델을 쓰는 모드에서만 import
+    from genai_pool import get_genai_client
+    return get_genai_client(gemini_key)
+
+
+def rate_limited_response(error: RateLimitExceeded) -> https_fn.Response:
+    """모델 호출 한도 초과 응답 (429 + Retry-After)"""
+    retry_after = max(1, round(error.retry_after))
+    return json_response({
+        "error": "요청이 많아 잠시 후 다시 시도해주세요.",
+        "retry_after": retry_after
+    }, status=429, headers={
+        "Retry-After": str(retry_after),
+        "Access-Control-Expose-Headers": "Retry-After"
+    })
+
+
+def run_handler(handler, req: https_fn.Request, req_json: dict, mode: str, client) -> https_fn.Response:
+    """처리 함수 실행 (호출 한도 초과는 429, 그 외 예외는 500 응답으로 변환)"""
+    annotate(mode=mode)
+    try:
+        with span("handler", mode=mode):
+            return handler(req, req_json, mode, client)
+    except RateLimitExceeded as e:
+        logging.warning(f"Rate limited in {mode}: {e}")
+        return rate_limited_response(e)
+    except Exception as e:
+        logging.error(f"API Error: {e}")
+        return https_fn.Response(f"Server Error: {str(e)}", status=500)
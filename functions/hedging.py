@@ -0,0 +1,304 @@
+"""
+모델 호출 헤징(hedged request)
+모드별 지연시간 분포로 예산(기본 p90)을 정하고, 기본 호출이 예산 안에 끝나지 않으면
+대체 모델로 두 번째 호출을 보내 먼저 도착한 유효한 응답을 사용한다.
+진 쪽 호출은 이미 보낸 HTTP 요청을 SDK에서 중단할 수 없어 끝까지 진행되고 과금된다.
+그래서 두 번째 호출의 사용량은 장부에 "<모드>:hedge" 모드로 따로 합산하고, 진 쪽이 끝까지 쓴
+토큰은 stats()의 abandoned/abandoned_tokens로 집계한다.
+스레드 풀이 차서 두 번째 호출이 대기열에 쌓일 상황이면 헤징하지 않는다 (예산이 의미 없어지므로)
+"""
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from usage_ledger import UsageOwner, usage_owner
+
+# 통계 스냅샷용 지연시간 구간 상한 (초)
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 40, 60, 120)
+
+# 두 번째(헤지) 호출 사용량을 장부에 귀속할 모드 접미사
+HEDGE_MODE_SUFFIX = ":hedge"
+
+
+class LatencyHistogram:
+    """최근 window개 지연시간 표본으로 백분위수를 계산하는 히스토그램 (스레드 안전)"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float):
+        """p(0~1) 백분위수 (표본이 없으면 None)"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+        buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for latency in samples:
+            buckets[bisect.bisect_left(HISTOGRAM_BOUNDS, latency)] += 1
+        labels = [f"<={bound}s" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]}s"]
+
+        def _pct(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else None
+
+        return {
+            "count": len(samples),
+            "p50": _pct(0.5),
+            "p90": _pct(0.9),
+            "p99": _pct(0.99),
+            "buckets": dict(zip(labels, buckets)),
+        }
+
+
+class HedgePolicy:
+    """모드별 헤징 정책"""
+
+    def __init__(
+        self,
+        fallback_model: str,
+        enabled: bool = True,
+        percentile: float = 0.9,
+        default_budget: float = 20.0,
+        min_budget: float = 5.0,
+        max_budget: float = 60.0,
+        min_samples: int = 10,
+        fallback_tools: bool = True
+    ):
+        """
+        Args:
+            fallback_model: 두 번째 호출에 사용할 모델 (기본 모델과 같아도 됨)
+            enabled: 헤징 사용 여부
+            percentile: 예산으로 사용할 기본 호출 지연시간 백분위수
+            default_budget: 표본이 min_samples개 미만일 때의 예산 (초)
+            min_budget / max_budget: 예산 하한/상한 (초)
+            min_samples: 히스토그램으로 예산을 정하기 위한 최소 표본 수
+            fallback_tools: False면 두 번째 호출에서 tools(검색 Grounding 등)를 제외
+                            (Grounding을 지원하지 않는 경량 모델용)
+        """
+        self.fallback_model = fallback_model
+        self.enabled = enabled
+        self.percentile = percentile
+        self.default_budget = default_budget
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.min_samples = min_samples
+        self.fallback_tools = fallback_tools
+
+    def budget(self, histogram: LatencyHistogram) -> float:
+        """기본 호출을 단독으로 기다릴 시간 (초)"""
+        if len(histogram) < self.min_samples:
+            return self.default_budget
+        return max(self.min_budget, min(histogram.percentile(self.percentile), self.max_budget))
+
+    def fallback_kwargs(self, kwargs: dict) -> dict:
+        """두 번째 호출의 generate_content 인자"""
+        config = kwargs.get("config")
+        if self.fallback_tools or config is None or not getattr(config, "tools", None):
+            return kwargs
+        return dict(kwargs, config=config.model_copy(update={"tools": None}))
+
+
+def apply_policy_overrides(policies: dict, overrides: str) -> dict:
+    """
+    JSON 문자열로 정책 일부 덮어쓰기
+    예: '{"write": {"enabled": false}, "analyze": {"percentile": 0.95}}'
+    """
+    if not overrides:
+        return policies
+    try:
+        for mode, fields in json.loads(overrides).items():
+            policy = policies.get(mode)
+            if policy is None:
+                continue
+            for key, value in fields.items():
+                if hasattr(policy, key):
+                    setattr(policy, key, value)
+    except (ValueError, AttributeError) as e:
+        logging.warning(f"Invalid hedge policy overrides: {e}")
+    return policies
+
+
+class Hedger:
+    """정책에 따라 generate_content를 헤징하여 호출"""
+
+    def __init__(self, policies: dict, max_workers: int = 16):
+        """
+        Args:
+            policies: {모드: HedgePolicy}
+            max_workers: 호출 스레드 수 (스케줄러가 동시에 내보낼 수 있는 호출 수에 맞춤,
+                         기본 호출과 헤지 호출이 모두 바로 시작할 자리가 없으면 헤징하지 않음)
+        """
+        self.policies = policies
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._active = 0
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, mode: str) -> LatencyHistogram:
+        with self._lock:
+            return self._histograms.setdefault(mode, LatencyHistogram())
+
+    def _count(self, mode: str, key: str, amount: int = 1):
+        with self._lock:
+            counters = self._counters.setdefault(mode, {
+                "calls": 0, "hedged": 0, "primary_wins": 0, "fallback_wins": 0,
+                "saturated": 0, "abandoned": 0, "abandoned_tokens": 0
+            })
+            counters[key] += amount
+
+    def _has_room(self, calls: int) -> bool:
+        """calls개의 호출이 스레드 풀에서 기다리지 않고 바로 시작할 수 있는지"""
+        with self._lock:
+            return self._active + calls <= self.max_workers
+
+    def _release(self, future):
+        with self._lock:
+            self._active -= 1
+
+    def _submit(self, client, model: str, kwargs: dict, context: contextvars.Context = None):
+        # 요청 우선순위/사용량 귀속 대상(contextvar)을 호출 스레드로 전달
+        with self._lock:
+            self._active += 1
+        future = self._executor.submit(
+            (context or contextvars.copy_context()).run,
+            lambda: client.models.generate_content(model=model, **kwargs)
+        )
+        future.add_done_callback(self._release)
+        return future
+
+    def _abandon(self, mode: str, future):
+        """진 쪽 호출은 중단할 수 없으므로 끝날 때 사용한 토큰을 집계 (취소된 경우 제외)"""
+        if future.cancel():
+            return
+        self._count(mode, "abandoned")
+
+        def _done(done):
+            if done.cancelled() or done.exception() is not None:
+                return
+            usage = getattr(done.result(), "usage_metadata", None)
+            self._count(mode, "abandoned_tokens", getattr(usage, "total_token_count", 0) or 0)
+
+        future.add_done_callback(_done)
+
+    @staticmethod
+    def _hedge_context() -> contextvars.Context:
+        """헤지 호출용 컨텍스트 (장부에서 "<모드>:hedge"로 구분)"""
+        context = contextvars.copy_context()
+        owner = context.run(usage_owner.get)
+        context.run(usage_owner.set, UsageOwner(owner.user, f"{owner.mode}{HEDGE_MODE_SUFFIX}"))
+        return context
+
+    def generate(self, client, mode: str, model: str, validate=None, fallback_config=None, **kwargs):
+        """
+        헤징 적용 generate_content
+
+        Args:
+            mode: 정책/히스토그램 구분용 모드 이름
+            model: 기본 모델
+            validate: 응답이 쓸 만한지 판단하는 함수 (예: JSON 파싱 가능 여부)
+            fallback_config: 두 번째 호출에 쓸 설정 (기본 모델 전용 컨텍스트 캐시를 참조하는 경우 등)
+
+        기본 호출이 예산 안에 끝나면 그 결과를 그대로 반환하고, 아니면 대체 모델 호출을 추가로 보내
+        먼저 도착한 유효한 응답을 반환한다. 진 쪽 호출은 결과를 버린다 (이미 전송된 HTTP 요청은
+        SDK에서 중단할 수 없으므로 백그라운드에서 끝까지 진행되고, 사용 토큰은 abandoned_tokens로 집계).
+        스레드 풀에 두 호출이 바로 시작할 자리가 없으면 헤징 없이 이 스레드에서 호출한다.
+        """
+        policy = self.policies.get(mode)
+        if policy is None or not policy.enabled:
+            return client.models.generate_content(model=model, **kwargs)
+
+        self._count(mode, "calls")
+        if not self._has_room(2):
+            self._count(mode, "saturated")
+            return client.models.generate_content(model=model, **kwargs)
+        histogram = self._histogram(mode)
+        budget = policy.budget(histogram)
+        started = time.monotonic()
+
+        primary = self._submit(client, model, kwargs)
+
+        def _record(future):
+            # 기본 모델 지연시간 분포 (헤징 여부와 무관하게 성공한 호출만)
+            if not future.cancelled() and future.exception() is None:
+                histogram.record(time.monotonic() - started)
+
+        primary.add_done_callback(_record)
+
+        done, _ = wait([primary], timeout=budget)
+        if done:
+            self._count(mode, "primary_wins")
+            return primary.result()
+        if not self._has_room(1):
+            # 헤지 호출이 대기열에 쌓이면 기본 호출보다 빨라질 수 없음
+            self._count(mode, "saturated")
+            return primary.result()
+
+        fallback_model = policy.fallback_model or model
+        logging.info(f"Hedging {mode}: {model} exceeded {budget:.1f}s budget, sending {fallback_model}")
+        self._count(mode, "hedged")
+        if fallback_config is not None:
+            kwargs = dict(kwargs, config=fallback_config)
+        secondary = self._submit(client, fallback_model, policy.fallback_kwargs(kwargs), self._hedge_context())
+
+        pending = {primary: "primary", secondary: "fallback"}
+        last_response = None
+        last_error = None
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                which = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logging.warning(f"Hedged {which} call for {mode} failed: {e}")
+                    last_error = e
+                    continue
+                if validate is None or _is_valid(validate, response):
+                    for loser in pending:
+                        self._abandon(mode, loser)
+                    self._count(mode, f"{which}_wins")
+                    logging.info(f"Hedged {mode} won by {which} in {time.monotonic() - started:.1f}s")
+                    return response
+                last_response = response
+
+        # 둘 다 유효하지 않으면 마지막 응답(호출자가 기존 방식으로 복구) 또는 마지막 오류
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def stats(self) -> dict:
+        with self._lock:
+            modes = set(self._histograms) | set(self._counters)
+            return {
+                mode: {
+                    **self._counters.get(mode, {}),
+                    "latency": self._histograms[mode].snapshot() if mode in self._histograms else None,
+                }
+                for mode in modes
+            }
+
+
+def _is_valid(validate, response) -> bool:
+    try:
+        return bool(validate(response))
+    except Exception:
+        return False
@@ -0,0 +1,128 @@
+"""
+요청 멱등성 처리
+같은 요청(Idempotency-Key 또는 같은 페이로드)이 중복으로 들어오면
+진행 중인 요청은 하나의 모델 호출을 공유하고(single-flight),
+완료된 결과는 재전송 유효시간 동안 그대로 재사용한다
+"""
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future
+
+from ttl_cache import TTLCache
+
+# 멱등 처리 대상 모드 (모델 호출/이미지 한도 차감이 있는 생성 요청)
+IDEMPOTENT_MODES = {
+    "recommend",
+    "recommend_by_keywords",
+    "analyze",
+    "generate_image",
+    "generate_illustration_prompts",
+    "write",
+    "write_with_assets",
+    "write_batch",
+    "submit",
+}
+
+# 페이로드 해시에서 제외할 필드
+_VOLATILE_FIELDS = ("idempotency_key",)
+
+
+def request_idempotency_key(headers, req_json: dict, mode: str) -> tuple:
+    """
+    요청의 멱등 키 결정
+
+    - Idempotency-Key 헤더(또는 idempotency_key 필드)가 있으면 그 값 사용 (명시 키)
+    - 없으면 모드 + 페이로드 해시로 생성 (유도 키)
+    - 어느 쪽이든 Authorization 헤더로 범위를 나눠 다른 사용자의 결과와 섞이지 않게 한다
+
+    Returns:
+        (키, 명시 키 여부) - 멱등 처리 대상이 아니면 (None, False)
+    """
+    if mode not in IDEMPOTENT_MODES:
+        return None, False
+
+    scope = hashlib.sha256(headers.get("Authorization", "").encode("utf-8")).hexdigest()[:16]
+    explicit = headers.get("Idempotency-Key") or req_json.get("idempotency_key")
+    if explicit:
+        return f"{scope}:key:{explicit}", True
+
+    payload = {k: v for k, v in req_json.items() if k not in _VOLATILE_FIELDS}
+    digest = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{scope}:payload:{digest}", False
+
+
+class SingleFlight:
+    """
+    키별 single-flight 실행기 + 완료 결과 재전송 캐시
+
+    같은 키로 동시에 들어온 호출은 먼저 들어온 호출의 결과를 기다려 공유하고,
+    replay=True로 완료된 결과는 replay_ttl 동안 다시 실행하지 않고 반환한다.
+    """
+
+    def __init__(self, replay_ttl: float = 600, max_size: int = 256):
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future
+        self._completed = TTLCache(max_size=max_size, ttl=replay_ttl)
+        self.executed = 0
+        self.coalesced = 0
+        self.replayed = 0
+
+    def run(self, key: str, func, replay: bool = True, should_store=None) -> tuple:
+        """
+        Args:
+            key: 멱등 키
+            func: 실제 처리 함수 (인자 없음)
+            replay: 완료 결과를 재전송 캐시에 저장/조회할지 여부
+            should_store: 결과를 저장할지 판단하는 함수 (예: 성공 응답만)
+
+        Returns:
+            (결과, "executed" | "coalesced" | "replayed")
+        """
+        if replay:
+            cached = self._completed.get(key)
+            if cached is not None:
+                self.replayed += 1
+                logging.info(f"Idempotent replay for {key[:40]}")
+                return cached, "replayed"
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            self.coalesced += 1
+            logging.info(f"Coalesced duplicate in-flight request for {key[:40]}")
+            return future.result(), "coalesced"
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        # 재전송 캐시에 먼저 넣은 뒤 진행 중 목록에서 제거 (사이에 들어온 요청이 재실행하지 않도록)
+        if replay and (should_store is None or should_store(result)):
+            self._completed.set(key, result)
+        with self._lock:
+            self._inflight.pop(key, None)
+        self.executed += 1
+        future.set_result(result)
+        return result, "executed"
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+            "inflight": len(self._inflight),
+            "replay_cache": self._completed.stats(),
+        }
@@ -0,0 +1,74 @@
+"""
+이미지 후처리 유틸리티
+생성된 이미지를 네이버 블로그 표시 크기에 맞게 축소/재인코딩 (Pillow 선택 의존성)
+"""
+import io
+import logging
+
+# 지원 출력 형식: 요청 값 -> (Pillow 형식, MIME 타입)
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+# 네이버 블로그 본문 표시 폭
+DEFAULT_MAX_WIDTH = 960
+DEFAULT_QUALITY = 85
+
+
+def transcode_image(
+    data: bytes,
+    mime_type: str = "image/png",
+    max_width: int = None,
+    image_format: str = None,
+    quality: int = DEFAULT_QUALITY
+) -> tuple:
+    """
+    이미지 축소 및 형식 변환
+
+    Args:
+        data: 원본 이미지 바이트
+        mime_type: 원본 MIME 타입
+        max_width: 최대 가로 폭 (이보다 크면 비율 유지 축소, None이면 유지)
+        image_format: 출력 형식 ("png", "jpeg", "webp", None이면 원본 유지)
+        quality: JPEG/WebP 품질 (1~95)
+
+    Returns:
+        (이미지 바이트, MIME 타입) - Pillow가 없거나 실패하면 원본 그대로
+    """
+    target = IMAGE_FORMATS.get((image_format or "").lower())
+    if not max_width and not target:
+        return data, mime_type
+
+    try:
+        from PIL import Image
+    except ImportError:
+        logging.warning("Pillow is not installed; returning original image")
+        return data, mime_type
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        pil_format, out_mime = target or (image.format or "PNG", mime_type)
+
+        if max_width and image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        save_options = {"optimize": True}
+        if pil_format in ("JPEG", "WEBP"):
+            save_options["quality"] = max(1, min(int(quality), 95))
+        image.save(output, format=pil_format, **save_options)
+
+        result = output.getvalue()
+        logging.info(f"Transcoded image {len(data)} -> {len(result)} bytes ({out_mime}, {image.width}px)")
+        return result, out_mime
+
+    except Exception as e:
+        logging.error(f"Image transcoding failed: {e}")
+        return data, mime_type
@@ -0,0 +1,245 @@
+"""
+비동기 생성 작업(job) 저장소
+submit으로 등록한 작업의 상태/중간 결과/최종 결과를 저장하고,
+status/result 요청이 변경될 때까지 기다릴 수 있도록(long-poll) 한다
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from ttl_cache import TTLCache
+
+# 작업 상태
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_ERROR = "error"
+TERMINAL_STATUSES = (JOB_DONE, JOB_ERROR)
+
+
+class JobStore:
+    """
+    작업 저장소 인터페이스
+
+    작업 문서 필드:
+        job_id, mode, status, payload, owner(요청자 uid), version(변경마다 1 증가),
+        title, blocks(중간 결과), result(최종 결과), error, created_at, updated_at
+    """
+
+    # wait() 기본 구현의 조회 간격 (초, 조회할 때마다 2배로 늘려 max_poll_interval까지)
+    poll_interval = 1.0
+    max_poll_interval = 5.0
+
+    def create(self, job_id: str, mode: str, payload: dict, owner: str = None) -> dict:
+        """대기(queued) 상태로 작업 생성 (owner: 사용량을 귀속할 요청자)"""
+        raise NotImplementedError
+
+    def get(self, job_id: str):
+        """작업 문서 반환 (없거나 만료되면 None)"""
+        raise NotImplementedError
+
+    def update(self, job_id: str, fields: dict):
+        """작업 필드 갱신 (version 증가)"""
+        raise NotImplementedError
+
+    def claim(self, job_id: str) -> bool:
+        """대기 중인 작업을 실행 중으로 전환 (이미 다른 실행자가 가져갔으면 False)"""
+        raise NotImplementedError
+
+    def wait(self, job_id: str, since_version: int = -1, timeout: float = 0.0):
+        """
+        작업이 since_version 이후로 변경되었거나 끝날 때까지 최대 timeout초 대기 후 반환
+        (기본 구현은 poll_interval부터 늘어나는 간격으로 조회)
+        """
+        deadline = time.monotonic() + timeout
+        interval = self.poll_interval
+        while True:
+            job = self.get(job_id)
+            if self._settled(job, since_version):
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_poll_interval)
+
+    @staticmethod
+    def _settled(job, since_version: int) -> bool:
+        """wait()가 반환할 상태인지 (없음, since_version 이후 변경, 종료)"""
+        return job is None or job.get("version", 0) > since_version or job.get("status") in TERMINAL_STATUSES
+
+    @staticmethod
+    def _new_job(job_id: str, mode: str, payload: dict, owner: str = None) -> dict:
+        now = datetime.now(timezone.utc)
+        return {
+            "job_id": job_id,
+            "mode": mode,
+            "status": JOB_QUEUED,
+            "payload": payload,
+            "owner": owner,
+            "version": 0,
+            "title": "",
+            "blocks": [],
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+class MemoryJobStore(JobStore):
+    """
+    인스턴스 메모리 저장소 (로컬 실행/테스트용)
+    같은 인스턴스에서만 조회 가능하며, 변경 시 대기 중인 long-poll을 즉시 깨운다
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600):
+        self._jobs = TTLCache(max_size=max_size, ttl=ttl)
+        self._changed = threading.Condition()
+
+    def create(self, job_id: str, mode: str, payload: dict, owner: str = None) -> dict:
+        job = self._new_job(job_id, mode, payload, owner)
+        with self._changed:
+            self._jobs.set(job_id, job)
+        return dict(job)
+
+    def get(self, job_id: str):
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def update(self, job_id: str, fields: dict):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["version"] += 1
+            job["updated_at"] = datetime.now(timezone.utc)
+            self._changed.notify_all()
+
+    def claim(self, job_id: str) -> bool:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != JOB_QUEUED:
+                return False
+            job["status"] = JOB_RUNNING
+            job["version"] += 1
+            self._changed.notify_all()
+            return True
+
+    def wait(self, job_id: str, since_version: int = -1, timeout: float = 0.0):
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if self._settled(job, since_version):
+                    return dict(job) if job is not None else None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return dict(job)
+                self._changed.wait(remaining)
+
+
+class FirestoreJobStore(JobStore):
+    """
+    Firestore 저장소 (인스턴스 간 공유)
+    expires_at 필드에 Firestore TTL 정책을 걸면 오래된 작업 문서가 자동 삭제된다
+    wait()는 문서 리스너(on_snapshot)로 변경을 받아 long-poll 동안 조회를 반복하지 않는다
+    (초기 스냅샷 1회 + 변경마다 1회 읽기)
+    """
+
+    def __init__(self, db_getter, collection: str = "generation_jobs", ttl: float = 24 * 3600):
+        """
+        Args:
+            db_getter: Firestore 클라이언트를 반환하는 함수 (lazy initialization)
+            collection: 컬렉션 이름
+            ttl: 작업 문서 보관 시간 (초)
+        """
+        self._db_getter = db_getter
+        self.collection = collection
+        self._ttl = ttl
+
+    def _ref(self, job_id: str):
+        return self._db_getter().collection(self.collection).document(job_id)
+
+    def create(self, job_id: str, mode: str, payload: dict, owner: str = None) -> dict:
+        job = self._new_job(job_id, mode, payload, owner)
+        job["expires_at"] = job["created_at"] + timedelta(seconds=self._ttl)
+        self._ref(job_id).set(job)
+        return job
+
+    def get(self, job_id: str):
+        try:
+            doc = self._ref(job_id).get()
+            return doc.to_dict() if doc.exists else None
+        except Exception as e:
+            logging.warning(f"Job read failed ({job_id}): {e}")
+            return None
+
+    def wait(self, job_id: str, since_version: int = -1, timeout: float = 0.0):
+        if timeout <= 0:
+            return self.get(job_id)
+
+        settled = threading.Event()
+        latest = {}
+
+        def _on_snapshot(docs, changes, read_time):
+            for doc in docs:
+                job = doc.to_dict() if doc.exists else None
+                latest["job"] = job
+                if self._settled(job, since_version):
+                    settled.set()
+
+        try:
+            watch = self._ref(job_id).on_snapshot(_on_snapshot)
+        except Exception as e:
+            logging.warning(f"Job listener failed ({job_id}), polling instead: {e}")
+            return super().wait(job_id, since_version, timeout)
+        try:
+            settled.wait(timeout)
+        finally:
+            watch.unsubscribe()
+        # 리스너의 초기 스냅샷도 받지 못했으면 한 번 조회
+        return latest["job"] if "job" in latest else self.get(job_id)
+
+    def update(self, job_id: str, fields: dict):
+        from firebase_admin import firestore
+
+        updates = dict(fields)
+        updates["version"] = firestore.Increment(1)
+        updates["updated_at"] = datetime.now(timezone.utc)
+        self._ref(job_id).update(updates)
+
+    def claim(self, job_id: str) -> bool:
+        from firebase_admin import firestore
+
+        db = self._db_getter()
+        job_ref = self._ref(job_id)
+
+        @firestore.transactional
+        def _claim(transaction):
+            snapshot = job_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get("status") != JOB_QUEUED:
+                return False
+            transaction.update(job_ref, {
+                "status": JOB_RUNNING,
+                "version": firestore.Increment(1),
+                "updated_at": datetime.now(timezone.utc)
+            })
+            return True
+
+        return _claim(db.transaction())
+
+
+def create_job_store(backend: str, db_getter) -> JobStore:
+    """
+    설정값으로 작업 저장소 생성
+
+    Args:
+        backend: "firestore" (인스턴스 간 공유) 또는 "memory" (인스턴스 메모리, 로컬/테스트용)
+        db_getter: Firestore 클라이언트를 반환하는 함수
+    """
+    if backend == "memory":
+        return MemoryJobStore()
+    return FirestoreJobStore(db_getter)
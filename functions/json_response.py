@@ -0,0 +1,133 @@
+"""
+JSON 응답 인코딩
+모든 모드의 JSON 응답을 같은 방식(UTF-8 그대로, 공백 없는 구분자)으로 직렬화하고,
+클라이언트가 Accept-Encoding: gzip을 보내면 일정 크기 이상의 응답을 압축한다.
+orjson이 설치되어 있으면 직렬화에 사용하며(없으면 표준 json), 모드별 응답 크기를 집계한다
+"""
+import gzip
+import json
+import logging
+import threading
+
+from firebase_functions import https_fn
+
+from tracing import annotate
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 이보다 작은 응답은 압축하지 않음 (바이트)
+GZIP_MIN_SIZE = 1024
+
+# gzip 압축 수준 (1~9, 속도 우선)
+GZIP_LEVEL = 5
+
+# 압축 대상 Content-Type (이미지 등 이미 압축된 형식은 제외)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def encode_json(payload, default=None) -> bytes:
+    """
+    UTF-8 JSON 바이트로 직렬화 (한글을 \\uXXXX로 이스케이프하지 않음)
+
+    Args:
+        default: 기본 직렬화가 안 되는 값의 변환 함수 (datetime 등은 str)
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            # 64비트를 넘는 정수 등 orjson이 처리하지 못하는 값은 표준 json으로
+            pass
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def json_response(payload, status: int = 200, headers: dict = None, default=None) -> https_fn.Response:
+    """JSON 응답 생성 (모든 모드 공통)"""
+    return https_fn.Response(
+        encode_json(payload, default),
+        status=status,
+        mimetype="application/json",
+        headers=headers
+    )
+
+
+def ndjson_lines(events, default=None):
+    """스트리밍(NDJSON) 응답 본문: 이벤트마다 JSON 한 줄"""
+    for event in events:
+        yield encode_json(event, default) + b"\n"
+
+
+def accepts_gzip(req: https_fn.Request) -> bool:
+    """Accept-Encoding에 gzip이 있고 q=0으로 거부하지 않았는지"""
+    for item in req.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class PayloadStats:
+    """모드별 응답 크기 집계 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = {}
+
+    def record(self, mode: str, raw_size: int, sent_size: int):
+        with self._lock:
+            stats = self._modes.setdefault(mode, {
+                "responses": 0, "compressed": 0, "raw_bytes": 0, "sent_bytes": 0, "max_raw_bytes": 0
+            })
+            stats["responses"] += 1
+            stats["compressed"] += 1 if sent_size != raw_size else 0
+            stats["raw_bytes"] += raw_size
+            stats["sent_bytes"] += sent_size
+            stats["max_raw_bytes"] = max(stats["max_raw_bytes"], raw_size)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for mode, stats in self._modes.items():
+                item = dict(stats)
+                item["avg_raw_bytes"] = stats["raw_bytes"] // stats["responses"]
+                item["ratio"] = stats["sent_bytes"] / stats["raw_bytes"] if stats["raw_bytes"] else 1.0
+                result[mode] = item
+            return result
+
+
+# 인스턴스 전역 응답 크기 통계
+PAYLOAD_STATS = PayloadStats()
+
+
+def negotiate_encoding(req: https_fn.Request, response: https_fn.Response, mode: str) -> https_fn.Response:
+    """
+    요청의 Accept-Encoding에 맞춰 응답 본문 압축 + 크기 기록
+    (스트리밍 응답은 청크를 바로 보내야 하므로 압축하지 않음)
+    """
+    if response.is_streamed or response.headers.get("Content-Encoding"):
+        return response
+
+    body = response.get_data()
+    raw_size = len(body)
+    response.headers.add("Vary", "Accept-Encoding")
+    compressible = (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    if compressible and raw_size >= GZIP_MIN_SIZE and accepts_gzip(req):
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        if len(compressed) < raw_size:
+            response.set_data(compressed)
+            response.headers["Content-Encoding"] = "gzip"
+
+    sent_size = response.content_length or len(response.get_data())
+    PAYLOAD_STATS.record(mode, raw_size, sent_size)
+    annotate(response_bytes=raw_size, sent_bytes=sent_size)
+    if raw_size >= 256 * 1024:
+        logging.info(f"Large {mode} response: {raw_size} bytes (sent {sent_size})")
+    return response
+
+
+def get_payload_stats() -> dict:
+    """모드별 응답 크기 통계 조회"""
+    return PAYLOAD_STATS.snapshot()
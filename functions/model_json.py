@@ -0,0 +1,293 @@
+"""
+모델 응답 JSON 파서
+Gemini 응답(스트리밍 청크 또는 전체 텍스트)에서 JSON 객체를 관대하게 추출한다
+
+- 청크 단위로 feed하면 완성된 값을 즉시 이벤트로 반환
+- 응답이 잘리거나 약간 깨져 있어도(트레일링 콤마, 문자열 내 줄바꿈, 펜스 등)
+  완성된 항목까지 복구하고, 무엇을 복구했는지 보고서로 반환
+"""
+import json
+import logging
+
+from tracing import traced
+
+_MALFORMED = object()
+
+
+class ModelJsonParser:
+    """
+    최상위 JSON 객체를 청크 단위로 스캔하는 파서
+
+    응답 전체가 도착하기 전에도 다음 값을 완성되는 즉시 이벤트로 반환:
+    - ("value", key, value): 최상위 스칼라 값 (예: title)
+    - ("item", key, index, value): 최상위 배열의 완성된 원소 (예: blocks[i])
+
+    첫 번째 '{' 이전의 텍스트(```json 펜스 등)는 무시한다.
+    스트림이 끝나면 finish()로 최종 객체와 복구 보고서를 얻는다.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.finished = False
+        self._pos = 0
+        self._start = -1            # 최상위 '{' 위치
+        self._end = -1              # 최상위 '}' 다음 위치
+        self._stack = []            # 열린 컨테이너 ('{' 또는 '[')
+        self._expect_key = []       # 컨테이너별: 다음 문자열이 키인지 여부 (객체만 의미 있음)
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._scalar_start = -1     # 문자열이 아닌 스칼라(숫자, true 등) 시작 위치
+        self._element_start = -1    # 최상위 배열 원소 시작 위치
+        self._last_significant = -1  # 문자열 밖 마지막 공백 아닌 문자 위치
+        self._trailing_commas = []  # 제거할 트레일링 콤마 위치
+        self._safe_cut = None       # (잘라도 유효한 위치, 그 시점의 스택)
+        self._key = None            # 현재 최상위 키
+        self._values = {}           # 스트리밍 중 수집한 최상위 스칼라 값
+        self._items = {}            # 스트리밍 중 수집한 최상위 배열 원소
+        self._skipped = 0           # 파싱 실패로 건너뛴 원소 수
+
+    # ========== 스트리밍 입력 ==========
+
+    def feed(self, chunk: str) -> list:
+        """청크를 추가하고, 이번에 완성된 값들의 이벤트 목록을 반환"""
+        events = []
+        if not chunk or self.finished:
+            return events
+
+        self.buffer += chunk
+        buf = self.buffer
+
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+
+            if self._start == -1:
+                if c == '{':
+                    self._start = i
+                    self._open(c, i)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_significant = i
+                    self._on_string_end(i, events)
+                continue
+
+            if self._scalar_start != -1 and c in ',}] \t\r\n':
+                self._on_scalar_end(i, events)
+
+            if c in ' \t\r\n':
+                continue
+
+            depth = len(self._stack)
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                if depth == 2 and self._stack[-1] == '[':
+                    self._element_start = i
+            elif c in '{[':
+                if depth == 2 and self._stack[-1] == '[':
+                    self._element_start = i
+                self._open(c, i)
+            elif c in '}]':
+                if self._last_significant != -1 and buf[self._last_significant] == ',':
+                    self._trailing_commas.append(self._last_significant)
+                self._stack.pop()
+                self._expect_key.pop()
+                depth = len(self._stack)
+                if depth == 0:
+                    self.finished = True
+                    self._end = i + 1
+                    self._pos = i + 1
+                    return events
+                self._on_value_end(i + 1)
+                if depth == 2 and self._stack[-1] == '[' and self._element_start != -1:
+                    self._emit_item(self._cleaned(self._element_start, i + 1), events)
+            elif c == ':':
+                self._expect_key[-1] = False
+            elif c == ',':
+                if self._stack[-1] == '{':
+                    self._expect_key[-1] = True
+            elif self._scalar_start == -1 and not self._expect_key[-1]:
+                self._scalar_start = i
+                if depth == 2 and self._stack[-1] == '[':
+                    self._element_start = i
+
+            self._last_significant = i
+
+        self._pos = len(buf)
+        return events
+
+    def _open(self, c: str, i: int):
+        self._stack.append(c)
+        self._expect_key.append(c == '{')
+        self._on_value_end(i + 1)
+
+    def _on_value_end(self, end: int):
+        """
+        값 하나가 완성된 위치를 안전한 절단 지점으로 기록
+        최상위 배열 원소 내부는 제외하여, 잘린 블록이 반쪽짜리로 복구되지 않게 한다
+        """
+        if len(self._stack) <= 2:
+            self._safe_cut = (end, tuple(self._stack))
+
+    def _on_string_end(self, i: int, events: list):
+        depth = len(self._stack)
+        is_key = self._stack[-1] == '{' and self._expect_key[-1]
+        if not is_key:
+            self._on_value_end(i + 1)
+
+        if depth == 1:
+            value = self._loads(self.buffer[self._string_start:i + 1])
+            if value is _MALFORMED:
+                return
+            if is_key:
+                self._key = value
+            else:
+                self._values[self._key] = value
+                events.append(("value", self._key, value))
+        elif depth == 2 and self._stack[-1] == '[':
+            self._emit_item(self.buffer[self._string_start:i + 1], events)
+
+    def _on_scalar_end(self, i: int, events: list):
+        raw = self.buffer[self._scalar_start:i]
+        self._scalar_start = -1
+        self._last_significant = i - 1
+        depth = len(self._stack)
+        self._on_value_end(i)
+
+        if depth == 1:
+            value = self._loads(raw)
+            if value is not _MALFORMED:
+                self._values[self._key] = value
+                events.append(("value", self._key, value))
+        elif depth == 2 and self._stack[-1] == '[':
+            self._emit_item(raw, events)
+
+    def _emit_item(self, raw: str, events: list):
+        self._element_start = -1
+        value = self._loads(raw)
+        if value is _MALFORMED:
+            self._skipped += 1
+            return
+        items = self._items.setdefault(self._key, [])
+        events.append(("item", self._key, len(items), value))
+        items.append(value)
+
+    # ========== 최종 결과 ==========
+
+    def finish(self) -> tuple:
+        """
+        스트림 종료 후 최종 객체 구성
+
+        Returns:
+            (data 또는 None, report)
+            report = {
+                "complete": 원본 그대로 파싱 성공 여부,
+                "truncated": 최상위 객체가 닫히지 않았는지 여부,
+                "repaired": 트레일링 콤마 제거/잘린 부분 절단 등 복구 적용 여부,
+                "items": {배열 키: 복구된 원소 수},
+                "skipped": 깨져서 버린 원소 수
+            }
+        """
+        report = {
+            "complete": False,
+            "truncated": not self.finished,
+            "repaired": False,
+            "items": {},
+            "skipped": self._skipped,
+        }
+
+        if self._start == -1:
+            return None, report
+
+        data = None
+        if self.finished:
+            data = self._loads_quiet(self.buffer[self._start:self._end])
+            if data is not _MALFORMED:
+                report["complete"] = True
+            elif self._trailing_commas:
+                data = self._loads_quiet(self._cleaned(self._start, self._end))
+                report["repaired"] = data is not _MALFORMED
+
+        if data is _MALFORMED or data is None:
+            data = self._repair_truncated()
+            report["repaired"] = data is not _MALFORMED
+
+        if data is _MALFORMED and (self._values or self._items):
+            # 최후 수단: 스트리밍 중 완성된 최상위 값들로 재구성
+            data = dict(self._values)
+            data.update({key: list(items) for key, items in self._items.items()})
+            report["repaired"] = True
+
+        if data is _MALFORMED or not isinstance(data, dict):
+            return None, report
+
+        report["items"] = {key: len(value) for key, value in data.items() if isinstance(value, list)}
+        return data, report
+
+    def _cleaned(self, start: int, end: int) -> str:
+        """[start, end) 구간에서 트레일링 콤마를 제거한 텍스트"""
+        removed = set(pos for pos in self._trailing_commas if start <= pos < end)
+        if not removed:
+            return self.buffer[start:end]
+        return "".join(
+            c for pos, c in enumerate(self.buffer[start:end], start)
+            if pos not in removed
+        )
+
+    def _repair_truncated(self):
+        """마지막 안전 절단 지점까지 자르고 열린 컨테이너를 닫아 파싱"""
+        if not self._safe_cut:
+            return _MALFORMED
+        cut, stack = self._safe_cut
+        text = self._cleaned(self._start, cut).rstrip()
+        if text.endswith(','):
+            text = text[:-1]
+        closers = "".join('}' if c == '{' else ']' for c in reversed(stack))
+        return self._loads_quiet(text + closers)
+
+    @staticmethod
+    def _loads(raw: str):
+        try:
+            return json.loads(raw, strict=False)
+        except json.JSONDecodeError as e:
+            logging.warning(f"Skipping malformed JSON fragment: {e}, raw: {raw[:200]}")
+            return _MALFORMED
+
+    @staticmethod
+    def _loads_quiet(raw: str):
+        try:
+            return json.loads(raw, strict=False)
+        except json.JSONDecodeError:
+            return _MALFORMED
+
+
+@traced("json.extract")
+def parse_model_json(raw_text: str) -> tuple:
+    """
+    모델 응답 전체 텍스트에서 JSON 객체를 관대하게 추출
+
+    Returns:
+        (data 또는 None, report) - report 형식은 ModelJsonParser.finish() 참고
+    """
+    parser = ModelJsonParser()
+    parser.feed(raw_text or "")
+    return parser.finish()
+
+
+def log_salvage(mode: str, report: dict, raw_text: str = ""):
+    """원본 그대로 파싱되지 않은 응답의 복구 내역을 로그로 남김"""
+    if report.get("complete"):
+        return
+    logging.warning(
+        f"Salvaged partial JSON in {mode}: truncated={report['truncated']}, "
+        f"repaired={report['repaired']}, items={report['items']}, "
+        f"skipped={report['skipped']}, raw: {raw_text[:200]}"
+    )
@@ -0,0 +1,216 @@
+"""
+고정 프롬프트(preamble) 컨텍스트 캐시
+요청마다 반복되는 역할/출력 형식/규칙 텍스트를 Gemini 컨텍스트 캐시(cached content)로 등록해 두고
+요청에는 작은 동적 부분만 보낸다. 캐시는 TTL 만료 전에 자동으로 다시 만들고,
+모델이 캐시를 지원하지 않거나 최소 토큰 수에 못 미치면 system_instruction으로 직접 보낸다
+(고정 부분이 항상 앞에 오므로 암시적 캐시에도 유리하다).
+명시적 캐시는 고정 프롬프트가 모델의 최소 토큰 수(MIN_CACHE_TOKENS) 이상일 때만 이득이므로
+생성 전에 count_tokens로 확인하고, 못 미치는 프롬프트는 인스턴스 수명 동안 다시 시도하지 않는다
+"""
+import hashlib
+import itertools
+import logging
+import threading
+import time
+
+from google.genai import types
+
+
+class StaticPrompt:
+    """캐시 대상 고정 프롬프트 (system_instruction + tools)"""
+
+    def __init__(self, name: str, text: str, tools: list = None):
+        self.name = name
+        self.text = text.strip()
+        self.tools = tools
+
+    def key(self, model: str) -> str:
+        digest = hashlib.sha256(f"{model}\n{self.text}\n{self.tools!r}".encode("utf-8")).hexdigest()
+        return f"{self.name}:{model}:{digest[:16]}"
+
+
+# 모델별 명시적 컨텍스트 캐시 최소 토큰 수 (목록에 없는 모델은 DEFAULT_MIN_CACHE_TOKENS)
+MIN_CACHE_TOKENS = {
+    "gemini-2.0-flash": 4096,
+    "gemini-2.0-flash-lite": 4096,
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-flash-lite": 1024,
+    "gemini-2.5-pro": 4096,
+}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+
+
+class PromptTooSmall(Exception):
+    """고정 프롬프트가 모델의 캐시 최소 토큰 수에 못 미침 (캐시를 만들지 않음)"""
+
+
+def min_cache_tokens(model: str) -> int:
+    return MIN_CACHE_TOKENS.get(model, DEFAULT_MIN_CACHE_TOKENS)
+
+
+class GeminiCacheBackend:
+    """
+    Gemini API 컨텍스트 캐시 (client.caches)
+    client는 genai_pool의 PooledClient라 count_tokens/caches.create도 모델별 스케줄러와 백오프를 거친다
+    """
+
+    def create(self, client, model: str, prompt: StaticPrompt, ttl: int) -> str:
+        counted = client.models.count_tokens(model=model, contents=prompt.text)
+        tokens = getattr(counted, "total_tokens", None) or 0
+        if tokens < min_cache_tokens(model):
+            raise PromptTooSmall(f"{prompt.name} is {tokens} tokens (< {min_cache_tokens(model)} for {model})")
+        cache = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=prompt.name,
+                system_instruction=prompt.text,
+                tools=prompt.tools,
+                ttl=f"{ttl}s"
+            )
+        )
+        return cache.name
+
+
+class FakeCacheBackend:
+    """로컬/테스트용 가짜 캐시 (API 호출 없이 이름만 발급, 생성 기록 보관)"""
+
+    def __init__(self, fail: bool = False, tokens: int = None):
+        """
+        Args:
+            fail: 생성 실패 흉내
+            tokens: 고정 프롬프트 토큰 수 흉내 (None이면 최소 토큰 수 검사 생략)
+        """
+        self.fail = fail
+        self.tokens = tokens
+        self.created = []
+        self._seq = itertools.count(1)
+
+    def create(self, client, model: str, prompt: StaticPrompt, ttl: int) -> str:
+        if self.tokens is not None and self.tokens < min_cache_tokens(model):
+            raise PromptTooSmall(f"{prompt.name} is {self.tokens} tokens")
+        if self.fail:
+            raise RuntimeError("fake cache creation failure")
+        name = f"cachedContents/fake-{next(self._seq)}"
+        self.created.append({"name": name, "model": model, "prompt": prompt.name, "ttl": ttl})
+        return name
+
+
+class PrefixCache:
+    """
+    모델별 고정 프롬프트 캐시 관리자
+
+    - 처음 사용할 때 캐시를 만들고, 만료 refresh_margin초 전부터는 새 캐시로 교체
+      (이전 캐시는 자체 TTL로 사라짐)
+    - 생성에 실패하면 retry_after초 동안 시도하지 않고 system_instruction으로 직접 전송
+    - 최소 토큰 수에 못 미치는 프롬프트는 다시 시도하지 않음 (키에 프롬프트 내용이 들어가므로 바뀌면 새로 확인)
+    """
+
+    def __init__(self, backend=None, ttl: int = 3600, refresh_margin: int = 300, retry_after: int = 3600):
+        """
+        Args:
+            backend: GeminiCacheBackend / FakeCacheBackend (None이면 캐시 사용 안 함)
+            ttl: 캐시 유효시간 (초)
+            refresh_margin: 만료 몇 초 전에 새로 만들지
+            retry_after: 생성 실패 후 재시도까지 대기 (초)
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._entries = {}      # key -> (캐시 이름, 만료 시각)
+        self._failed = {}       # key -> 재시도 가능 시각
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.creates = 0
+        self.failures = 0
+        self.too_small = 0
+        self.inline = 0
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def cached_name(self, client, model: str, prompt: StaticPrompt):
+        """사용 가능한 캐시 이름 (없고 만들 수 없으면 None)"""
+        if self.backend is None:
+            return None
+
+        key = prompt.key(model)
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry and entry[1] - now > self.refresh_margin:
+            self.hits += 1
+            return entry[0]
+        if self._failed.get(key, 0) > now:
+            return None
+
+        with self._key_lock(key):
+            # 다른 요청이 방금 만들었으면 그대로 사용
+            entry = self._entries.get(key)
+            if entry and entry[1] - time.time() > self.refresh_margin:
+                self.hits += 1
+                return entry[0]
+            try:
+                name = self.backend.create(client, model, prompt, self.ttl)
+            except PromptTooSmall as e:
+                self.too_small += 1
+                self._failed[key] = float("inf")
+                logging.info(f"Context cache skipped, sending inline: {e}")
+                return None
+            except Exception as e:
+                self.failures += 1
+                self._failed[key] = time.time() + self.retry_after
+                logging.warning(f"Context cache for {prompt.name} ({model}) unavailable, sending inline: {e}")
+                return None
+            self.creates += 1
+            self._entries[key] = (name, time.time() + self.ttl)
+            self._failed.pop(key, None)
+            logging.info(f"Created context cache {name} for {prompt.name} ({model}, ttl {self.ttl}s)")
+            return name
+
+    def config(self, client, model: str, prompt: StaticPrompt, **fields) -> types.GenerateContentConfig:
+        """
+        고정 프롬프트를 포함한 요청 설정
+        캐시가 있으면 cached_content로 참조하고 (system_instruction/tools는 캐시에 포함),
+        없으면 system_instruction/tools를 직접 넣는다
+        """
+        name = self.cached_name(client, model, prompt)
+        if name:
+            return types.GenerateContentConfig(cached_content=name, **fields)
+        self.inline += 1
+        return self.inline_config(prompt, **fields)
+
+    @staticmethod
+    def inline_config(prompt: StaticPrompt, **fields) -> types.GenerateContentConfig:
+        """캐시 없이 system_instruction/tools를 직접 넣은 요청 설정 (캐시는 모델별이라 다른 모델로 보낼 때 등)"""
+        return types.GenerateContentConfig(system_instruction=prompt.text, tools=prompt.tools, **fields)
+
+    def invalidate(self, model: str, prompt: StaticPrompt):
+        """캐시가 서버에서 사라진 경우 등 다음 요청에서 새로 만들도록 제거"""
+        self._entries.pop(prompt.key(model), None)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "creates": self.creates,
+            "failures": self.failures,
+            "too_small": self.too_small,
+            "inline": self.inline,
+            "entries": len(self._entries),
+        }
+
+
+def create_prefix_cache(backend: str) -> PrefixCache:
+    """
+    설정값으로 캐시 관리자 생성
+
+    Args:
+        backend: "gemini" (Gemini 컨텍스트 캐시), "fake" (로컬/테스트), "off" (항상 직접 전송)
+            고정 프롬프트가 모델의 최소 토큰 수(MIN_CACHE_TOKENS)를 넘을 때만 "gemini"가 의미 있다
+    """
+    if backend == "off":
+        return PrefixCache(None)
+    if backend == "fake":
+        return PrefixCache(FakeCacheBackend())
+    return PrefixCache(GeminiCacheBackend())
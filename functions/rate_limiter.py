@@ -0,0 +1,212 @@
+"""
+Gemini 호출 스케줄러
+모델별 토큰 버킷으로 인스턴스의 호출 속도를 제한하고, 대기 중인 호출은 우선순위 순으로 처리한다.
+429/503 응답은 지터가 있는 지수 백오프로 재시도하며, 끝내 실패하면 Retry-After를 담은
+RateLimitExceeded를 발생시켜 클라이언트에 전달한다
+"""
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from tracing import span
+
+# 우선순위 (숫자가 작을수록 먼저)
+PRIORITY_HIGH = 0     # 관리자/유료 회원 글 작성
+PRIORITY_NORMAL = 1   # 일반 글 작성, 이미지 생성
+PRIORITY_LOW = 2      # 주제 추천, 분석
+
+# 현재 요청의 우선순위 (요청 처리 시작 시 설정, 스레드 풀로 넘길 때는 컨텍스트 복사)
+request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_NORMAL)
+
+# 현재 작업의 모델 호출 마감 시각 (time.monotonic 기준, None이면 제한 없음)
+# 제한시간이 있는 작업(write_batch 주제 등)에서 설정하면 대기열 대기와 HTTP 요청 시간이 남은 시간으로 제한된다
+call_deadline = contextvars.ContextVar("call_deadline", default=None)
+
+# 재시도 대상 HTTP 상태
+RETRYABLE_STATUS = (429, 503)
+
+
+class RateLimitExceeded(Exception):
+    """호출 한도 초과 (retry_after초 후 다시 시도)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """call_deadline이 지나 모델 호출을 보내지 않음"""
+
+
+def remaining_call_time():
+    """call_deadline까지 남은 시간 (초, 마감이 없으면 None)"""
+    deadline = call_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 capacity개까지 모이는 토큰 버킷 (잠금은 호출자가 관리)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # 429 수신 후 쿨다운
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """토큰 1개를 쓸 수 있을 때까지 남은 시간 (0이면 즉시 가능)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class ModelScheduler:
+    """모델별 토큰 버킷 + 우선순위 대기열"""
+
+    def __init__(self, limits: dict = None, default_rpm: float = 60, default_burst: float = 10):
+        """
+        Args:
+            limits: {모델명: (분당 요청 수, 버스트)} - 없는 모델은 기본값 사용
+            default_rpm: 기본 분당 요청 수
+            default_burst: 기본 버스트 크기
+        """
+        self.limits = dict(limits or {})
+        self.default_rpm = default_rpm
+        self.default_burst = default_burst
+        self._buckets = {}
+        self._waiters = {}  # 모델명 -> [(우선순위, 순번)] 힙
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.throttled = 0
+        self.timeouts = 0
+
+    def _bucket(self, model: str) -> TokenBucket:
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            rpm, burst = self.limits.get(model, (self.default_rpm, self.default_burst))
+            bucket = TokenBucket(rpm / 60.0, burst)
+            self._buckets[model] = bucket
+        return bucket
+
+    def acquire(self, model: str, priority: int = None, timeout: float = 60.0):
+        """
+        호출 1회분 토큰 획득 (대기열에서 자기 차례가 되고 토큰이 있을 때까지 대기)
+
+        Raises:
+            RateLimitExceeded: timeout 안에 차례가 오지 않은 경우
+        """
+        if priority is None:
+            priority = request_priority.get()
+        entry = (priority, next(self._seq))
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            bucket = self._bucket(model)
+            waiters = self._waiters.setdefault(model, [])
+            heapq.heappush(waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = bucket.wait_time(now)
+                    if waiters[0] == entry and delay == 0:
+                        bucket.take()
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise RateLimitExceeded(
+                            f"{model} 호출 대기열 시간 초과",
+                            retry_after=max(delay, 1.0)
+                        )
+                    self._cond.wait(min(remaining, delay or remaining))
+            finally:
+                if entry in waiters:
+                    waiters.remove(entry)
+                    heapq.heapify(waiters)
+                self._cond.notify_all()
+
+    def penalize(self, model: str, delay: float):
+        """429/503 수신 시 해당 모델 버킷을 delay초 동안 막음 (다른 요청도 함께 물러남)"""
+        with self._cond:
+            bucket = self._bucket(model)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            bucket.tokens = min(bucket.tokens, 0)
+            self.throttled += 1
+
+    def burst(self, model: str) -> float:
+        """모델 버스트 크기 (대기 없이 동시에 내보낼 수 있는 호출 수)"""
+        return self.limits.get(model, (self.default_rpm, self.default_burst))[1]
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "throttled": self.throttled,
+                "timeouts": self.timeouts,
+                "queued": {model: len(waiters) for model, waiters in self._waiters.items() if waiters},
+            }
+
+
+def error_status(error: Exception):
+    """SDK 예외의 HTTP 상태 코드 (없으면 None)"""
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def error_retry_after(error: Exception):
+    """SDK 예외에 실린 Retry-After 헤더 값 (초, 없으면 None)"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 20.0) -> float:
+    """지터가 있는 지수 백오프 (full jitter)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_backoff(scheduler: ModelScheduler, model: str, func, max_retries: int = 3, queue_timeout: float = 60.0):
+    """
+    토큰을 받은 뒤 func() 실행, 429/503이면 백오프 후 재시도
+
+    Raises:
+        RateLimitExceeded: 재시도 후에도 한도 초과이거나 대기열 시간 초과
+    """
+    for attempt in range(max_retries + 1):
+        with span("model.queue", model=model):
+            scheduler.acquire(model, timeout=queue_timeout)
+        try:
+            return func()
+        except Exception as e:
+            status = error_status(e)
+            if status not in RETRYABLE_STATUS:
+                raise
+            retry_after = error_retry_after(e)
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            scheduler.penalize(model, delay)
+            if attempt == max_retries:
+                raise RateLimitExceeded(f"{model} 호출 한도 초과 ({status})", retry_after=max(delay, 1.0)) from e
+            logging.warning(f"{model} returned {status}, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
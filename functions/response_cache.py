@@ -0,0 +1,135 @@
+"""
+프롬프트 응답 캐시
+완성된 프롬프트(모델/설정 포함)의 해시를 키로 파싱된 응답을 모드별 TTL 동안 재사용한다.
+동적 컨텍스트가 (사용자, 카테고리, 날짜, 슬롯)으로 고정되어 있어 같은 슬롯 안의 같은 요청은 같은 프롬프트가 된다
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from ttl_cache import TTLCache
+
+
+def prompt_key(model: str, contents: str, **params) -> str:
+    """모델 + 프롬프트 + 생성 설정의 해시 키"""
+    payload = json.dumps([model, contents, params], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FirestoreResponseStore:
+    """
+    Firestore 저장소 (인스턴스 간 공유)
+    expires_at 필드에 Firestore TTL 정책을 걸면 만료 문서가 자동 삭제된다
+    """
+
+    def __init__(self, db_getter, collection: str = "prompt_responses"):
+        """
+        Args:
+            db_getter: Firestore 클라이언트를 반환하는 함수 (lazy initialization)
+            collection: 컬렉션 이름
+        """
+        self._db_getter = db_getter
+        self.collection = collection
+
+    def get(self, key: str):
+        """(응답 JSON 문자열, 남은 유효시간 초) 또는 None"""
+        try:
+            doc = self._db_getter().collection(self.collection).document(key).get()
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            remaining = (data["expires_at"] - datetime.now(timezone.utc)).total_seconds()
+            if remaining <= 0:
+                return None
+            return data["response"], remaining
+        except Exception as e:
+            logging.warning(f"Response cache read failed: {e}")
+            return None
+
+    def set(self, key: str, mode: str, payload: str, ttl: float):
+        try:
+            now = datetime.now(timezone.utc)
+            self._db_getter().collection(self.collection).document(key).set({
+                "mode": mode,
+                "response": payload,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl)
+            })
+        except Exception as e:
+            logging.warning(f"Response cache write failed: {e}")
+
+
+class ResponseCache:
+    """모드별 TTL 응답 캐시 (인스턴스 메모리 → Firestore 순으로 조회)"""
+
+    def __init__(self, ttls: dict, persistent: FirestoreResponseStore = None, max_size: int = 512):
+        """
+        Args:
+            ttls: {모드: 유효시간(초)} - 없는 모드는 캐시하지 않음
+            persistent: 인스턴스 간 공유 저장소 (None이면 메모리만)
+            max_size: 메모리 캐시 최대 항목 수
+        """
+        self.ttls = dict(ttls)
+        self.persistent = persistent
+        self._memory = TTLCache(max_size=max_size)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _count(self, mode: str, key: str):
+        with self._lock:
+            counters = self._counters.setdefault(mode, {"hits": 0, "misses": 0, "stores": 0})
+            counters[key] += 1
+
+    def get(self, mode: str, key: str):
+        """캐시된 응답 사본 (없거나 만료, 캐시 대상이 아닌 모드면 None)"""
+        if mode not in self.ttls:
+            return None
+        payload = self._memory.get(f"{mode}:{key}")
+        if payload is None and self.persistent is not None:
+            found = self.persistent.get(key)
+            if found is not None:
+                payload, remaining = found
+                self._memory.set(f"{mode}:{key}", payload, ttl=remaining)
+        if payload is None:
+            self._count(mode, "misses")
+            return None
+        self._count(mode, "hits")
+        logging.info(f"Response cache hit for {mode} ({key[:12]})")
+        return json.loads(payload)
+
+    def set(self, mode: str, key: str, response: dict):
+        """응답 저장 (직렬화하여 보관하므로 이후 호출자가 response를 바꿔도 영향 없음)"""
+        ttl = self.ttls.get(mode)
+        if not ttl:
+            return
+        payload = json.dumps(response, ensure_ascii=False)
+        self._memory.set(f"{mode}:{key}", payload, ttl=ttl)
+        if self.persistent is not None:
+            self.persistent.set(key, mode, payload, ttl)
+        self._count(mode, "stores")
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for mode, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                result[mode] = dict(counters, hit_rate=counters["hits"] / lookups if lookups else 0.0)
+            return result
+
+
+def create_response_cache(backend: str, ttls: dict, db_getter) -> ResponseCache:
+    """
+    설정값으로 응답 캐시 생성
+
+    Args:
+        backend: "firestore" (메모리 + Firestore), "memory" (인스턴스 메모리만), "off" (캐시 안 함)
+        ttls: {모드: 유효시간(초)}
+        db_getter: Firestore 클라이언트를 반환하는 함수
+    """
+    if backend == "off":
+        return ResponseCache({})
+    if backend == "memory":
+        return ResponseCache(ttls)
+    return ResponseCache(ttls, FirestoreResponseStore(db_getter))
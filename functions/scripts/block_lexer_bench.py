@@ -0,0 +1,369 @@
+"""
+블록 문법 lexer 벤치마크 / 기존 구현과의 출력 비교
+1) 비교: 예전 줄 단위 re.match 구현(아래 legacy_*, block_lexer 도입 전 코드 그대로)과
+   block_lexer 기반 구현의 출력을 표준 문서에서 비교하고, 의도적으로 바뀐 줄은 기대값과 비교
+   (데스크톱용 복사본 core/block_lexer.py가 원본과 같은지도 확인)
+   - 서버: generation.convert_text_to_blocks
+   - 데스크톱: ContentConverter.parse_text_content / format_text, EmoticonManager.apply_emoticons_to_text
+2) 벤치마크: 1KB / 100KB / 10MB 문서에서 예전 구현과 새 구현의 처리 시간
+
+사용법 (functions 디렉터리에서, 외부 패키지 불필요):
+    python scripts/block_lexer_bench.py
+    python scripts/block_lexer_bench.py --check-only
+    python scripts/block_lexer_bench.py --sizes 1KB,100KB --repeat 5
+"""
+import argparse
+import importlib.util
+import os
+import re
+import statistics
+import sys
+import time
+import types
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(FUNCTIONS_DIR)
+sys.path.insert(0, FUNCTIONS_DIR)
+
+from block_lexer import lex_blocks  # noqa: E402
+
+# 표준 문서 (예전 구현들이 모두 같은 의미로 해석하던 문법만 사용)
+SAMPLE_SECTION = """【{n}번째 소제목: 엔진오일 교체 주기】
+엔진오일은 차량의 혈액과 같습니다. 주행 습관에 따라 교체 주기가 달라져요.
+최근 합성유는 10,000km 이상도 버틸 수 있다고 합니다.
+
+▶ 점검 체크리스트
+• 오일 색상 확인
+• 오일 양 확인
+• 누유 흔적 확인
+
+1. 시동을 끄고 10분 기다리기
+2. 딥스틱을 뽑아 닦기
+3. 다시 꽂았다 빼서 눈금 확인
+
+「정기 점검이 가장 저렴한 수리입니다」
+
+Q: 합성유와 광유 중 뭐가 좋나요?
+A: 주행 환경에 따라 다르지만 대체로 합성유를 추천해요.
+
+━━━━━━━━━━━━━━━━━━━━
+"""
+
+# 의도적으로 해석이 바뀐 줄: (줄, 예전 서버 blocks, 새 blocks)
+INTENDED_CHANGES = [
+    ("#자동차 #엔진오일", [{"type": "heading", "text": "자동차 #엔진오일", "level": 2}],
+     [{"type": "paragraph", "text": "#자동차 #엔진오일"}]),
+    ("### 작은 소제목", [{"type": "heading", "text": "작은 소제목", "level": 2}],
+     [{"type": "heading", "text": "작은 소제목", "level": 3}]),
+    ("● 원형 소제목", [{"type": "paragraph", "text": "● 원형 소제목"}],
+     [{"type": "heading", "text": "원형 소제목", "level": 2}]),
+    ("-5도 이하에서는 배터리 점검", [{"type": "list", "style": "bullet", "items": ["5도 이하에서는 배터리 점검"]}],
+     [{"type": "paragraph", "text": "-5도 이하에서는 배터리 점검"}]),
+    ("2024.01.01 기준 요금", [{"type": "list", "style": "number", "items": ["01.01 기준 요금"]}],
+     [{"type": "paragraph", "text": "2024.01.01 기준 요금"}]),
+    ("- - - - -", [{"type": "list", "style": "bullet", "items": ["- - - -"]}],
+     [{"type": "divider"}]),
+    ("---", [{"type": "list", "style": "bullet", "items": ["--"]}],
+     [{"type": "divider"}]),
+    ("━━━", [{"type": "paragraph", "text": "━━━"}],
+     [{"type": "divider"}]),
+    ("1) 첫째 항목", [{"type": "paragraph", "text": "1) 첫째 항목"}],
+     [{"type": "list", "style": "number", "items": ["첫째 항목"]}]),
+    ("* 별표 항목", [{"type": "paragraph", "text": "* 별표 항목"}],
+     [{"type": "list", "style": "bullet", "items": ["별표 항목"]}]),
+    ("1.항목", [{"type": "list", "style": "number", "items": ["항목"]}],
+     [{"type": "paragraph", "text": "1.항목"}]),
+    ("1000. 큰 번호", [{"type": "list", "style": "number", "items": ["큰 번호"]}],
+     [{"type": "paragraph", "text": "1000. 큰 번호"}]),
+]
+
+# 데스크톱 쪽 의도적 변경: (함수, 줄, 예전 출력, 새 출력) - parse_text_content는 sections만 비교
+DESKTOP_INTENDED_CHANGES = [
+    ("parse_text_content", "▸ 항목",
+     [{"heading": "", "content": [{"type": "paragraph", "text": "▸ 항목"}], "type": "paragraph"}],
+     [{"heading": "", "content": [{"type": "list_item", "text": "항목"}], "type": "paragraph"}]),
+    ("parse_text_content", "1000. 큰 번호",
+     [{"heading": "", "content": [{"type": "list_item", "text": "큰 번호"}], "type": "paragraph"}],
+     [{"heading": "", "content": [{"type": "paragraph", "text": "1000. 큰 번호"}], "type": "paragraph"}]),
+    ("parse_text_content", "Q：전각 콜론",
+     [{"heading": "", "content": [{"type": "paragraph", "text": "Q：전각 콜론"}], "type": "paragraph"}],
+     [{"heading": "", "content": [{"type": "question", "text": "전각 콜론"}], "type": "paragraph"}]),
+    ("parse_text_content", "【소제목】 뒤에 글",
+     [{"heading": "소제목", "content": [], "type": "section"}],
+     [{"heading": "", "content": [{"type": "paragraph", "text": "【소제목】 뒤에 글"}], "type": "paragraph"}]),
+    ("format_text", "### 작은 소제목", "### 작은 소제목", "\n\n【작은 소제목】\n\n"),
+    ("format_text", "【소제목】 뒤에 글", "\n\n【소제목】\n\n", "【소제목】 뒤에 글"),
+    ("apply_emoticons_to_text", "질문: 무엇인가요?", "질문: 무엇인가요?", "❓ 질문: 무엇인가요?"),
+    ("apply_emoticons_to_text", "답변: 이것입니다", "답변: 이것입니다", "💡 답변: 이것입니다"),
+    ("apply_emoticons_to_text", "Q：전각 콜론", "Q：전각 콜론", "❓ Q：전각 콜론"),
+]
+
+
+# ---------- 예전 구현 (비교 기준) ----------
+
+def legacy_convert_text_to_blocks(text: str) -> list:
+    blocks = []
+    lines = text.split('\n')
+    current_paragraph = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if current_paragraph:
+                blocks.append({"type": "paragraph", "text": " ".join(current_paragraph)})
+                current_paragraph = []
+            continue
+        heading_match = re.match(r'^【(.+?)】$|^▶\s*(.+)$|^#{1,3}\s*(.+)$', line)
+        if heading_match:
+            if current_paragraph:
+                blocks.append({"type": "paragraph", "text": " ".join(current_paragraph)})
+                current_paragraph = []
+            heading_text = heading_match.group(1) or heading_match.group(2) or heading_match.group(3)
+            blocks.append({"type": "heading", "text": heading_text.strip(), "level": 2})
+            continue
+        if re.match(r'^[━─═\-]{5,}$', line):
+            if current_paragraph:
+                blocks.append({"type": "paragraph", "text": " ".join(current_paragraph)})
+                current_paragraph = []
+            blocks.append({"type": "divider"})
+            continue
+        list_match = re.match(r'^[•\-▸]\s*(.+)$|^(\d+)\.\s*(.+)$', line)
+        if list_match:
+            if current_paragraph:
+                blocks.append({"type": "paragraph", "text": " ".join(current_paragraph)})
+                current_paragraph = []
+            if list_match.group(1):
+                item_text = list_match.group(1)
+                if blocks and blocks[-1].get("type") == "list" and blocks[-1].get("style") == "bullet":
+                    blocks[-1]["items"].append(item_text)
+                else:
+                    blocks.append({"type": "list", "style": "bullet", "items": [item_text]})
+            else:
+                item_text = list_match.group(3)
+                if blocks and blocks[-1].get("type") == "list" and blocks[-1].get("style") == "number":
+                    blocks[-1]["items"].append(item_text)
+                else:
+                    blocks.append({"type": "list", "style": "number", "items": [item_text]})
+            continue
+        quote_match = re.match(r'^「(.+?)」$|^>\s*(.+)$', line)
+        if quote_match:
+            if current_paragraph:
+                blocks.append({"type": "paragraph", "text": " ".join(current_paragraph)})
+                current_paragraph = []
+            quote_text = quote_match.group(1) or quote_match.group(2)
+            blocks.append({"type": "quotation", "text": quote_text.strip()})
+            continue
+        current_paragraph.append(line)
+    if current_paragraph:
+        blocks.append({"type": "paragraph", "text": " ".join(current_paragraph)})
+    return blocks if blocks else [{"type": "paragraph", "text": text}]
+
+
+def legacy_parse_text_content(text: str) -> dict:
+    result = {"title": "", "sections": [], "raw": text}
+    lines = text.strip().split('\n')
+    current_section = {"heading": "", "content": [], "type": "paragraph"}
+    if lines and (lines[0].startswith("제목:") or lines[0].startswith("# ")):
+        result["title"] = lines[0].replace("제목:", "").replace("# ", "").strip()
+        lines = lines[1:]
+    heading_patterns = [r'^【(.+?)】', r'^▶\s*(.+)', r'^●\s*(.+)', r'^■\s*(.+)', r'^※\s*(.+)', r'^#{2,3}\s*(.+)']
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        is_heading = False
+        for pattern in heading_patterns:
+            match = re.match(pattern, line)
+            if match:
+                if current_section["heading"] or current_section["content"]:
+                    result["sections"].append(current_section)
+                current_section = {"heading": match.group(1).strip(), "content": [], "type": "section"}
+                is_heading = True
+                break
+        if not is_heading:
+            if line.startswith("Q:") or line.startswith("Q.") or line.startswith("질문:"):
+                current_section["content"].append({"type": "question", "text": re.sub(r'^(Q[:.:]|질문:)\s*', '', line)})
+            elif line.startswith("A:") or line.startswith("A.") or line.startswith("답변:"):
+                current_section["content"].append({"type": "answer", "text": re.sub(r'^(A[:.:]|답변:)\s*', '', line)})
+            elif re.match(r'^[-•*]\s+', line) or re.match(r'^\d+[.)]\s+', line):
+                current_section["content"].append({"type": "list_item", "text": re.sub(r'^[-•*\d.)+]\s*', '', line)})
+            elif re.match(r'^[━\-═]{3,}', line):
+                current_section["content"].append({"type": "divider", "text": ""})
+            else:
+                current_section["content"].append({"type": "paragraph", "text": line})
+    if current_section["heading"] or current_section["content"]:
+        result["sections"].append(current_section)
+    return result
+
+
+def legacy_format_text(content: str, heading_style: str = "【{text}】", spacing: str = "\n") -> str:
+    result = []
+    for line in content.split('\n'):
+        heading_match = None
+        for pattern in [r'^【(.+?)】', r'^▶\s*(.+)', r'^●\s*(.+)', r'^■\s*(.+)', r'^※\s*(.+)']:
+            match = re.match(pattern, line)
+            if match:
+                heading_match = match.group(1)
+                break
+        if heading_match:
+            result.append("")
+            result.append(heading_style.format(text=heading_match))
+            result.append("")
+        else:
+            result.append(line)
+    return (spacing + '\n').join(result)
+
+
+def legacy_apply_emoticons(manager, text: str, level: str = "많이") -> str:
+    result = []
+    for line in text.split('\n'):
+        heading_match = re.match(r'^(【(.+?)】|▶\s*(.+)|●\s*(.+)|■\s*(.+)|※\s*(.+))', line)
+        if heading_match:
+            heading_text = heading_match.group(2) or heading_match.group(3) or \
+                heading_match.group(4) or heading_match.group(5) or heading_match.group(6)
+            if heading_text:
+                emoticon = manager._get_emoticon_for_heading(heading_text, level)
+                if emoticon and emoticon not in line:
+                    line = re.sub(r'^(【|▶|●|■|※)\s*', f'{emoticon} \\1 ', line)
+        if re.match(r'^Q[:.:]', line) and '❓' not in line:
+            line = '❓ ' + line
+        elif re.match(r'^A[:.:]', line) and '💡' not in line:
+            line = '💡 ' + line
+        result.append(line)
+    return '\n'.join(result)
+
+
+# ---------- 비교 / 측정 ----------
+
+def _load_desktop_module(name: str):
+    """core 패키지 __init__(PySide6 등) 없이 데스크톱 모듈만 불러오기 (core.block_lexer 복사본 사용)"""
+    if "core" not in sys.modules:
+        package = types.ModuleType("core")
+        package.__path__ = [os.path.join(ROOT_DIR, "core")]
+        sys.modules["core"] = package
+    return importlib.import_module(f"core.{name}")
+
+
+def check_vendored_copy() -> list:
+    """core/block_lexer.py가 functions/block_lexer.py와 같은지 (다르면 설명 목록)"""
+    with open(os.path.join(FUNCTIONS_DIR, "block_lexer.py"), "rb") as f:
+        original = f.read()
+    with open(os.path.join(ROOT_DIR, "core", "block_lexer.py"), "rb") as f:
+        copy = f.read()
+    return [] if original == copy else ["core/block_lexer.py가 functions/block_lexer.py와 다름 (원본을 복사해주세요)"]
+
+
+def build_document(size: int) -> str:
+    """표준 섹션을 반복해 size 바이트(UTF-8) 이상인 문서 생성"""
+    sections, total, n = [], 0, 1
+    while total < size:
+        section = SAMPLE_SECTION.format(n=n)
+        sections.append(section)
+        total += len(section.encode("utf-8")) + 1
+        n += 1
+    return "\n".join(sections)
+
+
+def _fix_legacy_numbers(parsed: dict) -> dict:
+    """
+    예전 parse_text_content는 번호 목록의 번호 첫 글자만 지웠으므로("1. 항목" → ". 항목")
+    새 구현에서 고친 부분을 보정한 뒤 비교
+    """
+    for section in parsed["sections"]:
+        for item in section["content"]:
+            if item["type"] == "list_item":
+                item["text"] = re.sub(r'^\d*[.)]\s*', '', item["text"])
+    return parsed
+
+
+def check_parity(converter, manager) -> list:
+    """예전/새 구현 출력 비교, 다른 항목 설명 목록 (비어 있으면 일치)"""
+    failures = check_vendored_copy()
+    document = build_document(8 * 1024)
+    cases = [
+        ("convert_text_to_blocks", legacy_convert_text_to_blocks(document), lex_blocks(document)),
+        ("parse_text_content", _fix_legacy_numbers(legacy_parse_text_content(document)), converter.parse_text_content(document)),
+        ("format_text", legacy_format_text(document), converter.format_text(document)),
+        ("apply_emoticons_to_text", legacy_apply_emoticons(manager, document), manager.apply_emoticons_to_text(document, "많이")),
+    ]
+    for name, legacy, current in cases:
+        if legacy != current:
+            failures.append(f"{name}: 표준 문서 출력이 다름")
+    for line, legacy_expected, expected in INTENDED_CHANGES:
+        if legacy_convert_text_to_blocks(line) != legacy_expected:
+            failures.append(f"기준 오류 {line!r}: {legacy_convert_text_to_blocks(line)}")
+        if lex_blocks(line) != expected:
+            failures.append(f"{line!r}: {lex_blocks(line)} (기대 {expected})")
+    desktop = {
+        "parse_text_content": (
+            lambda line: _fix_legacy_numbers(legacy_parse_text_content(line))["sections"],
+            lambda line: converter.parse_text_content(line)["sections"]
+        ),
+        "format_text": (legacy_format_text, converter.format_text),
+        "apply_emoticons_to_text": (
+            lambda line: legacy_apply_emoticons(manager, line),
+            lambda line: manager.apply_emoticons_to_text(line, "많이")
+        ),
+    }
+    for name, line, legacy_expected, expected in DESKTOP_INTENDED_CHANGES:
+        legacy, current = desktop[name]
+        if legacy(line) != legacy_expected:
+            failures.append(f"기준 오류 {name} {line!r}: {legacy(line)!r}")
+        if current(line) != expected:
+            failures.append(f"{name} {line!r}: {current(line)!r} (기대 {expected!r})")
+    return failures
+
+
+def _parse_size(text: str) -> int:
+    units = {"KB": 1024, "MB": 1024 * 1024}
+    text = text.strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def _measure(func, document: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(document)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block lexer benchmark and parity check")
+    parser.add_argument("--sizes", default="1KB,100KB,10MB", help="문서 크기 목록 (쉼표 구분)")
+    parser.add_argument("--repeat", type=int, default=3, help="크기별 측정 반복 횟수 (중앙값 출력)")
+    parser.add_argument("--check-only", action="store_true", help="출력 비교만 실행")
+    args = parser.parse_args()
+
+    converter = _load_desktop_module("content_converter").ContentConverter()
+    manager = _load_desktop_module("emoticon_manager").EmoticonManager()
+
+    failures = check_parity(converter, manager)
+    intended = len(INTENDED_CHANGES) + len(DESKTOP_INTENDED_CHANGES)
+    print(f"[parity] {'OK' if not failures else f'{len(failures)}건 불일치'} (의도적 변경 {intended}건 확인)")
+    for failure in failures:
+        print(f"  {failure}")
+    if args.check_only:
+        sys.exit(1 if failures else 0)
+
+    pairs = [
+        ("convert_text_to_blocks", legacy_convert_text_to_blocks, lex_blocks),
+        ("parse_text_content", legacy_parse_text_content, converter.parse_text_content),
+        ("format_text", legacy_format_text, converter.format_text),
+        ("apply_emoticons", lambda text: legacy_apply_emoticons(manager, text), lambda text: manager.apply_emoticons_to_text(text, "많이")),
+    ]
+    for size_text in args.sizes.split(","):
+        document = build_document(_parse_size(size_text))
+        print(f"\n[{size_text.strip()}] {len(document.encode('utf-8')):,} bytes, {document.count(chr(10)) + 1:,} lines")
+        for name, legacy, current in pairs:
+            before = _measure(legacy, document, args.repeat)
+            after = _measure(current, document, args.repeat)
+            print(f"  {name:<24} legacy {before * 1000:9.2f}ms  lexer {after * 1000:9.2f}ms  x{before / after:5.2f}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
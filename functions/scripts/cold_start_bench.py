@@ -0,0 +1,176 @@
+"""
+콜드 스타트 벤치마크
+1) 모듈 import 시간: 새 인터프리터에서 main / accounts / generation 을 각각 import
+2) 모드별 첫 응답 시간: 모드마다 functions-framework 를 새로 띄워서 서버 준비까지 걸린 시간과
+   첫 요청의 응답 시간을 측정 (첫 요청에 처리기 모듈의 지연 import가 포함됨)
+
+기본 모드는 외부 호출 없이 끝나는 요청만 보낸다
+(user_info/register_user 는 토큰이 없어 401, status 는 memory 작업 저장소에서 404).
+모델을 호출하는 모드는 실제 GEMINI_API_KEY 를 설정하고 --mode 로 지정한다
+
+사용법 (functions 디렉터리에서, functions-framework 설치 필요):
+    python scripts/cold_start_bench.py --repeat 3
+    python scripts/cold_start_bench.py --target account_api --mode user_info --mode register_user
+    python scripts/cold_start_bench.py --importtime generation
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 모드별 벤치마크 요청 본문
+MODE_PAYLOADS = {
+    "user_info": {"mode": "user_info"},
+    "register_user": {"mode": "register_user"},
+    "status": {"mode": "status", "job_id": "cold-start-bench"},
+    "recommend": {"mode": "recommend", "category": "자동차"},
+    "analyze": {"mode": "analyze", "topic": "전기차 배터리 관리"},
+    "write": {"mode": "write", "topic": "전기차 배터리 관리"},
+}
+DEFAULT_MODES = ("user_info", "register_user", "status")
+
+# 외부 저장소/캐시 없이 로컬에서 끝나도록 하는 환경 변수
+BENCH_ENV = {
+    "JOB_STORE_BACKEND": "memory",
+    "VISUAL_CACHE_BACKEND": "memory",
+    "PROMPT_CACHE_BACKEND": "off",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _bench_env() -> dict:
+    env = dict(os.environ, **BENCH_ENV)
+    env.setdefault("GEMINI_API_KEY", "cold-start-bench")
+    return env
+
+
+def measure_import(module: str, repeat: int) -> list:
+    """새 인터프리터에서 module import에 걸린 시간 (초) 목록"""
+    code = (
+        "import time; started = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - started)"
+    )
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=FUNCTIONS_DIR, env=_bench_env(), capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()}")
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def print_importtime(module: str, top: int):
+    """python -X importtime 결과에서 누적 시간이 큰 모듈 상위 top개 출력"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=FUNCTIONS_DIR, env=_bench_env(), capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    print(f"\n[importtime] {module} (상위 {top}개, 누적 기준)")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  (self {self_us / 1000:6.1f}ms)  {name}")
+
+
+def measure_first_response(target: str, payload: dict, startup_timeout: float) -> dict:
+    """functions-framework를 새로 띄워 서버 준비 시간과 첫 요청 응답 시간 측정"""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        ["functions-framework", "--source", "main.py", "--target", target, "--port", str(port)],
+        cwd=FUNCTIONS_DIR, env=_bench_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        # 포트가 열릴 때까지 대기 (main.py import 포함)
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"functions-framework exited:\n{process.stderr.read().decode(errors='replace')}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.perf_counter() - started > startup_timeout:
+                    raise RuntimeError("functions-framework did not start in time")
+                time.sleep(0.02)
+        ready = time.perf_counter() - started
+
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        request_started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                status = response.status
+                response.read()
+        except urllib.error.HTTPError as e:
+            status = e.code
+        first_response = time.perf_counter() - request_started
+        return {"ready": ready, "first_response": first_response, "total": ready + first_response, "status": status}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _summary(samples: list) -> str:
+    return f"median={statistics.median(samples) * 1000:7.1f}ms  min={min(samples) * 1000:7.1f}ms  max={max(samples) * 1000:7.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark (import time / first response per mode)")
+    parser.add_argument("--target", default="generate_blog_post", help="functions-framework 대상 함수")
+    parser.add_argument("--mode", action="append", choices=sorted(MODE_PAYLOADS), help="측정할 모드 (여러 번 지정 가능)")
+    parser.add_argument("--repeat", type=int, default=3, help="측정 반복 횟수")
+    parser.add_argument("--startup-timeout", type=float, default=60, help="서버 준비 최대 대기 (초)")
+    parser.add_argument("--skip-import", action="store_true", help="모듈 import 시간 측정 생략")
+    parser.add_argument("--skip-server", action="store_true", help="functions-framework 측정 생략")
+    parser.add_argument("--importtime", metavar="MODULE", help="python -X importtime 상위 항목 출력")
+    parser.add_argument("--top", type=int, default=15, help="--importtime 출력 개수")
+    args = parser.parse_args()
+
+    if not args.skip_import:
+        print("[import] 새 인터프리터 기준")
+        for module in ("handlers", "accounts", "main", "generation"):
+            print(f"  {module:<11} {_summary(measure_import(module, args.repeat))}")
+
+    if args.importtime:
+        print_importtime(args.importtime, args.top)
+
+    if args.skip_server:
+        return
+
+    print(f"\n[first response] target={args.target}")
+    for mode in args.mode or DEFAULT_MODES:
+        runs = [measure_first_response(args.target, MODE_PAYLOADS[mode], args.startup_timeout) for _ in range(args.repeat)]
+        statuses = sorted({run["status"] for run in runs})
+        print(f"  {mode} (status {statuses})")
+        for key in ("ready", "first_response", "total"):
+            print(f"    {key:<15} {_summary([run[key] for run in runs])}")
+
+
+if __name__ == "__main__":
+    main()
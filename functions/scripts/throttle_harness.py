@@ -0,0 +1,119 @@
+"""
+Gemini 호출 스케줄러 스로틀링 시뮬레이터
+가짜 모델(분당 처리 한도를 넘으면 429 반환)을 스케줄러 뒤에 두고
+우선순위가 섞인 동시 호출을 보내서 처리량/대기시간/429 횟수를 확인한다
+
+사용법 (functions 디렉터리에서):
+    python scripts/throttle_harness.py --calls 60 --concurrency 12 --server-rpm 120 --client-rpm 90
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import (  # noqa: E402
+    ModelScheduler, RateLimitExceeded, call_with_backoff, request_priority,
+    PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+)
+
+MODEL = "fake-model"
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+
+class FakeAPIError(Exception):
+    """SDK APIError처럼 code/response.headers를 가진 가짜 예외"""
+
+    def __init__(self, code: int, retry_after: float = None):
+        super().__init__(f"{code} fake error")
+        self.code = code
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        self.response = type("FakeResponse", (), {"headers": headers})()
+
+
+class FakeModel:
+    """최근 60초 호출 수가 server_rpm을 넘으면 429, 일정 확률로 503을 내는 가짜 모델"""
+
+    def __init__(self, server_rpm: float, latency: float, error_rate: float, send_retry_after: bool):
+        self.server_rpm = server_rpm
+        self.latency = latency
+        self.error_rate = error_rate
+        self.send_retry_after = send_retry_after
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def generate_content(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] > 60:
+                self._calls.popleft()
+            if len(self._calls) >= self.server_rpm:
+                self.rejected += 1
+                retry_after = 60 - (now - self._calls[0]) if self.send_retry_after else None
+                raise FakeAPIError(429, retry_after)
+            self._calls.append(now)
+        if random.random() < self.error_rate:
+            raise FakeAPIError(503)
+        time.sleep(self.latency)
+        return "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gemini scheduler throttling harness")
+    parser.add_argument("--calls", type=int, default=60, help="총 호출 수")
+    parser.add_argument("--concurrency", type=int, default=12, help="동시 호출 스레드 수")
+    parser.add_argument("--server-rpm", type=float, default=120, help="가짜 모델의 분당 처리 한도 (초과 시 429)")
+    parser.add_argument("--client-rpm", type=float, default=90, help="스케줄러 토큰 버킷 분당 요청 수")
+    parser.add_argument("--burst", type=float, default=10, help="스케줄러 버킷 버스트")
+    parser.add_argument("--latency", type=float, default=0.2, help="가짜 모델 응답 지연 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="가짜 모델 503 확률")
+    parser.add_argument("--queue-timeout", type=float, default=30, help="대기열 최대 대기 (초)")
+    parser.add_argument("--no-retry-after", action="store_true", help="429에 Retry-After를 싣지 않음")
+    args = parser.parse_args()
+
+    model = FakeModel(args.server_rpm, args.latency, args.error_rate, not args.no_retry_after)
+    scheduler = ModelScheduler(limits={MODEL: (args.client_rpm, args.burst)})
+    results = defaultdict(lambda: {"ok": 0, "limited": 0, "failed": 0, "latency": []})
+
+    def _call(i):
+        priority = random.choice([PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_NORMAL, PRIORITY_LOW, PRIORITY_LOW])
+        bucket = results[PRIORITY_NAMES[priority]]
+        started = time.monotonic()
+        # 운영 코드와 같이 요청 컨텍스트의 우선순위로 대기열에 들어감
+        request_priority.set(priority)
+        try:
+            call_with_backoff(scheduler, MODEL, model.generate_content, queue_timeout=args.queue_timeout)
+            bucket["ok"] += 1
+        except RateLimitExceeded:
+            bucket["limited"] += 1
+        except Exception:
+            bucket["failed"] += 1
+        bucket["latency"].append(time.monotonic() - started)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(_call, range(args.calls)))
+    elapsed = time.monotonic() - started
+
+    print(f"calls={args.calls} elapsed={elapsed:.1f}s server_429={model.rejected} scheduler={scheduler.stats()}")
+    for name in ("high", "normal", "low"):
+        item = results[name]
+        latencies = sorted(item["latency"])
+        if not latencies:
+            continue
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(
+            f"  {name:<6} ok={item['ok']:<4} limited={item['limited']:<3} failed={item['failed']:<3} "
+            f"p50={p50:.2f}s p95={p95:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+일별 주제 추천 풀 CLI (precompute_topic_pools 스케줄 함수의 로컬 실행판)
+
+사용법 (functions 디렉터리에서, GEMINI_API_KEY 필요):
+    # 메모리 저장소에 풀을 만들고 recommend 응답처럼 3번 뽑아보기 (중복 없이 소진되는지 확인)
+    python scripts/topic_pool_cli.py build --category "전기차 라이프" --sample 3
+
+    # Firestore에 오늘 풀 생성 (애플리케이션 기본 사용자 인증 정보 필요)
+    python scripts/topic_pool_cli.py build --store firestore
+
+    # Firestore에 저장된 풀 확인
+    python scripts/topic_pool_cli.py show --category "전기차 라이프" --date 2026-10-17
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _load(store: str):
+    """저장소 설정 후 생성 모듈 import (설정값은 import 시점에 읽음)"""
+    os.environ["TOPIC_POOL_BACKEND"] = store
+    os.environ.setdefault("VISUAL_CACHE_BACKEND", "memory")
+    os.environ.setdefault("JOB_STORE_BACKEND", "memory")
+    if store == "firestore":
+        from firebase_admin import initialize_app
+        initialize_app()
+    import generation
+    return generation
+
+
+def _pool_time(date: str):
+    """--date 값을 풀 생성 기준 시각(해당 날짜 00:10 KST)으로 변환"""
+    from topic_pool import KST
+    if not date:
+        return None
+    return datetime.strptime(date, "%Y-%m-%d").replace(hour=0, minute=10, tzinfo=KST)
+
+
+def cmd_build(args):
+    generation = _load(args.store)
+    from genai_pool import get_genai_client
+
+    api_key = os.environ.get("GEMINI_API_KEY", "").strip()
+    if not api_key:
+        sys.exit("GEMINI_API_KEY 환경 변수가 필요합니다.")
+
+    now = _pool_time(args.date)
+    categories = args.category or None
+    summary = generation.refresh_topic_pools(get_genai_client(api_key), categories, now, args.slots)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    date = generation.pool_date(now)
+    for category in categories or list(generation.CATEGORY_CONFIG):
+        pool = generation.topic_pool.get(category, date)
+        if not pool:
+            continue
+        print(f"\n[{category}] {date} - {len(pool['entries'])}개")
+        for entry in pool["entries"]:
+            print(f"  - {entry['topic']}  ({entry['perspective']} / {entry['content_type']})")
+        for i in range(args.sample):
+            sampled = generation.topic_pool.sample(category, generation.RECOMMEND_TOPIC_COUNT, requester="cli", date=date)
+            print(f"  sample {i + 1}: {json.dumps(sampled, ensure_ascii=False) if sampled else '소진 (실시간 생성으로 전환)'}")
+    print(f"\npool stats: {generation.topic_pool.stats()}")
+
+
+def cmd_show(args):
+    generation = _load("firestore")
+    date = generation.pool_date(_pool_time(args.date))
+    for category in args.category or list(generation.CATEGORY_CONFIG):
+        pool = generation.topic_pool.get(category, date)
+        print(f"[{category}] {date}: " + (json.dumps(pool, ensure_ascii=False, indent=2, default=str) if pool else "없음"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily topic recommendation pool")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="주제 풀 생성")
+    build.add_argument("--category", action="append", help="대상 카테고리 (여러 번 지정 가능, 기본: 전체)")
+    build.add_argument("--store", choices=("memory", "firestore"), default="memory", help="저장소")
+    build.add_argument("--date", help="풀 날짜 YYYY-MM-DD (기본: 오늘, 한국 시간)")
+    build.add_argument("--slots", type=int, help="카테고리당 컨텍스트 슬롯 수 (기본: TOPIC_POOL_SLOTS)")
+    build.add_argument("--sample", type=int, default=0, help="생성 후 recommend처럼 뽑아볼 횟수")
+    build.set_defaults(func=cmd_build)
+
+    show = sub.add_parser("show", help="Firestore에 저장된 풀 조회")
+    show.add_argument("--category", action="append", help="대상 카테고리 (기본: 전체)")
+    show.add_argument("--date", help="풀 날짜 YYYY-MM-DD (기본: 오늘, 한국 시간)")
+    show.set_defaults(func=cmd_show)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
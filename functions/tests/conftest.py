@@ -0,0 +1,20 @@
+"""
+functions 테스트 공통 설정
+모듈들을 functions 디렉터리 기준으로 import하고, 생성 모듈의 저장소/캐시는 외부 서비스 없이 메모리로 둔다
+(설정값은 import 시점에 읽으므로 테스트 모듈보다 먼저 설정)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for name, value in {
+    "JOB_STORE_BACKEND": "memory",
+    "VISUAL_CACHE_BACKEND": "memory",
+    "PROMPT_CACHE_BACKEND": "off",
+    "TOPIC_POOL_BACKEND": "memory",
+    "RESPONSE_CACHE_BACKEND": "memory",
+    "GROUNDING_CACHE_BACKEND": "memory",
+    "USAGE_LEDGER_BACKEND": "memory",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,230 @@
+"""
+이미지 사용량 예약/환불 동시성 검증
+가짜 Firestore(문서 버전으로 충돌을 감지해 트랜잭션 함수를 다시 실행)에서 같은 사용자로 50개 요청을 동시에
+예약하여, 한도를 넘겨 발급하는 경우가 없고 실패한 생성의 환불이 정확히 반영되는지 확인한다
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+import accounts
+
+CONCURRENCY = 50
+
+
+class FakeConflict(Exception):
+    """커밋 시점에 읽은 문서가 바뀐 경우"""
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+
+    def get(self, transaction=None):
+        with self._db.lock:
+            data, version = self._db.docs.get(self.path, (None, 0))
+        if transaction is not None:
+            transaction.reads[self.path] = version
+            # 읽기와 커밋 사이에 다른 요청이 끼어들 여지를 만든다
+            time.sleep(0.001)
+        return FakeSnapshot(None if data is None else dict(data))
+
+    def set(self, data):
+        self._db.commit({self.path: dict(data)}, {})
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self._db = db
+        self._name = name
+
+    def document(self, doc_id):
+        return FakeDocument(self._db, f"{self._name}/{doc_id}")
+
+
+class FakeTransaction:
+    def __init__(self, db):
+        self._db = db
+        self.reads = {}
+        self.writes = {}
+
+    def set(self, ref, data):
+        self.writes[ref.path] = dict(data)
+
+    def update(self, ref, updates):
+        current = self.writes.get(ref.path)
+        if current is None:
+            with self._db.lock:
+                current = dict(self._db.docs[ref.path][0])
+        current.update(updates)
+        self.writes[ref.path] = current
+
+
+class FakeFirestoreClient:
+    """문서별 버전을 두고, 트랜잭션 커밋 때 읽은 버전이 그대로인지 확인하는 메모리 Firestore"""
+
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+        self.conflicts = 0
+        self.max_daily = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def commit(self, writes, reads):
+        with self.lock:
+            for path, version in reads.items():
+                if self.docs.get(path, (None, 0))[1] != version:
+                    self.conflicts += 1
+                    raise FakeConflict(path)
+            for path, data in writes.items():
+                self.docs[path] = (data, self.docs.get(path, (None, 0))[1] + 1)
+                self.max_daily = max(self.max_daily, data.get("daily_image_count", 0))
+
+
+class FakeFirestoreModule:
+    """accounts가 쓰는 firestore.transactional만 흉내 (충돌 시 함수 전체를 다시 실행)"""
+
+    @staticmethod
+    def transactional(func, max_attempts=CONCURRENCY * 2):
+        def wrapper(transaction):
+            for _ in range(max_attempts):
+                transaction.reads, transaction.writes = {}, {}
+                result = func(transaction)
+                try:
+                    transaction._db.commit(transaction.writes, transaction.reads)
+                    return result
+                except FakeConflict:
+                    continue
+            raise RuntimeError("transaction contention")
+        return wrapper
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeFirestoreClient()
+    monkeypatch.setattr(accounts, "get_db", lambda: fake)
+    monkeypatch.setattr(accounts, "firestore", FakeFirestoreModule)
+    accounts._user_flags_cache.clear()
+    return fake
+
+
+def _add_user(db, uid, **fields):
+    now = datetime.now()
+    data = {
+        "is_active": True,
+        "is_admin": False,
+        "daily_image_count": 0,
+        "monthly_image_count": 0,
+        "last_reset_date": now.strftime("%Y-%m-%d"),
+        "last_reset_month": now.strftime("%Y-%m"),
+    }
+    data.update(fields)
+    db.docs[f"users/{uid}"] = (data, 1)
+
+
+def _user(db, uid):
+    return db.docs[f"users/{uid}"][0]
+
+
+def test_concurrent_reservations_never_exceed_daily_limit(db):
+    _add_user(db, "u1")
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(lambda _: accounts.reserve_image_quota("u1", 1), range(CONCURRENCY)))
+
+    allowed = [r for r in results if r["allowed"]]
+    assert len(allowed) == accounts.DAILY_IMAGE_LIMIT
+    assert all("일일 이미지 생성 한도" in r["reason"] for r in results if not r["allowed"])
+    assert _user(db, "u1")["daily_image_count"] == accounts.DAILY_IMAGE_LIMIT
+    assert _user(db, "u1")["monthly_image_count"] == accounts.DAILY_IMAGE_LIMIT
+    assert db.max_daily == accounts.DAILY_IMAGE_LIMIT
+    # 예약마다 서로 다른 카운터 값을 받음 (같은 값을 읽고 함께 통과한 요청이 없음)
+    assert sorted(r["usage"]["daily_image_count"] for r in allowed) == list(range(1, accounts.DAILY_IMAGE_LIMIT + 1))
+    assert db.conflicts > 0
+
+
+def test_concurrent_reservations_respect_monthly_limit(db):
+    _add_user(db, "u2", monthly_image_count=accounts.MONTHLY_IMAGE_LIMIT - 3)
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(lambda _: accounts.reserve_image_quota("u2", 1), range(CONCURRENCY)))
+
+    assert sum(r["allowed"] for r in results) == 3
+    assert _user(db, "u2")["monthly_image_count"] == accounts.MONTHLY_IMAGE_LIMIT
+
+
+def test_refund_on_failure_under_contention(db):
+    """절반의 생성이 실패해 환불되면 그만큼 다른 요청이 예약할 수 있고, 최종 카운터는 성공한 생성 수와 같다"""
+    _add_user(db, "u3")
+    generated = []
+    generated_lock = threading.Lock()
+
+    def _request(i):
+        reservation = accounts.reserve_image_quota("u3", 1)
+        if not reservation["allowed"]:
+            return reservation
+        if i % 2:
+            accounts.refund_image_quota("u3", reservation)
+        else:
+            with generated_lock:
+                generated.append(i)
+        return reservation
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(_request, range(CONCURRENCY)))
+
+    assert db.max_daily <= accounts.DAILY_IMAGE_LIMIT
+    assert _user(db, "u3")["daily_image_count"] == len(generated)
+    assert _user(db, "u3")["monthly_image_count"] == len(generated)
+    assert len(generated) == sum(r["allowed"] for i, r in enumerate(results) if i % 2 == 0)
+
+    # 환불된 자리는 다시 예약할 수 있고, 그 이상은 발급되지 않음
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        retries = list(executor.map(lambda _: accounts.reserve_image_quota("u3", 1), range(CONCURRENCY)))
+    assert sum(r["allowed"] for r in retries) == accounts.DAILY_IMAGE_LIMIT - len(generated)
+    assert _user(db, "u3")["daily_image_count"] == accounts.DAILY_IMAGE_LIMIT
+    assert db.max_daily == accounts.DAILY_IMAGE_LIMIT
+
+
+def test_refund_skips_counter_reset_after_reservation(db):
+    """예약 후 날짜가 바뀌어 일일 카운터가 리셋됐다면 일일 카운터는 환불하지 않음"""
+    _add_user(db, "u4")
+    reservation = accounts.reserve_image_quota("u4", 1)
+    assert reservation["allowed"]
+
+    db.docs["users/u4"][0].update(daily_image_count=0, last_reset_date="2000-01-01")
+    accounts.refund_image_quota("u4", reservation)
+
+    assert _user(db, "u4")["daily_image_count"] == 0
+    assert _user(db, "u4")["monthly_image_count"] == 0
+
+
+def test_inactive_user_is_denied_without_reservation(db):
+    _add_user(db, "u5", is_active=False)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: accounts.reserve_image_quota("u5", 1), range(10)))
+
+    assert not any(r["allowed"] for r in results)
+    assert _user(db, "u5")["daily_image_count"] == 0
@@ -0,0 +1,23 @@
+"""
+block_lexer 공용 문법 검증
+scripts/block_lexer_bench.py 의 비교(예전 구현과 동일 출력, 의도적 변경은 기대값)를 테스트로 실행하고,
+데스크톱용 복사본 core/block_lexer.py 가 원본과 같은지 확인한다
+"""
+import importlib.util
+import os
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "block_lexer_bench.py")
+
+_spec = importlib.util.spec_from_file_location("block_lexer_bench", SCRIPT)
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+
+def test_vendored_copy_matches_original():
+    assert bench.check_vendored_copy() == []
+
+
+def test_parity_with_legacy_parsers():
+    converter = bench._load_desktop_module("content_converter").ContentConverter()
+    manager = bench._load_desktop_module("emoticon_manager").EmoticonManager()
+    assert bench.check_parity(converter, manager) == []
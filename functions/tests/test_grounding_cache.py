@@ -0,0 +1,75 @@
+"""
+검색 자료 캐시 검증
+캐시 자료로 쓰는 글 작성(검색 도구 없음)의 프롬프트에 출처 URL만이 아니라
+검색으로 뒷받침된 근거 본문이 들어가는지, 근거 없는 자료로는 검색을 생략하지 않는지 확인한다
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import generation
+from grounding_cache import GroundingCache, extract_grounding
+from topic_pool import MemoryTopicPoolStore
+
+CATEGORY = "자동차"
+
+
+def _response(index: int, facts: int = 4):
+    """검색 출처 5개 + 출처로 뒷받침된 구간 facts개를 가진 Grounding 응답"""
+    chunks = [
+        SimpleNamespace(web=SimpleNamespace(title=f"news{index}-{i}.co.kr",
+                                            uri=f"https://vertexaisearch.cloud.google.com/redirect/{index}-{i}"))
+        for i in range(5)
+    ]
+    supports = [
+        SimpleNamespace(segment=SimpleNamespace(text=f"2026년 전기차 보조금은 차종별 최대 {500 + index * 10 + i}만원이다."),
+                        grounding_chunk_indices=[i % 5])
+        for i in range(facts)
+    ]
+    metadata = SimpleNamespace(grounding_chunks=chunks, grounding_supports=supports,
+                               web_search_queries=[f"전기차 보조금 {index}"])
+    return SimpleNamespace(candidates=[SimpleNamespace(grounding_metadata=metadata)])
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = GroundingCache(MemoryTopicPoolStore())
+    monkeypatch.setattr(generation, "grounding_cache", cache)
+    return cache
+
+
+def test_extract_keeps_supported_segments_with_source_titles():
+    grounding = extract_grounding(_response(0, facts=2))
+
+    assert len(grounding["sources"]) == 5
+    assert grounding["evidence"] == [
+        {"text": "2026년 전기차 보조금은 차종별 최대 500만원이다.", "sources": ["news0-0.co.kr"]},
+        {"text": "2026년 전기차 보조금은 차종별 최대 501만원이다.", "sources": ["news0-1.co.kr"]},
+    ]
+
+
+def test_cached_write_prompt_contains_source_content(cache):
+    cache.add(CATEGORY, _response(0), "write")
+    cache.add(CATEGORY, _response(1), "recommend")
+
+    static_prompt, contents, variant = generation.plan_write_grounding(CATEGORY, "[TOPIC] 전기차 보조금")
+
+    assert variant == "cached"
+    assert static_prompt is generation.WRITE_REFERENCE_STATIC_PROMPT
+    assert not static_prompt.tools
+    assert "2026년 전기차 보조금은 차종별 최대 510만원이다." in contents
+    assert "2026년 전기차 보조금은 차종별 최대 503만원이다." in contents
+    # 리다이렉트 URL은 근거가 아니므로 프롬프트에 넣지 않음
+    assert "vertexaisearch" not in contents
+    assert contents.endswith("[TOPIC] 전기차 보조금")
+
+
+def test_sources_without_evidence_keep_search_tool(cache):
+    for index in range(3):
+        cache.add(CATEGORY, _response(index, facts=0), "write")
+
+    static_prompt, contents, variant = generation.plan_write_grounding(CATEGORY, "[TOPIC] 전기차 보조금")
+
+    assert variant == "search"
+    assert static_prompt is generation.WRITE_STATIC_PROMPT
+    assert contents == "[TOPIC] 전기차 보조금"
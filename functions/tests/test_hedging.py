@@ -0,0 +1,127 @@
+"""
+헤징 정책 검증
+기본 호출이 예산을 넘기면 보내는 두 번째 호출의 모델/도구, 진 쪽 호출 비용 집계,
+스레드 풀이 찼을 때 헤징 생략을 가짜 클라이언트로 확인한다
+"""
+import contextvars
+import threading
+
+from google.genai import types
+
+import generation
+from genai_pool import MODEL_SCHEDULER
+from hedging import HEDGE_MODE_SUFFIX, Hedger, HedgePolicy
+from usage_ledger import UsageOwner, usage_owner
+
+
+class FakeModels:
+    """primary_model 호출은 release될 때까지 대기, 나머지는 즉시 응답"""
+
+    def __init__(self, primary_model: str):
+        self.primary_model = primary_model
+        self.release = threading.Event()
+        self.calls = []
+
+    def generate_content(self, model, **kwargs):
+        self.calls.append((model, kwargs))
+        if model == self.primary_model and len(self.calls) == 1:
+            self.release.wait(5)
+        return types.GenerateContentResponse(candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text='{"title": "t", "blocks": []}')])
+        )])
+
+
+class FakeClient:
+    def __init__(self, primary_model: str):
+        self.models = FakeModels(primary_model)
+
+
+def _grounded_config():
+    return types.GenerateContentConfig(
+        system_instruction="s", tools=[types.Tool(google_search=types.GoogleSearch())]
+    )
+
+
+def test_write_policy_hedges_to_a_different_model_without_search():
+    policy = generation.HEDGE_POLICIES["write"]
+    assert policy.fallback_model != generation.MODEL_NAME
+    assert not policy.fallback_tools
+
+
+def test_grounded_write_hedge_sends_no_search_tool():
+    client = FakeClient(generation.MODEL_NAME)
+    policy = generation.HEDGE_POLICIES["write"]
+    hedger = Hedger({"write": HedgePolicy(
+        policy.fallback_model, default_budget=0.05, min_budget=0.05, fallback_tools=policy.fallback_tools
+    )})
+
+    try:
+        hedger.generate(
+            client, "write", generation.MODEL_NAME, validate=generation.is_json_response,
+            contents="c", config=_grounded_config(), fallback_config=_grounded_config()
+        )
+    finally:
+        client.models.release.set()
+
+    (primary_model, primary), (fallback_model, fallback) = client.models.calls
+    assert primary_model == generation.MODEL_NAME and primary["config"].tools
+    assert fallback_model == generation.FALLBACK_MODEL_NAME
+    assert not fallback["config"].tools
+    assert fallback["config"].system_instruction == "s"
+
+
+class UsageModels(FakeModels):
+    """응답에 usage_metadata를 붙이고 호출 시점의 사용량 귀속 대상을 기록"""
+
+    def __init__(self, primary_model: str):
+        super().__init__(primary_model)
+        self.owners = []
+
+    def generate_content(self, model, **kwargs):
+        self.owners.append((model, usage_owner.get()))
+        response = super().generate_content(model, **kwargs)
+        response.usage_metadata = types.GenerateContentResponseUsageMetadata(total_token_count=1234)
+        return response
+
+
+def _hedger(max_workers: int = 16):
+    return Hedger({"write": HedgePolicy("lite", default_budget=0.05, min_budget=0.05)}, max_workers=max_workers)
+
+
+def test_losing_call_is_counted_and_hedge_is_billed_separately():
+    client = FakeClient("primary")
+    client.models = UsageModels("primary")
+    hedger = _hedger()
+
+    def _request():
+        usage_owner.set(UsageOwner("u1", "write"))
+        hedger.generate(client, "write", "primary", contents="c")
+
+    contextvars.copy_context().run(_request)
+    client.models.release.set()
+    hedger._executor.shutdown(wait=True)
+
+    assert dict(client.models.owners) == {
+        "primary": UsageOwner("u1", "write"),
+        "lite": UsageOwner("u1", "write" + HEDGE_MODE_SUFFIX),
+    }
+    stats = hedger.stats()["write"]
+    assert stats["fallback_wins"] == 1
+    assert stats["abandoned"] == 1
+    assert stats["abandoned_tokens"] == 1234
+
+
+def test_saturated_pool_skips_hedging():
+    client = FakeClient("primary")
+    hedger = _hedger(max_workers=1)
+    threading.Timer(0.2, client.models.release.set).start()
+
+    hedger.generate(client, "write", "primary", contents="c")
+
+    assert [model for model, _ in client.models.calls] == ["primary"]
+    assert hedger.stats()["write"]["saturated"] == 1
+    assert hedger.stats()["write"]["hedged"] == 0
+
+
+def test_hedger_pool_matches_scheduler_burst():
+    assert generation.hedger.max_workers == 2 * MODEL_SCHEDULER.burst(generation.MODEL_NAME)
@@ -0,0 +1,130 @@
+"""
+비동기 작업 조회 검증
+Firestore 저장소의 long-poll은 문서 리스너로 대기하고(반복 조회 없음),
+실행 함수 시간 초과로 남은 작업은 오류로 전환되며, 로그인 사용자의 작업은 본인만 조회하는지 확인한다
+"""
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import generation
+from job_store import JOB_DONE, JOB_ERROR, JOB_RUNNING, FirestoreJobStore, MemoryJobStore
+
+
+class FakeWatch:
+    def __init__(self):
+        self.unsubscribed = False
+
+    def unsubscribe(self):
+        self.unsubscribed = True
+
+
+class FakeDocRef:
+    """get() 횟수를 세고 on_snapshot 리스너에 변경을 전달하는 문서"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.reads = 0
+        self.listeners = []
+        self.watches = []
+
+    def _snapshot(self):
+        data = dict(self.data)
+        return SimpleNamespace(exists=True, to_dict=lambda: data)
+
+    def get(self):
+        self.reads += 1
+        return self._snapshot()
+
+    def on_snapshot(self, callback):
+        self.listeners.append(callback)
+        callback([self._snapshot()], [], None)
+        watch = FakeWatch()
+        self.watches.append(watch)
+        return watch
+
+    def change(self, **fields):
+        self.data.update(fields)
+        self.data["version"] += 1
+        for callback in self.listeners:
+            callback([self._snapshot()], [], None)
+
+
+def _firestore_store(ref):
+    db = SimpleNamespace(collection=lambda name: SimpleNamespace(document=lambda job_id: ref))
+    return FirestoreJobStore(lambda: db)
+
+
+def test_firestore_wait_uses_listener_instead_of_polling():
+    ref = FakeDocRef({"job_id": "j", "status": JOB_RUNNING, "version": 1})
+    store = _firestore_store(ref)
+    threading.Timer(0.2, ref.change, kwargs={"status": JOB_DONE}).start()
+
+    job = store.wait("j", since_version=1, timeout=5)
+
+    assert job["status"] == JOB_DONE
+    assert ref.reads == 0
+    assert ref.watches[0].unsubscribed
+
+
+def test_firestore_wait_returns_last_snapshot_on_timeout():
+    ref = FakeDocRef({"job_id": "j", "status": JOB_RUNNING, "version": 3})
+    job = _firestore_store(ref).wait("j", since_version=3, timeout=0.1)
+
+    assert job["version"] == 3
+    assert ref.reads == 0
+    assert ref.watches[0].unsubscribed
+
+
+class FakeRequest:
+    def __init__(self, token: str = None):
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = MemoryJobStore()
+    monkeypatch.setattr(generation, "job_store", store)
+    monkeypatch.setattr(generation, "verify_user_token", lambda req: {"uid": req.headers["Authorization"][7:]})
+    return store
+
+
+def _query(mode: str, job_id: str, token: str = None, **fields):
+    response = generation.handle_job_query(FakeRequest(token), dict(fields, job_id=job_id), mode, None)
+    return response.status_code, json.loads(response.get_data())
+
+
+def test_stale_running_job_is_marked_as_error(store):
+    store.create("stale", "write", {"topic": "t"})
+    store.claim("stale")
+    store._jobs.get("stale")["updated_at"] = datetime.now(timezone.utc) - timedelta(seconds=generation.JOB_STALE_AFTER + 1)
+
+    status, body = _query("status", "stale", wait_sec=5)
+
+    assert status == 200
+    assert body["status"] == JOB_ERROR
+    assert store.get("stale")["status"] == JOB_ERROR
+    assert _query("result", "stale")[0] == 500
+
+
+def test_recent_running_job_is_left_running(store):
+    store.create("live", "write", {"topic": "t"})
+    store.claim("live")
+
+    status, body = _query("status", "live", since_version=5)
+
+    assert body["status"] == JOB_RUNNING
+    assert store.get("live")["status"] == JOB_RUNNING
+
+
+def test_owned_job_is_hidden_from_other_callers(store):
+    store.create("owned", "write", {"topic": "t"}, owner="alice")
+    store.update("owned", {"status": JOB_DONE, "result": {"title": "비밀 글"}})
+
+    assert _query("result", "owned")[0] == 404
+    assert _query("result", "owned", token="bob")[0] == 404
+    assert _query("status", "owned", token="bob")[0] == 404
+    assert _query("result", "owned", token="alice") == (200, {"title": "비밀 글"})
@@ -0,0 +1,51 @@
+"""
+ModelJsonParser 복구 동작 검증
+fixtures/model_json/*.txt 는 모델이 실제로 내는 형태의 깨진 출력(펜스, 앞뒤 설명문, 잘림, 트레일링 콤마,
+문자열 내 줄바꿈, 작은따옴표 등)이고, expected.json 은 파일별 기대 결과(data, report)이다.
+작은따옴표 JSON과 JSON이 없는 응답은 복구하지 않으며(data=None) 호출자가 전체 텍스트 fallback으로 처리한다
+"""
+import json
+import os
+
+import pytest
+
+from model_json import ModelJsonParser, parse_model_json
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "model_json")
+
+with open(os.path.join(FIXTURE_DIR, "expected.json"), encoding="utf-8") as f:
+    EXPECTED = json.load(f)
+
+
+def _read(name: str) -> str:
+    with open(os.path.join(FIXTURE_DIR, f"{name}.txt"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_every_fixture_has_expectation():
+    fixtures = {name[:-4] for name in os.listdir(FIXTURE_DIR) if name.endswith(".txt")}
+    assert fixtures == set(EXPECTED)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_parse_model_json(name):
+    data, report = parse_model_json(_read(name))
+    assert data == EXPECTED[name]["data"]
+    assert report == EXPECTED[name]["report"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_streamed_chunks_match_one_shot(name, chunk_size):
+    """스트리밍 청크로 나눠 넣어도 한 번에 파싱한 결과와 같고, 스트림 중 받은 원소가 최종 결과의 앞부분"""
+    raw = _read(name)
+    parser = ModelJsonParser()
+    items = {}
+    for start in range(0, len(raw), chunk_size):
+        for event in parser.feed(raw[start:start + chunk_size]):
+            if event[0] == "item":
+                items.setdefault(event[1], []).append(event[3])
+    data, report = parser.finish()
+    assert (data, report) == parse_model_json(raw)
+    for key, streamed in items.items():
+        assert data[key][:len(streamed)] == streamed
@@ -0,0 +1,76 @@
+"""
+고정 프롬프트 컨텍스트 캐시 검증
+최소 토큰 수에 못 미치는 고정 프롬프트는 caches.create를 보내지 않고(다시 시도도 안 함),
+풀 클라이언트의 count_tokens/caches.create는 모델별 스케줄러를 거치는지 확인한다
+"""
+from types import SimpleNamespace
+
+from genai_pool import ModelStats, PooledClient
+from prompt_cache import GeminiCacheBackend, PrefixCache, StaticPrompt, min_cache_tokens
+
+MODEL = "gemini-2.0-flash"
+PROMPT = StaticPrompt("test", "[ROLE] 블로거")
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+
+    def create(self, model, config):
+        self.created.append(model)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+
+class FakeModels:
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.counted = 0
+
+    def count_tokens(self, model, contents):
+        self.counted += 1
+        return SimpleNamespace(total_tokens=self.tokens)
+
+
+class RecordingScheduler:
+    def __init__(self):
+        self.acquired = []
+
+    def acquire(self, model, priority=None, timeout=60.0):
+        self.acquired.append(model)
+
+    def penalize(self, model, delay):
+        pass
+
+
+def _client(tokens: int):
+    raw = SimpleNamespace(models=FakeModels(tokens), caches=FakeCaches())
+    scheduler = RecordingScheduler()
+    return raw, scheduler, PooledClient(raw, ModelStats(), scheduler)
+
+
+def test_small_prompt_is_sent_inline_without_create():
+    raw, _, client = _client(tokens=200)
+    cache = PrefixCache(GeminiCacheBackend())
+
+    for _ in range(3):
+        config = cache.config(client, MODEL, PROMPT)
+        assert config.system_instruction == PROMPT.text
+        assert config.cached_content is None
+
+    assert raw.caches.created == []
+    assert raw.models.counted == 1
+    assert cache.stats()["too_small"] == 1
+    assert cache.stats()["failures"] == 0
+
+
+def test_large_prompt_creates_cache_through_scheduler():
+    raw, scheduler, client = _client(tokens=min_cache_tokens(MODEL))
+    cache = PrefixCache(GeminiCacheBackend())
+
+    config = cache.config(client, MODEL, PROMPT)
+
+    assert config.cached_content == "cachedContents/1"
+    assert raw.caches.created == [MODEL]
+    # count_tokens + caches.create 모두 스케줄러 경유
+    assert scheduler.acquired == [MODEL, MODEL]
+
@@ -0,0 +1,61 @@
+"""
+부분 재작성 검증
+구간 재작성 호출이 검색 도구 없이 sections 출력 전용 고정 프롬프트로 한 번만 나가고,
+받은 블록이 대상 구간에만 병합되는지 확인한다
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import generation
+
+BLOCKS = [
+    {"type": "paragraph", "text": "안녕하세요."},
+    {"type": "heading", "text": "충전 습관", "level": 2},
+    {"type": "paragraph", "text": "80%까지만 충전하세요."},
+    {"type": "heading", "text": "마무리", "level": 2},
+    {"type": "paragraph", "text": "감사합니다."},
+]
+NEW_SECTION = [
+    {"type": "heading", "text": "똑똑한 충전 습관", "level": 2},
+    {"type": "paragraph", "text": "완속 충전을 기본으로 하고 급속 충전은 장거리 때만 사용하세요."},
+]
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, model, contents, config):
+        self.calls.append({"model": model, "contents": contents, "config": config})
+        return SimpleNamespace(
+            text=json.dumps({"sections": [{"target": 0, "blocks": NEW_SECTION}]}, ensure_ascii=False),
+            candidates=[]
+        )
+
+
+@pytest.fixture
+def client():
+    return SimpleNamespace(models=FakeModels())
+
+
+def test_section_rewrite_call_has_no_search_tool(client):
+    start, end = generation.section_range(BLOCKS, 1)
+    data = generation.regenerate_block_ranges(
+        client, generation.MODEL_NAME, {"topic": "전기차 배터리 관리"}, BLOCKS, [(start, end)]
+    )
+
+    (call,) = client.models.calls
+    assert not call["config"].tools
+    assert call["config"].system_instruction == generation.REGENERATE_STATIC_PROMPT.text
+    assert '"sections"' in call["config"].system_instruction
+    assert "blocks 배열에 10~20개" not in call["config"].system_instruction
+    assert data["blocks"] == BLOCKS[:1] + NEW_SECTION + BLOCKS[3:]
+    assert data["replaced"] == [{"start": 1, "end": 3, "count": 2}]
+    assert data["missing"] == []
+
+
+def test_regenerate_prompt_is_tool_less():
+    assert generation.REGENERATE_STATIC_PROMPT.tools is None
+    assert generation.WRITE_STATIC_PROMPT.tools
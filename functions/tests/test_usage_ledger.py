@@ -0,0 +1,112 @@
+"""
+사용량 장부 저장 시점 검증
+타이머/종료 훅 없이 record() 호출이 저장을 시작하되 느린 저장을 기다리지 않는지,
+저장 실패분이 다음 저장에 합산되는지 확인한다
+"""
+import threading
+import time
+
+from usage_ledger import MemoryUsageStore, UsageLedger, UsageOwner, usage_date
+
+OWNER = UsageOwner("u1", "write")
+
+
+class FailingStore(MemoryUsageStore):
+    def __init__(self):
+        super().__init__()
+        self.fail = True
+
+    def write(self, entries):
+        if self.fail:
+            raise RuntimeError("firestore unavailable")
+        super().write(entries)
+
+
+class SlowStore(MemoryUsageStore):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, entries):
+        self.release.wait(5)
+        super().write(entries)
+
+
+def _calls(store):
+    return sum(row["calls"] for row in store.query([usage_date()]))
+
+
+def test_record_flushes_after_interval():
+    store = MemoryUsageStore()
+    ledger = UsageLedger(store, flush_interval=0.05)
+    threads = threading.active_count()
+
+    ledger.record("m", owner=OWNER)
+    assert _calls(store) == 0
+    assert threading.active_count() == threads  # 백그라운드 타이머 없음
+
+    time.sleep(0.06)
+    ledger.record("m", owner=OWNER)
+    ledger.wait_for_flush(5)
+    assert _calls(store) == 2
+    assert ledger.stats()["pending"] == 0
+
+
+def test_record_does_not_block_on_slow_flush():
+    store = SlowStore()
+    ledger = UsageLedger(store, flush_interval=0)
+
+    started = time.monotonic()
+    for _ in range(3):
+        ledger.record("m", owner=OWNER)
+    assert time.monotonic() - started < 1.0
+    assert _calls(store) == 0
+
+    store.release.set()
+    ledger.wait_for_flush(5)
+    ledger.flush()
+    assert _calls(store) == 3
+    assert ledger.stats()["flushes"] >= 1
+
+
+def test_record_flushes_when_pending_entries_reach_threshold():
+    store = MemoryUsageStore()
+    ledger = UsageLedger(store, flush_interval=3600, max_pending=3)
+
+    for user in ("a", "b"):
+        ledger.record("m", owner=UsageOwner(user, "write"))
+    assert _calls(store) == 0
+
+    ledger.record("m", owner=UsageOwner("c", "write"))
+    ledger.wait_for_flush(5)
+    assert _calls(store) == 3
+
+
+def test_failed_flush_is_merged_into_next_flush():
+    store = FailingStore()
+    ledger = UsageLedger(store, flush_interval=0)
+
+    for _ in range(2):
+        ledger.record("m", owner=OWNER)
+        ledger.wait_for_flush(5)
+    assert ledger.stats()["failures"] == 2 and ledger.stats()["pending"] == 1
+
+    store.fail = False
+    ledger.record("m", owner=OWNER)
+    ledger.wait_for_flush(5)
+    assert _calls(store) == 3
+    assert ledger.stats()["pending"] == 0
+
+
+def test_concurrent_records_are_written_exactly_once():
+    store = MemoryUsageStore()
+    ledger = UsageLedger(store, flush_interval=0)
+
+    workers = [threading.Thread(target=lambda: [ledger.record("m", owner=OWNER) for _ in range(50)]) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    ledger.flush()
+
+    assert _calls(store) == 400
@@ -0,0 +1,87 @@
+"""
+write_batch 시간 제한 검증
+주제별 글 생성을 가짜 함수로 바꿔, 배치 예산 안에서만 대기 주제를 시작하고 마감을 넘긴 호출을
+기다리지 않으며, 마감 시각이 모델 호출의 HTTP 제한시간으로 전달되는지 확인한다
+"""
+import time
+
+import pytest
+from google.genai import types
+
+import generation
+import genai_pool
+from rate_limiter import DeadlineExceeded, call_deadline, remaining_call_time
+
+
+@pytest.fixture
+def fake_write(monkeypatch):
+    """주제의 "sleep"초만큼 걸리는 가짜 글 생성 (호출 시점의 남은 마감 시간 기록)"""
+    remaining = {}
+
+    def _generate(client, model_name, spec):
+        remaining[spec["topic"]] = remaining_call_time()
+        time.sleep(spec.get("sleep", 0.05))
+        return {"title": spec["topic"], "blocks": []}
+
+    monkeypatch.setattr(generation, "generate_write_data", _generate)
+    monkeypatch.setattr(generation, "BATCH_MIN_START", 0.1)
+    return remaining
+
+
+def _run(specs, concurrency=2, deadline=5.0, budget=5.0):
+    events = list(generation.iter_write_batch(None, "fake-model", specs, concurrency, deadline, budget))
+    return [e for e in events if e["event"] == "result"], events[-1]
+
+
+def test_queued_topics_are_skipped_when_budget_runs_out(fake_write, monkeypatch):
+    monkeypatch.setattr(generation, "BATCH_MIN_START", 0.25)
+    specs = [{"topic": f"t{i}", "sleep": 0.3} for i in range(6)]
+
+    started = time.monotonic()
+    results, done = _run(specs, concurrency=2, budget=0.75)
+
+    assert time.monotonic() - started < 1.0
+    assert done["succeeded"] == 4
+    assert done["skipped"] == 2 and done["failed"] == 2
+    skipped = sorted(r["index"] for r in results if r.get("skipped"))
+    assert skipped == [4, 5]
+    assert set(fake_write) == {"t0", "t1", "t2", "t3"}
+
+
+def test_call_deadline_is_bounded_by_topic_deadline_and_budget(fake_write):
+    _run([{"topic": "a"}], deadline=2.0, budget=10.0)
+    assert 1.5 < fake_write["a"] <= 2.0
+
+    _run([{"topic": "b"}], deadline=10.0, budget=2.0)
+    assert 1.5 < fake_write["b"] <= 2.0
+
+
+def test_overdue_topic_is_reported_without_waiting(fake_write):
+    started = time.monotonic()
+    results, done = _run([{"topic": "slow", "sleep": 1.0}, {"topic": "fast"}], deadline=0.2)
+
+    assert time.monotonic() - started < 0.6
+    by_topic = {r["topic"]: r for r in results}
+    assert by_topic["fast"]["success"]
+    assert not by_topic["slow"]["success"] and "제한시간" in by_topic["slow"]["error"]
+    assert done["succeeded"] == 1 and done["failed"] == 1 and done["skipped"] == 0
+
+
+def test_bounded_call_kwargs_sets_http_timeout():
+    assert genai_pool.bounded_call_kwargs("m", {"contents": "x"}) == {"contents": "x"}
+
+    token = call_deadline.set(time.monotonic() + 30)
+    try:
+        kwargs = genai_pool.bounded_call_kwargs("m", {"config": types.GenerateContentConfig(temperature=0.5)})
+        assert 29000 <= kwargs["config"].http_options.timeout <= 30000
+        assert kwargs["config"].temperature == 0.5
+        assert genai_pool.queue_timeout() <= 30
+    finally:
+        call_deadline.reset(token)
+
+    token = call_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            genai_pool.bounded_call_kwargs("m", {"contents": "x"})
+    finally:
+        call_deadline.reset(token)
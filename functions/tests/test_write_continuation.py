@@ -0,0 +1,117 @@
+"""
+짧은 글 분량 보충 검증
+데스크톱 앱이 쓰는 스트리밍 경로(submit 작업 / write_stream)에서도 보충 호출이 done 결과에 병합되고,
+보충 호출이 원래 글 작성과 같은 고정 프롬프트(캐시 자료로 썼으면 검색 도구 없는 쪽)를 쓰는지 확인한다
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import generation
+
+SHORT_POST = {
+    "title": "전기차 배터리 관리",
+    "blocks": [
+        {"type": "paragraph", "text": "안녕하세요."},
+        {"type": "heading", "text": "충전 습관", "level": 2},
+        {"type": "paragraph", "text": "80%까지만 충전하세요."},
+        {"type": "heading", "text": "마무리", "level": 2},
+        {"type": "paragraph", "text": "감사합니다."},
+    ],
+}
+EXTRA_BLOCKS = [
+    {"type": "heading", "text": "겨울철 관리", "level": 2},
+    {"type": "paragraph", "text": "겨울에는 배터리 효율이 떨어지므로 출발 전 예열 기능을 사용하고 실내 주차를 권장합니다. " * 40},
+]
+CACHED_CONTEXT = {
+    "date": "2026-10-17",
+    "queries": ["전기차 배터리 관리"],
+    "sources": [{"title": f"출처{i}", "uri": f"https://example.com/{i}"} for i in range(5)],
+    "evidence": [{"text": f"배터리 관리 사실 {i}", "sources": [f"출처{i}"]} for i in range(8)],
+}
+
+
+class FakeModels:
+    def __init__(self):
+        self.stream_calls = []
+        self.calls = []
+
+    def generate_content_stream(self, model, contents, config):
+        self.stream_calls.append({"model": model, "contents": contents, "config": config})
+        text = json.dumps(SHORT_POST, ensure_ascii=False)
+        for i in range(0, len(text), 40):
+            yield SimpleNamespace(text=text[i:i + 40], candidates=[])
+
+    def generate_content(self, model, contents, config):
+        self.calls.append({"model": model, "contents": contents, "config": config})
+        return SimpleNamespace(text=json.dumps({"blocks": EXTRA_BLOCKS}, ensure_ascii=False), candidates=[])
+
+
+@pytest.fixture
+def client():
+    return SimpleNamespace(models=FakeModels())
+
+
+@pytest.fixture
+def cached_grounding(monkeypatch):
+    monkeypatch.setattr(generation.grounding_cache, "fresh", lambda category, now=None: CACHED_CONTEXT)
+
+
+def _done(client, category="", target_chars=1500):
+    topic, full_prompt = generation.build_write_prompt({"topic": SHORT_POST["title"]})
+    events = list(generation.stream_write_events(
+        client, generation.MODEL_NAME, topic, full_prompt, category, target_chars=target_chars
+    ))
+    assert events[-1]["event"] == "done"
+    return events
+
+
+def test_stream_done_event_includes_continuation(client):
+    events = _done(client)
+    done = events[-1]
+
+    assert len(client.models.calls) == 1
+    assert done["continuation"]["initial_chars"] < done["continuation"]["chars"]
+    # 보충 섹션은 마무리 섹션 앞에 들어감
+    headings = [b["text"] for b in done["blocks"] if b["type"] == "heading"]
+    assert headings == ["충전 습관", "겨울철 관리", "마무리"]
+    assert "겨울철 관리" in done["content_text"]
+    # 스트리밍된 block 이벤트는 원래 블록만
+    assert len([e for e in events if e["event"] == "block"]) == len(SHORT_POST["blocks"])
+
+
+def test_stream_without_target_skips_continuation(client):
+    done = _done(client, target_chars=0)[-1]
+    assert not client.models.calls
+    assert "continuation" not in done
+
+
+def test_continuation_uses_cached_grounding_prompt(client, cached_grounding):
+    _done(client, category="전기차 라이프")
+
+    (stream_call,) = client.models.stream_calls
+    (continuation,) = client.models.calls
+    assert not stream_call["config"].tools
+    assert not continuation["config"].tools
+    assert continuation["config"].system_instruction == generation.WRITE_REFERENCE_STATIC_PROMPT.text
+    assert "[REFERENCE" in continuation["contents"]
+
+
+def test_continuation_uses_search_prompt_for_searched_write(client):
+    _done(client)
+
+    (continuation,) = client.models.calls
+    assert continuation["config"].system_instruction == generation.WRITE_STATIC_PROMPT.text
+
+
+def test_generation_job_applies_continuation(client, monkeypatch):
+    monkeypatch.setattr(generation, "get_genai_client", lambda key: client)
+    generation.job_store.create("job-continue", "write", {"topic": SHORT_POST["title"], "length": "보통 (1,500자)"})
+
+    generation.run_generation_job("job-continue")
+
+    job = generation.job_store.get("job-continue")
+    assert job["status"] == generation.JOB_DONE
+    assert len(job["blocks"]) == len(SHORT_POST["blocks"]) + len(EXTRA_BLOCKS)
+    assert "continuation" in job["result"]
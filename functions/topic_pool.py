@@ -0,0 +1,188 @@
+"""
+일별 주제 추천 풀
+매일 카테고리별로 여러 컨텍스트 슬롯(관점/콘텐츠 유형/계절 키워드 조합)의 추천 주제를 미리 생성해 두고,
+recommend 요청에는 풀에서 아직 보여주지 않은 주제를 무작위로 골라 바로 응답한다
+(풀이 없거나 남은 주제가 부족하면 호출자가 실시간 생성으로 전환)
+"""
+import hashlib
+import logging
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+
+from ttl_cache import TTLCache
+
+# 풀 날짜 기준 (스케줄러와 같은 한국 시간)
+KST = timezone(timedelta(hours=9))
+
+
+def pool_date(now: datetime = None) -> str:
+    """풀 날짜 키 (한국 시간 YYYY-MM-DD)"""
+    return (now or datetime.now(KST)).strftime("%Y-%m-%d")
+
+
+def pool_key(category: str, date: str) -> str:
+    """날짜 + 카테고리 문서 키"""
+    digest = hashlib.sha256(category.encode("utf-8")).hexdigest()[:12]
+    return f"{date}_{digest}"
+
+
+class TopicPoolStore:
+    """주제 풀 저장소 인터페이스"""
+
+    def get(self, key: str):
+        """저장된 풀 반환 (없거나 만료되면 None)"""
+        raise NotImplementedError
+
+    def put(self, key: str, pool: dict):
+        """풀 저장 (같은 키는 덮어씀)"""
+        raise NotImplementedError
+
+
+class MemoryTopicPoolStore(TopicPoolStore):
+    """인스턴스 메모리 저장소 (로컬/테스트용)"""
+
+    def __init__(self, max_size: int = 64, ttl: float = 2 * 24 * 3600):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def put(self, key: str, pool: dict):
+        self._cache.set(key, pool)
+
+
+class FirestoreTopicPoolStore(TopicPoolStore):
+    """
+    Firestore 저장소 (인스턴스 간 공유)
+    expires_at 필드에 Firestore TTL 정책을 걸면 지난 풀 문서가 자동 삭제된다
+    """
+
+    def __init__(self, db_getter, collection: str = "topic_pools", ttl: float = 3 * 24 * 3600):
+        """
+        Args:
+            db_getter: Firestore 클라이언트를 반환하는 함수 (lazy initialization)
+            collection: 컬렉션 이름
+            ttl: 풀 문서 보관 시간 (초)
+        """
+        self._db_getter = db_getter
+        self.collection = collection
+        self._ttl = ttl
+
+    def get(self, key: str):
+        try:
+            doc = self._db_getter().collection(self.collection).document(key).get()
+            return doc.to_dict() if doc.exists else None
+        except Exception as e:
+            logging.warning(f"Topic pool read failed ({key}): {e}")
+            return None
+
+    def put(self, key: str, pool: dict):
+        now = datetime.now(timezone.utc)
+        self._db_getter().collection(self.collection).document(key).set(
+            dict(pool, created_at=now, expires_at=now + timedelta(seconds=self._ttl))
+        )
+
+
+class TopicPool:
+    """
+    카테고리별 일일 주제 풀
+
+    풀 문서: {"date", "category", "context": {date, theme, season},
+             "entries": [{"topic", "trend_keywords", "perspective", "content_type"}]}
+    """
+
+    def __init__(self, store: TopicPoolStore, cache_ttl: float = 600, served_ttl: float = 24 * 3600):
+        """
+        Args:
+            store: 풀 저장소
+            cache_ttl: 인스턴스 메모리에 풀을 들고 있는 시간 (초, 저장소 조회 절약)
+            served_ttl: 요청자별로 이미 보여준 주제를 기억하는 시간 (초)
+        """
+        self.store = store
+        self._cache = TTLCache(max_size=64, ttl=cache_ttl)
+        self._served = TTLCache(max_size=4096, ttl=served_ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.exhausted = 0
+
+    def get(self, category: str, date: str = None):
+        """오늘(또는 date) 풀 (없으면 None, 없는 경우도 잠시 캐시하여 저장소 조회 반복 방지)"""
+        key = pool_key(category, date or pool_date())
+        pool = self._cache.get(key)
+        if pool is None:
+            pool = self.store.get(key) or {}
+            self._cache.set(key, pool, ttl=None if pool else 60)
+        return pool or None
+
+    def save(self, category: str, entries: list, context: dict = None, date: str = None) -> dict:
+        """생성한 주제로 풀 저장 (같은 날짜/카테고리 풀은 교체)"""
+        date = date or pool_date()
+        pool = {"date": date, "category": category, "context": context or {}, "entries": entries}
+        key = pool_key(category, date)
+        self.store.put(key, pool)
+        self._cache.set(key, pool)
+        return pool
+
+    def sample(self, category: str, count: int, exclude=(), requester: str = None, date: str = None):
+        """
+        풀에서 요청자에게 아직 보여주지 않은 주제 count개를 무작위로 선택
+
+        Args:
+            exclude: 클라이언트가 이미 받은 주제 (인스턴스가 달라도 중복 방지)
+            requester: 요청자 식별자 (uid 등, 같은 인스턴스에서 보여준 주제 기억)
+
+        Returns:
+            {"topics", "trend_keywords", "context"} 또는 None (풀 없음/남은 주제 부족)
+        """
+        pool = self.get(category, date)
+        if not pool or not pool.get("entries"):
+            self.misses += 1
+            return None
+
+        served_key = f"{requester}:{pool_key(category, pool['date'])}" if requester else None
+        with self._lock:
+            seen = set(exclude or ())
+            if served_key:
+                seen |= self._served.get(served_key, set())
+            candidates = [entry for entry in pool["entries"] if entry["topic"] not in seen]
+            if len(candidates) < count:
+                self.exhausted += 1
+                return None
+            picked = random.sample(candidates, count)
+            if served_key:
+                self._served.set(served_key, seen | {entry["topic"] for entry in picked})
+        self.hits += 1
+
+        trend_keywords = []
+        for entry in picked:
+            for keyword in entry.get("trend_keywords", []):
+                if keyword not in trend_keywords:
+                    trend_keywords.append(keyword)
+        return {
+            "topics": [entry["topic"] for entry in picked],
+            "trend_keywords": trend_keywords[:5],
+            "context": dict(pool.get("context", {}), perspective=picked[0].get("perspective", "")),
+        }
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "exhausted": self.exhausted}
+
+
+def create_topic_pool(backend: str, db_getter):
+    """
+    설정값으로 주제 풀 생성
+
+    Args:
+        backend: "firestore" (인스턴스 간 공유), "memory" (인스턴스 메모리, 로컬/테스트용), "off" (사용 안 함)
+        db_getter: Firestore 클라이언트를 반환하는 함수
+
+    Returns:
+        TopicPool 또는 None ("off")
+    """
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return TopicPool(MemoryTopicPoolStore())
+    return TopicPool(FirestoreTopicPoolStore(db_getter))
@@ -0,0 +1,166 @@
+"""
+요청 단위 경량 트레이싱
+요청마다 trace를 시작하고 단계별 span(토큰 검증, Firestore, 모델 호출, JSON 추출 등)의 소요 시간을 기록한다.
+요청이 끝나면 span을 구조화된 JSON 로그로 남기고 Server-Timing 응답 헤더로 요약한다
+"""
+import contextvars
+import functools
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# 현재 요청의 trace (스레드 풀로 넘길 때는 컨텍스트 복사로 같은 trace에 기록)
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """요청 1건의 span 기록 (스레드 안전)"""
+
+    def __init__(self, name: str, trace_id: str = None, **attrs):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started: float, duration: float, error: str = None, **attrs):
+        span = {
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+        }
+        if error:
+            span["error"] = error
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        """이름별 누적 시간/횟수 (동시 실행 span은 겹쳐서 합산됨)"""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                item = totals.setdefault(span["name"], {"duration_ms": 0.0, "count": 0})
+                item["duration_ms"] += span["duration_ms"]
+                item["count"] += 1
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (이름별 합계 + 전체)"""
+        entries = []
+        for name, item in self.summary().items():
+            desc = f';desc="x{item["count"]}"' if item["count"] > 1 else ""
+            entries.append(f"{_metric_name(name)};dur={item['duration_ms']:.1f}{desc}")
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def emit(self, **fields):
+        """span 목록을 구조화된 JSON 로그 한 줄로 출력"""
+        with self._lock:
+            spans = list(self.spans)
+        _write_log({
+            "severity": "INFO",
+            "message": f"trace {self.name} {self.trace_id}",
+            "trace_id": self.trace_id,
+            "trace": self.name,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            **self.attrs,
+            **fields,
+            "spans": spans,
+        })
+
+
+def _metric_name(name: str) -> str:
+    """Server-Timing 메트릭 이름 (token 문자만 허용)"""
+    return re.sub(r"[^A-Za-z0-9_.\-]", "_", name)
+
+
+def _write_log(entry: dict):
+    # Cloud Functions/Cloud Run은 stdout의 JSON 한 줄을 구조화 로그(jsonPayload)로 수집
+    sys.stdout.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def start_trace(name: str, **attrs) -> tuple:
+    """
+    현재 컨텍스트에 새 trace 설정
+
+    Returns:
+        (Trace, 복원용 토큰) - 끝나면 end_trace(token)
+    """
+    trace = Trace(name, **attrs)
+    return trace, current_trace.set(trace)
+
+
+def end_trace(token):
+    current_trace.reset(token)
+
+
+def annotate(**attrs):
+    """현재 trace의 로그 필드 추가 (mode 등)"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def _cloud_trace_id(req):
+    """X-Cloud-Trace-Context 헤더의 trace ID (없으면 None → 새로 발급)"""
+    header = req.headers.get("X-Cloud-Trace-Context", "")
+    return header.split("/", 1)[0] or None
+
+
+def traced_request(name: str):
+    """
+    HTTP 함수용 데코레이터: 요청마다 trace를 시작하고
+    응답에 Server-Timing 헤더를 붙인 뒤 span 로그를 출력한다
+    (스트리밍 응답은 헤더를 보낸 이후의 구간이 포함되지 않음)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(req):
+            trace, token = start_trace(name, trace_id=_cloud_trace_id(req))
+            try:
+                response = func(req)
+            except Exception as e:
+                trace.emit(error=type(e).__name__)
+                raise
+            finally:
+                end_trace(token)
+            response.headers["Server-Timing"] = trace.server_timing()
+            trace.emit(status=response.status_code)
+            return response
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """현재 trace에 구간 기록 (trace가 없으면 아무것도 하지 않음)"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        trace.add(name, started, time.perf_counter() - started, error=type(e).__name__, **attrs)
+        raise
+    trace.add(name, started, time.perf_counter() - started, **attrs)
+
+
+def traced(name: str):
+    """함수 실행 전체를 span으로 기록하는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+"""
+인스턴스 메모리 TTL 캐시
+크기 제한(LRU 방출)과 항목별 만료 시각을 가진 스레드 안전 캐시
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """크기 제한 LRU + 항목별 만료 캐시 (hit/miss 통계 포함)"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0, sweep_interval: float = 60.0):
+        """
+        Args:
+            max_size: 최대 항목 수 (초과 시 가장 오래 사용하지 않은 항목부터 방출)
+            ttl: 기본 유효시간 (초)
+            sweep_interval: 만료 항목 일괄 정리 주기 (초)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key, default=None):
+        """값 조회 (없거나 만료되면 default)"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= now:
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None, expires_at: float = None):
+        """
+        값 저장
+
+        Args:
+            ttl: 이 항목의 유효시간 (초, 기본값은 캐시 ttl)
+            expires_at: 절대 만료 시각 (epoch 초, 지정 시 ttl보다 우선)
+        """
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + (self.ttl if ttl is None else ttl)
+        if expires_at <= now:
+            return
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep_locked(now)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def sweep(self) -> int:
+        """만료된 항목 일괄 제거, 제거한 개수 반환"""
+        with self._lock:
+            return self._sweep_locked(time.time())
+
+    def _sweep_locked(self, now: float) -> int:
+        self._last_sweep = now
+        expired_keys = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired_keys:
+            del self._data[key]
+        self.expired += len(expired_keys)
+        return len(expired_keys)
+
+    def stats(self) -> dict:
+        """캐시 통계"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,352 @@
+"""
+토큰/비용 사용량 장부
+모든 모델 호출의 usage_metadata(입력/출력/전체/캐시 토큰)와 Grounding(Google Search) 호출 수를
+(날짜, 사용자, 모드)별로 인스턴스 메모리에 모았다가 일정 간격으로 한 번에 저장한다
+(요청마다 Firestore에 쓰지 않고 Increment 배치 쓰기로 합산)
+Cloud Functions는 요청 사이에 CPU를 거의 주지 않고 SIGTERM으로 종료하므로(atexit 미실행)
+타이머/종료 훅 없이 기록하는 요청이 저장을 시작한다. 쓰기는 요청 처리 중에 짧은 스레드에서 실행해
+모델 호출을 마친 요청 스레드가 기다리지 않게 하고, 요청 사이에 멈춘 쓰기는 다음 요청 때 이어진다
+"""
+import contextvars
+import hashlib
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from topic_pool import KST
+
+# 사용량 귀속 대상 (요청 진입점에서 설정, 스레드 풀로 넘길 때는 컨텍스트 복사로 유지)
+UsageOwner = namedtuple("UsageOwner", ["user", "mode"])
+ANONYMOUS = "anonymous"
+usage_owner = contextvars.ContextVar("usage_owner", default=UsageOwner(ANONYMOUS, "unknown"))
+
+# 합산하는 카운터 필드
+COUNTER_FIELDS = (
+    "calls", "errors", "latency_ms",
+    "prompt_tokens", "candidate_tokens", "cached_tokens", "total_tokens",
+    "grounding_calls",
+)
+
+
+def usage_date(now: datetime = None) -> str:
+    """장부 날짜 키 (한국 시간 YYYY-MM-DD)"""
+    return (now or datetime.now(KST)).strftime("%Y-%m-%d")
+
+
+def ledger_key(date: str, user: str, mode: str) -> str:
+    """날짜 + 사용자 + 모드 문서 키"""
+    digest = hashlib.sha256(f"{user}:{mode}".encode("utf-8")).hexdigest()[:16]
+    return f"{date}_{digest}"
+
+
+def uses_grounding(config) -> bool:
+    """생성 설정에 Google Search 도구가 포함되어 있는지"""
+    for tool in getattr(config, "tools", None) or []:
+        if getattr(tool, "google_search", None) is not None:
+            return True
+    return False
+
+
+def grounding_call_count(config, response) -> int:
+    """
+    Grounding 과금 호출 수 (검색 도구를 켠 요청 중 실제로 검색 결과가 붙은 응답만 1건)
+    """
+    if response is None or not uses_grounding(config):
+        return 0
+    for candidate in getattr(response, "candidates", None) or []:
+        metadata = getattr(candidate, "grounding_metadata", None)
+        if metadata is not None and (
+            getattr(metadata, "web_search_queries", None) or getattr(metadata, "grounding_chunks", None)
+        ):
+            return 1
+    return 0
+
+
+def usage_counters(usage=None, grounding_calls: int = 0, latency: float = 0.0, error: bool = False) -> dict:
+    """usage_metadata 1건을 카운터 dict로 변환"""
+    return {
+        "calls": 1,
+        "errors": 1 if error else 0,
+        "latency_ms": round(latency * 1000),
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "candidate_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        "total_tokens": getattr(usage, "total_token_count", 0) or 0,
+        "grounding_calls": grounding_calls,
+    }
+
+
+def _merge(target: dict, counters: dict):
+    for field, value in counters.items():
+        target[field] = target.get(field, 0) + value
+
+
+class UsageStore:
+    """장부 저장소 인터페이스"""
+
+    def write(self, entries: list):
+        """
+        합산분 저장 (기존 값에 더함)
+
+        Args:
+            entries: [{"date", "user", "mode", "counters", "models": {모델: counters}}]
+        """
+        raise NotImplementedError
+
+    def query(self, dates: list, user: str = None) -> list:
+        """해당 날짜(와 사용자)의 장부 문서 목록"""
+        raise NotImplementedError
+
+
+class MemoryUsageStore(UsageStore):
+    """인스턴스 메모리 저장소 (로컬/테스트용)"""
+
+    def __init__(self):
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def write(self, entries: list):
+        with self._lock:
+            for entry in entries:
+                key = ledger_key(entry["date"], entry["user"], entry["mode"])
+                doc = self._docs.setdefault(key, {
+                    "date": entry["date"], "user": entry["user"], "mode": entry["mode"], "models": {}
+                })
+                _merge(doc, entry["counters"])
+                for model, counters in entry["models"].items():
+                    _merge(doc["models"].setdefault(model, {}), counters)
+
+    def query(self, dates: list, user: str = None) -> list:
+        with self._lock:
+            return [
+                dict(doc, models={model: dict(counters) for model, counters in doc["models"].items()})
+                for doc in self._docs.values()
+                if doc["date"] in dates and (user is None or doc["user"] == user)
+            ]
+
+
+class FirestoreUsageStore(UsageStore):
+    """
+    Firestore 저장소 (인스턴스 간 공유)
+    문서 1개 = (날짜, 사용자, 모드), 모델별 세부 값은 models 맵에 합산
+    """
+
+    # 배치 쓰기 1회 최대 문서 수 (Firestore 한도 500)
+    BATCH_SIZE = 400
+
+    def __init__(self, db_getter, collection: str = "usage_ledger"):
+        """
+        Args:
+            db_getter: Firestore 클라이언트를 반환하는 함수 (lazy initialization)
+            collection: 컬렉션 이름
+        """
+        self._db_getter = db_getter
+        self.collection = collection
+
+    def write(self, entries: list):
+        from firebase_admin import firestore
+
+        db = self._db_getter()
+        collection = db.collection(self.collection)
+        for start in range(0, len(entries), self.BATCH_SIZE):
+            batch = db.batch()
+            for entry in entries[start:start + self.BATCH_SIZE]:
+                doc = {
+                    "date": entry["date"],
+                    "user": entry["user"],
+                    "mode": entry["mode"],
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                    "models": {
+                        model: {field: firestore.Increment(value) for field, value in counters.items()}
+                        for model, counters in entry["models"].items()
+                    },
+                }
+                doc.update({field: firestore.Increment(value) for field, value in entry["counters"].items()})
+                batch.set(collection.document(ledger_key(entry["date"], entry["user"], entry["mode"])), doc, merge=True)
+            batch.commit()
+
+    def query(self, dates: list, user: str = None) -> list:
+        collection = self._db_getter().collection(self.collection)
+        docs = []
+        # in 조건은 최대 30개 값
+        for start in range(0, len(dates), 30):
+            query = collection.where("date", "in", dates[start:start + 30])
+            if user is not None:
+                query = query.where("user", "==", user)
+            docs.extend(doc.to_dict() for doc in query.stream())
+        return docs
+
+
+class UsageLedger:
+    """
+    사용량 장부 (요청 경로 배치 저장)
+
+    record()는 메모리에 합산하고, 가장 오래된 미저장분이 flush_interval초를 넘었거나
+    미저장 항목이 max_pending개에 도달하면 그 record() 호출이 한 번의 배치 쓰기를 시작한다.
+    쓰기는 짧은 스레드에서 실행하므로 모델 호출을 마친 요청 스레드는 Firestore 쓰기를 기다리지 않는다
+    (이미 저장 중이면 새로 시작하지 않음).
+    주기 타이머나 종료 훅에 기대지 않으므로, 저장되지 않고 사라질 수 있는 것은
+    마지막 저장 뒤에 합산했고 다음 기록이 오기 전에 인스턴스가 종료된 분량뿐이다
+    (flush_interval을 줄이면 그만큼 줄어든다)
+    """
+
+    def __init__(self, store: UsageStore, flush_interval: float = 30.0, max_pending: int = 200):
+        """
+        Args:
+            store: 장부 저장소
+            flush_interval: 가장 오래된 미저장분의 최대 보관 시간 (초, 지난 뒤의 첫 기록에서 저장)
+            max_pending: 즉시 저장하는 미저장 (날짜, 사용자, 모드) 항목 수
+        """
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._pending_since = None  # 가장 오래된 미저장분 기록 시각 (time.monotonic)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None  # 마지막으로 시작한 저장 스레드
+        self._stats = {"recorded": 0, "flushes": 0, "written": 0, "failures": 0}
+
+    def record(self, model: str, usage=None, grounding_calls: int = 0, latency: float = 0.0,
+               error: bool = False, owner: UsageOwner = None, now: datetime = None):
+        """모델 호출 1건을 현재 요청의 사용자/모드로 합산 (저장할 때가 되면 기다리지 않고 저장 시작)"""
+        owner = owner or usage_owner.get()
+        counters = usage_counters(usage, grounding_calls, latency, error)
+        key = (usage_date(now), owner.user, owner.mode)
+        with self._lock:
+            entry = self._pending.setdefault(key, {"counters": {}, "models": {}})
+            _merge(entry["counters"], counters)
+            _merge(entry["models"].setdefault(model, {}), counters)
+            self._stats["recorded"] += 1
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            flush_now = (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._pending_since >= self.flush_interval
+            )
+        if flush_now:
+            # 다른 요청이 이미 저장 중이면 다음 기록에서 저장
+            self.flush_in_background()
+
+    def flush_in_background(self) -> bool:
+        """저장 중이 아니면 짧은 스레드에서 저장 시작 (호출자는 기다리지 않음, 시작했으면 True)"""
+        if not self._flush_lock.acquire(blocking=False):
+            return False
+
+        def _run():
+            try:
+                self._flush_locked()
+            finally:
+                self._flush_lock.release()
+
+        self._flusher = threading.Thread(target=_run, name="usage-ledger-flush", daemon=True)
+        self._flusher.start()
+        return True
+
+    def wait_for_flush(self, timeout: float = None):
+        """진행 중인 백그라운드 저장이 끝날 때까지 대기"""
+        flusher = self._flusher
+        if flusher is not None:
+            flusher.join(timeout)
+
+    def flush(self, blocking: bool = True) -> int:
+        """
+        미저장분을 배치로 저장 (실패하면 다음 저장 때 다시 합산)
+
+        Args:
+            blocking: False면 다른 저장이 진행 중일 때 기다리지 않고 0 반환
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return 0
+        try:
+            return self._flush_locked()
+        finally:
+            self._flush_lock.release()
+
+    def _flush_locked(self) -> int:
+        """_flush_lock을 잡은 상태에서 미저장분 저장"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_since = None
+        if not pending:
+            return 0
+        entries = [
+            {"date": date, "user": user, "mode": mode, **entry}
+            for (date, user, mode), entry in pending.items()
+        ]
+        started = time.monotonic()
+        try:
+            self.store.write(entries)
+        except Exception as e:
+            logging.warning(f"Usage ledger flush failed ({len(entries)} entries): {e}")
+            with self._lock:
+                self._stats["failures"] += 1
+                self._pending_since = self._pending_since or time.monotonic()
+                for key, entry in pending.items():
+                    target = self._pending.setdefault(key, {"counters": {}, "models": {}})
+                    _merge(target["counters"], entry["counters"])
+                    for model, counters in entry["models"].items():
+                        _merge(target["models"].setdefault(model, {}), counters)
+            return 0
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["written"] += len(entries)
+        logging.info(f"Usage ledger flushed {len(entries)} entries in {time.monotonic() - started:.2f}s")
+        return len(entries)
+
+    def report(self, dates: list, user: str = None) -> dict:
+        """
+        기간 사용량 집계 (이 인스턴스의 미저장분은 먼저 저장)
+
+        Returns:
+            {"dates", "totals", "by_mode", "by_user", "by_model", "rows"}
+        """
+        self.flush()
+        rows = self.store.query(dates, user)
+        totals, by_mode, by_user, by_model = {}, {}, {}, {}
+        for row in rows:
+            counters = {field: row.get(field, 0) for field in COUNTER_FIELDS}
+            _merge(totals, counters)
+            _merge(by_mode.setdefault(row["mode"], {}), counters)
+            _merge(by_user.setdefault(row["user"], {}), counters)
+            for model, model_counters in (row.get("models") or {}).items():
+                _merge(by_model.setdefault(model, {}), model_counters)
+        for group in (by_mode, by_user, by_model):
+            for counters in group.values():
+                counters["avg_latency_ms"] = round(counters.get("latency_ms", 0) / counters["calls"]) if counters.get("calls") else 0
+        return {
+            "dates": dates,
+            "totals": totals,
+            "by_mode": by_mode,
+            "by_user": by_user,
+            "by_model": by_model,
+            "rows": sorted(
+                ({key: row.get(key) for key in ("date", "user", "mode", *COUNTER_FIELDS)} for row in rows),
+                key=lambda row: row.get("total_tokens") or 0,
+                reverse=True
+            ),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
+
+
+def create_usage_ledger(backend: str, db_getter, flush_interval: float = 30.0):
+    """
+    설정값으로 사용량 장부 생성
+
+    Args:
+        backend: "firestore" (인스턴스 간 공유), "memory" (인스턴스 메모리, 로컬/테스트용), "off" (기록 안 함)
+        db_getter: Firestore 클라이언트를 반환하는 함수
+        flush_interval: 가장 오래된 미저장분을 이 시간(초)이 지난 뒤의 첫 기록에서 저장
+
+    Returns:
+        UsageLedger 또는 None ("off")
+    """
+    if backend == "off":
+        return None
+    store = MemoryUsageStore() if backend == "memory" else FirestoreUsageStore(db_getter)
+    return UsageLedger(store, flush_interval=flush_interval)
@@ -0,0 +1,163 @@
+"""
+주제 → 영어 시각적 설명 캐시
+generate_image의 1단계(텍스트 모델 변환) 결과를 재사용하여
+재생성/반복 주제는 이미지 모델 호출만 하도록 한다
+"""
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from datetime import datetime, timedelta, timezone
+
+from ttl_cache import TTLCache
+
+
+def normalize_topic(topic: str) -> str:
+    """캐시 키용 주제 정규화 (유니코드 NFC, 소문자, 문장부호/공백 통일)"""
+    text = unicodedata.normalize("NFC", topic or "").lower()
+    text = re.sub(r"[\"'`“”‘’!?.,:;~…·()\[\]{}<>「」『』【】]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def topic_cache_key(topic: str) -> str:
+    """정규화된 주제의 해시 키"""
+    return hashlib.sha256(normalize_topic(topic).encode("utf-8")).hexdigest()
+
+
+class VisualDescriptionStore:
+    """시각적 설명 저장소 인터페이스"""
+
+    def get(self, key: str):
+        """저장된 설명 반환 (없거나 만료되면 None)"""
+        raise NotImplementedError
+
+    def set(self, key: str, topic: str, description: str):
+        """설명 저장"""
+        raise NotImplementedError
+
+
+class MemoryVisualDescriptionStore(VisualDescriptionStore):
+    """인스턴스 메모리 저장소 (크기 제한 LRU + TTL)"""
+
+    def __init__(self, max_size: int = 512, ttl: float = 7 * 24 * 3600):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, topic: str, description: str):
+        self._cache.set(key, description)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class FirestoreVisualDescriptionStore(VisualDescriptionStore):
+    """
+    Firestore 저장소 (인스턴스 간 공유)
+    expires_at 필드에 Firestore TTL 정책을 걸면 만료 문서가 자동 삭제된다
+    """
+
+    def __init__(self, db_getter, collection: str = "visual_descriptions", ttl: float = 30 * 24 * 3600):
+        """
+        Args:
+            db_getter: Firestore 클라이언트를 반환하는 함수 (lazy initialization)
+            collection: 컬렉션 이름
+            ttl: 유효시간 (초)
+        """
+        self._db_getter = db_getter
+        self._collection = collection
+        self._ttl = ttl
+
+    def get(self, key: str):
+        try:
+            doc = self._db_getter().collection(self._collection).document(key).get()
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            expires_at = data.get("expires_at")
+            if expires_at and expires_at <= datetime.now(timezone.utc):
+                return None
+            return data.get("description")
+        except Exception as e:
+            logging.warning(f"Visual description cache read failed: {e}")
+            return None
+
+    def set(self, key: str, topic: str, description: str):
+        try:
+            now = datetime.now(timezone.utc)
+            self._db_getter().collection(self._collection).document(key).set({
+                "topic": topic,
+                "description": description,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self._ttl)
+            })
+        except Exception as e:
+            logging.warning(f"Visual description cache write failed: {e}")
+
+
+class TieredVisualDescriptionStore(VisualDescriptionStore):
+    """메모리 → Firestore 순으로 조회하고, Firestore 적중 시 메모리에 채워 넣는 저장소"""
+
+    def __init__(self, memory: MemoryVisualDescriptionStore, persistent: VisualDescriptionStore):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str):
+        description = self.memory.get(key)
+        if description is None:
+            description = self.persistent.get(key)
+            if description is not None:
+                self.memory.set(key, "", description)
+        return description
+
+    def set(self, key: str, topic: str, description: str):
+        self.memory.set(key, topic, description)
+        self.persistent.set(key, topic, description)
+
+
+class VisualDescriptionCache:
+    """주제 문자열 기준 시각적 설명 캐시 (저장소 교체 가능)"""
+
+    def __init__(self, store: VisualDescriptionStore):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, topic: str):
+        started = time.monotonic()
+        description = self.store.get(topic_cache_key(topic))
+        if description is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logging.info(f"Visual description cache hit for '{topic}' ({(time.monotonic() - started) * 1000:.0f}ms)")
+        return description
+
+    def set(self, topic: str, description: str):
+        self.store.set(topic_cache_key(topic), topic, description)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_visual_description_cache(backend: str, db_getter) -> VisualDescriptionCache:
+    """
+    설정값으로 캐시 생성
+
+    Args:
+        backend: "memory" (인스턴스 메모리만) 또는 "firestore" (메모리 + Firestore)
+        db_getter: Firestore 클라이언트를 반환하는 함수
+    """
+    memory = MemoryVisualDescriptionStore()
+    if backend == "memory":
+        return VisualDescriptionCache(memory)
+    return VisualDescriptionCache(
+        TieredVisualDescriptionStore(memory, FirestoreVisualDescriptionStore(db_getter))
+    )
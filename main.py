@@ -176,11 +176,11 @@ def run_gui():
                 return False
             
             try:
-                import requests
+                from core.api_client import get_session
                 
                 headers = {"Authorization": f"Bearer {self.id_token}"}
-                response = requests.post(
-                    Config.BACKEND_URL,
+                response = get_session().post(
+                    Config.ACCOUNT_URL,
                     json={"mode": "user_info"},
                     headers=headers,
                     timeout=30
@@ -279,6 +279,7 @@ def run_gui():
             self.worker = AutomationWorker(data, settings_dict)
             self.worker.log_signal.connect(self.update_log)
             self.worker.result_signal.connect(self.on_worker_result)
+            self.worker.partial_result_signal.connect(self.on_worker_partial_result)
             self.worker.error_signal.connect(self.on_worker_error)
             self.worker.start()
 
@@ -291,6 +292,11 @@ def run_gui():
             elif current_tab == 1:  # 출고 후기
                 self.tab_delivery.update_result_view(result)
 
+        def on_worker_partial_result(self, result):
+            """워커 스트리밍 중간 결과 처리"""
+            if self.tabs.currentIndex() == 0:  # 정보성 글쓰기
+                self.tab_info.update_result_view(result, partial=True)
+
         def on_worker_error(self, error_msg):
             """워커 에러 처리"""
             self.update_log(f"❌ {error_msg}")
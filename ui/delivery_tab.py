@@ -19,6 +19,8 @@ from PySide6.QtGui import QPixmap, QImage
 
 import requests
 
+from core.api_client import post_json
+
 BACKEND_URL = "https://generate-blog-post-yahp6ia25q-du.a.run.app"
 
 
@@ -122,7 +124,7 @@ class DeliveryPostWorker(QThread):
                 "style_options": {}
             }
             
-            response = requests.post(BACKEND_URL, json=payload, timeout=180)
+            response = post_json(payload, timeout=180, retries=1, url=BACKEND_URL)
             
             if response.status_code == 200:
                 result = response.json()
@@ -2,7 +2,6 @@
 정보성 글쓰기 탭 - 블로그 포스팅 자동 생성 기능
 v3.5.1: 썸네일을 세부설정에 통합, 재생성 2회 제한
 """
-import requests
 import re
 import base64
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QFormLayout, 
@@ -13,8 +12,14 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QFo
 from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QPixmap, QImage
 
+from core.api_client import post_json, log_server_timing, get_session
+from core.content_converter import ContentConverter
+
 BACKEND_URL = "https://generate-blog-post-yahp6ia25q-du.a.run.app"
 
+# 재추천 시 서버에 보내는 이미 받은 주제 최대 개수
+RECOMMEND_EXCLUDE_LIMIT = 50
+
 
 class AnalysisWorker(QThread):
     """주제 분석 워커 스레드"""
@@ -27,7 +32,8 @@ class AnalysisWorker(QThread):
 
     def run(self):
         try:
-            response = requests.post(BACKEND_URL, json={"mode": "analyze", "topic": self.topic}, timeout=60)
+            response = get_session().post(BACKEND_URL, json={"mode": "analyze", "topic": self.topic}, timeout=60)
+            log_server_timing(response, "analyze")
             if response.status_code == 200:
                 self.finished.emit(response.json())
             else:
@@ -41,13 +47,17 @@ class RecommendWorker(QThread):
     finished = Signal(list)
     error = Signal(str)
 
-    def __init__(self, category):
+    def __init__(self, category, exclude=None):
         super().__init__()
         self.category = category
+        self.exclude = exclude or []
 
     def run(self):
         try:
-            response = requests.post(BACKEND_URL, json={"mode": "recommend", "category": self.category}, timeout=60)
+            # 이미 받은 주제를 보내서 서버 주제 풀에서 중복 없이 받음
+            payload = {"mode": "recommend", "category": self.category, "exclude": self.exclude}
+            response = get_session().post(BACKEND_URL, json=payload, timeout=60)
+            log_server_timing(response, "recommend")
             if response.status_code == 200:
                 result = response.json()
                 self.finished.emit(result.get("topics", []))
@@ -58,7 +68,7 @@ class RecommendWorker(QThread):
 
 
 class ImageGenerateWorker(QThread):
-    """이미지 생성 워커 스레드 (썸네일만)"""
+    """이미지 생성 워커 스레드 (썸네일만, 이미지 바이트 목록을 전달)"""
     finished = Signal(list)
     error = Signal(str)
     
@@ -71,23 +81,29 @@ class ImageGenerateWorker(QThread):
         try:
             headers = {"Authorization": f"Bearer {self.auth_token}"}
             
+            # 서버에서 네이버 본문 폭(960px) JPEG로 줄여 바이너리로 수신
             payload = {
                 "mode": "generate_image",
                 "prompt": self.prompt,
-                "style": "블로그 대표 썸네일, 텍스트 없이, 주제를 잘 나타내는 시각적 이미지"
+                "style": "블로그 대표 썸네일, 텍스트 없이, 주제를 잘 나타내는 시각적 이미지",
+                "format": "binary",
+                "max_width": 960,
+                "image_format": "jpeg",
+                "quality": 85
             }
             
-            response = requests.post(
-                BACKEND_URL, 
-                json=payload, 
-                headers=headers,
-                timeout=120
-            )
+            # 시간 초과 재시도 시 같은 멱등 키로 보내 이중 생성/이중 차감 방지
+            response = post_json(payload, headers=headers, timeout=120, url=BACKEND_URL)
             
             if response.status_code == 200:
+                if response.headers.get("Content-Type", "").startswith("image/"):
+                    self.finished.emit([response.content])
+                    return
+                
+                # 구버전 서버: JSON + base64 (디코딩은 워커 스레드에서)
                 data = response.json()
                 if data.get("success") and data.get("image_base64"):
-                    self.finished.emit([data["image_base64"]])
+                    self.finished.emit([base64.b64decode(data["image_base64"])])
                 else:
                     self.error.emit("이미지 생성에 실패했습니다.")
             elif response.status_code == 403:
@@ -99,6 +115,30 @@ class ImageGenerateWorker(QThread):
             self.error.emit(f"이미지 생성 오류: {str(e)}")
 
 
+class RegenerateBlocksWorker(QThread):
+    """섹션 다시 쓰기 워커 스레드 (선택한 구간만 서버에서 다시 생성)"""
+    finished = Signal(dict)
+    error = Signal(str)
+    
+    def __init__(self, payload: dict):
+        super().__init__()
+        self.payload = payload
+    
+    def run(self):
+        try:
+            response = post_json(dict(self.payload, mode="regenerate_blocks"), timeout=120, url=BACKEND_URL)
+            if response.status_code == 200:
+                self.finished.emit(response.json())
+            else:
+                try:
+                    message = response.json().get("error", response.text)
+                except ValueError:
+                    message = response.text
+                self.error.emit(f"섹션 다시 쓰기 실패 ({response.status_code}): {message}")
+        except Exception as e:
+            self.error.emit(f"통신 오류: {str(e)}")
+
+
 class InfoTab(QWidget):
     """정보성 글쓰기 탭"""
     start_signal = Signal(dict) 
@@ -108,6 +148,7 @@ class InfoTab(QWidget):
         super().__init__()
         self.writing_settings_tab = writing_settings_tab  # 글쓰기 환경설정 탭 참조
         self.recommend_worker = None
+        self.recommended_topics = {}  # 카테고리별 이미 추천받은 주제 (재추천 시 제외)
         self.keyword_recommend_worker = None
         self.analysis_worker = None
         self.thumbnail_worker = None
@@ -115,6 +156,11 @@ class InfoTab(QWidget):
         self.auth_token = ""
         self.generated_content = ""
         self.generated_title = ""
+        self.generated_display = ""  # 결과 뷰어에 표시한 원문 (수정 여부 확인용)
+        self.content_converter = ContentConverter()
+        self.generated_blocks = []  # 섹션 다시 쓰기용 현재 글 블록
+        self.generated_request = {}  # 섹션 다시 쓰기에 함께 보내는 주제/말투
+        self.regenerate_worker = None
         
         # 썸네일 재생성 횟수 추적 (주제별)
         self.current_topic_for_thumbnail = ""
@@ -366,6 +412,21 @@ class InfoTab(QWidget):
         self.view_text.setPlaceholderText("생성된 TEXT 형식 결과가 여기에 표시됩니다.")
         self.view_text.setMinimumHeight(350)
         layout.addWidget(self.view_text)
+        
+        # 섹션 다시 쓰기 (선택한 섹션만 서버에서 다시 생성)
+        regen_row = QHBoxLayout()
+        self.combo_sections = QComboBox()
+        self.combo_sections.setEnabled(False)
+        regen_row.addWidget(self.combo_sections, 2)
+        self.txt_regen_instruction = QLineEdit()
+        self.txt_regen_instruction.setPlaceholderText("수정 요청 (선택, 예: 더 구체적인 수치로)")
+        regen_row.addWidget(self.txt_regen_instruction, 3)
+        self.btn_regenerate_section = QPushButton("🔁 이 섹션만 다시 쓰기")
+        self.btn_regenerate_section.setStyleSheet("background-color: #9B59B6; color: white; padding: 8px;")
+        self.btn_regenerate_section.setEnabled(False)
+        self.btn_regenerate_section.clicked.connect(self.regenerate_section)
+        regen_row.addWidget(self.btn_regenerate_section)
+        layout.addLayout(regen_row)
 
         # ========== 5. 최종 발행 버튼 ==========
         self.btn_publish = QPushButton("📤 현재 내용으로 발행하기")
@@ -540,7 +601,7 @@ class InfoTab(QWidget):
         # 기존 주제 제거
         self._clear_topic_list()
         
-        self.recommend_worker = RecommendWorker(category)
+        self.recommend_worker = RecommendWorker(category, self.recommended_topics.get(category, [])[-RECOMMEND_EXCLUDE_LIMIT:])
         self.recommend_worker.finished.connect(self.on_recommend_finished)
         self.recommend_worker.error.connect(self.on_recommend_error)
         self.recommend_worker.start()
@@ -576,6 +637,7 @@ class InfoTab(QWidget):
     def on_recommend_finished(self, topics: list):
         """카테고리 기반 추천 완료"""
         self._reset_generate_button()
+        self.recommended_topics.setdefault(self.recommend_worker.category, []).extend(topics)
         self._populate_topics(topics)
         self.log_signal.emit(f"✅ {len(topics)}개의 트렌드 주제가 추천되었습니다.")
 
@@ -669,6 +731,7 @@ class InfoTab(QWidget):
         # 버튼 상태 변경
         self.btn_generate.setEnabled(False)
         self.btn_generate.setText("⏳ 생성 중...")
+        self.btn_regenerate_section.setEnabled(False)
         
         # 기본 톤/분량 가져오기 (글쓰기 환경설정에서)
         tone = "친근한 이웃 (해요체)"
@@ -702,7 +765,9 @@ class InfoTab(QWidget):
             "summary": self.txt_summary.toPlainText(),
             "insight": self.txt_insight.toPlainText(),
             "naver_style": naver_style_settings,  # 네이버 에디터 서식 설정 추가
+            "topic_category": self.combo_cat.currentText(),  # 서버 검색 자료 캐시 키 (발행 카테고리와 별개)
         }
+        self.generated_request = {"topic": topic, "tone": tone}
         self.start_signal.emit(data)
 
     def request_publish(self):
@@ -732,10 +797,16 @@ class InfoTab(QWidget):
         if self.chk_use_thumbnail.isChecked() and self.thumbnail_image:
             thumbnail = self.thumbnail_image
         
+        # 결과 뷰어를 수정하지 않았으면 blocks 그대로 발행 (에디터 서식 직접 적용)
+        blocks = []
+        if self.generated_blocks and current_content == self.generated_display:
+            blocks = self.generated_blocks
+        
         data = {
             "action": "publish_only",
             "title": title,
             "content": content,
+            "blocks": blocks,
             "category": category,
             "images": {"thumbnail": thumbnail, "illustrations": []}
         }
@@ -751,8 +822,7 @@ class InfoTab(QWidget):
             self.thumbnail_image = images[0]
             
             try:
-                img_data = base64.b64decode(self.thumbnail_image)
-                qimg = QImage.fromData(img_data)
+                qimg = QImage.fromData(self.thumbnail_image)
                 pixmap = QPixmap.fromImage(qimg)
                 scaled = pixmap.scaled(200, 120, Qt.KeepAspectRatio, Qt.SmoothTransformation)
                 self.thumbnail_preview.setPixmap(scaled)
@@ -772,32 +842,52 @@ class InfoTab(QWidget):
         self.thumbnail_preview.setText("생성 실패")
         self.log_signal.emit(f"❌ {error_msg}")
 
-    def update_result_view(self, result_data):
-        """결과 뷰어 업데이트 - TEXT만 표시"""
-        title = result_data.get("title", "제목 없음")
-        
-        # content_text 우선, 없으면 content 사용
-        content = result_data.get("content_text", "") or result_data.get("content", "")
+    def update_result_view(self, result_data, partial: bool = False):
+        """결과 뷰어 업데이트 - TEXT만 표시
         
-        # JSON 형태로 온 경우 정리
-        if content and content.strip().startswith("{"):
-            try:
-                import json
-                parsed = json.loads(content)
-                content = parsed.get("content_text", "") or parsed.get("content", content)
-            except:
-                pass
+        Args:
+            result_data: 생성 결과 (title, content_text 등)
+            partial: 스트리밍 중간 결과 여부 (True면 완료 처리를 하지 않음)
+        """
+        title = result_data.get("title", "제목 없음")
+        blocks = result_data.get("blocks") or []
         
-        # 마크다운/HTML 형식이 섞여 있으면 순수 텍스트로 정리
-        content = self._clean_to_plain_text(content)
+        if blocks:
+            # 구조화된 blocks는 바로 TEXT로 렌더링 (content_text 정리/재파싱 생략)
+            content = self.content_converter.render_blocks(blocks, formats=("text",))["text"]
+        else:
+            # content_text 우선, 없으면 content 사용
+            content = result_data.get("content_text", "") or result_data.get("content", "")
+            
+            # JSON 형태로 온 경우 정리
+            if content and content.strip().startswith("{"):
+                try:
+                    import json
+                    parsed = json.loads(content)
+                    content = parsed.get("content_text", "") or parsed.get("content", content)
+                except:
+                    pass
+            
+            # 마크다운/HTML 형식이 섞여 있으면 순수 텍스트로 정리
+            content = self._clean_to_plain_text(content)
+        
+        if partial:
+            # 스트리밍 중: 지금까지 받은 본문만 표시
+            self.view_text.setText(f"제목: {title}\n\n{'━' * 50}\n\n{content}")
+            block_count = len(blocks)
+            self.btn_generate.setText(f"⏳ 생성 중... ({block_count}블록)")
+            return
         
         # 생성된 본문 저장
         self.generated_content = content
         self.generated_title = title
+        self.generated_blocks = list(blocks)
+        self._populate_sections()
         
         # TEXT만 깔끔하게 표시
         display_text = f"제목: {title}\n\n{'━' * 50}\n\n{content}"
         self.view_text.setText(display_text)
+        self.generated_display = self.view_text.toPlainText()
         
         # 버튼 상태 복원
         self.btn_generate.setEnabled(True)
@@ -808,6 +898,58 @@ class InfoTab(QWidget):
         
         self.log_signal.emit("✨ 글 생성 완료! 확인 후 발행할 수 있습니다.")
 
+    def _populate_sections(self):
+        """섹션 다시 쓰기 목록 채우기 (소제목 섹션 + 첫 소제목 앞 서론)"""
+        self.combo_sections.clear()
+        blocks = self.generated_blocks
+        first_heading = next((i for i, b in enumerate(blocks) if b.get("type") == "heading"), len(blocks))
+        if first_heading > 0:
+            self.combo_sections.addItem("서론", {"indices": list(range(first_heading))})
+        for i, block in enumerate(blocks):
+            if block.get("type") == "heading":
+                prefix = "  └ " if block.get("level", 2) > 2 else ""
+                self.combo_sections.addItem(f"{prefix}{block.get('text', '')}", {"heading": i})
+        has_sections = self.combo_sections.count() > 0
+        self.combo_sections.setEnabled(has_sections)
+        self.btn_regenerate_section.setEnabled(has_sections)
+
+    def regenerate_section(self):
+        """선택한 섹션만 다시 쓰기 요청"""
+        target = self.combo_sections.currentData()
+        if not target or not self.generated_blocks:
+            return
+        
+        self.btn_regenerate_section.setEnabled(False)
+        self.btn_regenerate_section.setText("⏳ 다시 쓰는 중...")
+        self.log_signal.emit(f"🔁 '{self.combo_sections.currentText().strip()}' 섹션을 다시 쓰는 중입니다...")
+        
+        payload = dict(
+            self.generated_request,
+            title=self.generated_title,
+            blocks=self.generated_blocks,
+            instruction=self.txt_regen_instruction.text().strip(),
+            **target
+        )
+        self.regenerate_worker = RegenerateBlocksWorker(payload)
+        self.regenerate_worker.finished.connect(self.on_regenerate_finished)
+        self.regenerate_worker.error.connect(self.on_regenerate_error)
+        self.regenerate_worker.start()
+
+    def on_regenerate_finished(self, result: dict):
+        """섹션 다시 쓰기 완료 - 병합된 글로 미리보기 갱신"""
+        self.btn_regenerate_section.setText("🔁 이 섹션만 다시 쓰기")
+        selected = self.combo_sections.currentIndex()
+        result.setdefault("title", self.generated_title)
+        self.update_result_view(result)
+        self.combo_sections.setCurrentIndex(min(selected, self.combo_sections.count() - 1))
+        self.log_signal.emit("✅ 선택한 섹션을 다시 썼습니다.")
+
+    def on_regenerate_error(self, error_msg: str):
+        """섹션 다시 쓰기 에러"""
+        self.btn_regenerate_section.setText("🔁 이 섹션만 다시 쓰기")
+        self.btn_regenerate_section.setEnabled(bool(self.generated_blocks))
+        self.log_signal.emit(f"❌ {error_msg}")
+
     def _clean_to_plain_text(self, content: str) -> str:
         """
         마크다운/HTML이 섞인 콘텐츠를 순수 텍스트로 정리
@@ -868,6 +1010,11 @@ class InfoTab(QWidget):
             self.keyword_recommend_worker.quit()
             self.keyword_recommend_worker.wait(1000)
         
+        # 섹션 다시 쓰기 워커 정리
+        if self.regenerate_worker and self.regenerate_worker.isRunning():
+            self.regenerate_worker.quit()
+            self.regenerate_worker.wait(1000)
+        
         # 분석 워커 정리
         if self.analysis_worker and self.analysis_worker.isRunning():
             self.analysis_worker.quit()
@@ -12,6 +12,8 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Signal, QSettings
 
+from core.api_client import get_session
+
 # Firebase Auth REST API
 FIREBASE_API_KEY = ""  # Firebase 웹 API 키 (config에서 로드)
 FIREBASE_AUTH_URL = "https://identitytoolkit.googleapis.com/v1/accounts"
@@ -22,6 +24,9 @@ ADMIN_CONTACT = "https://open.kakao.com/o/sgbYdyai"
 # 백엔드 API URL
 BACKEND_URL = os.environ.get("BACKEND_URL", "https://generate-blog-post-yahp6ia25q-du.a.run.app")
 
+# 계정 전용 경량 함수 URL (register_user) - 없으면 메인 엔드포인트 사용
+ACCOUNT_URL = os.environ.get("ACCOUNT_URL", BACKEND_URL)
+
 
 class LoginDialog(QDialog):
     """로그인/회원가입/비밀번호찾기 다이얼로그"""
@@ -385,8 +390,8 @@ class LoginDialog(QDialog):
                 "mode": "register_user"
             }
             
-            response = requests.post(
-                BACKEND_URL,
+            response = get_session().post(
+                ACCOUNT_URL,
                 json=payload,
                 headers=headers,
                 timeout=30